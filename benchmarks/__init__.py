@@ -0,0 +1 @@
+""" Package providing benchmarks for our shopping cart code. """
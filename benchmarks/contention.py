@@ -0,0 +1,122 @@
+"""
+Benchmark measuring the throughput of a ThreadSafeBasket shared between
+several threads, each scanning items + reading the total, against a Basket
+guarded by a single lock held for both. Also reports how long adding an item
+takes, since with a single lock, adds wait while the basket is priced.
+
+Run from the root of the repository:
+
+    python -m benchmarks.contention
+"""
+import random
+import threading
+import time
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.ThreadSafeBasket import ThreadSafeBasket
+
+
+class _LockedBasket(object):
+    """
+    Class guarding a Basket with one lock, which readers hold while the
+    basket is priced.
+    """
+
+    def __init__(self, inventory):
+        self.__basket = Basket(inventory)
+        self.__lock = threading.Lock()
+
+    def addItem(self, itemName, count=1):
+        with self.__lock:
+            self.__basket.addItem(itemName, count)
+
+    def total(self):
+        with self.__lock:
+            return self.__basket.total()
+
+
+def _randomInventory(numItems=2000, seed=1):
+    """
+    Returns:
+        Inventory. An inventory of random items.
+    """
+    rng = random.Random(seed)
+
+    inventory = Inventory()
+    inventory.addItems(Item("item%d" % ix, rng.randint(1, 1000), "group%d" % rng.randint(0, 5))
+                       for ix in xrange(numItems))
+
+    return inventory
+
+
+def _run(basket, itemNames, numThreads, numAdds, readEvery):
+    """
+    Scans items into the given basket from several threads at once, each
+    reading the total after every few items.
+
+    Returns:
+        (float, list of float). The number of seconds taken, and the sorted
+            time taken by each add.
+    """
+    addTimes = []
+
+    def scan(threadIndex):
+        rng = random.Random(threadIndex)
+        threadAddTimes = []
+        for ix in xrange(numAdds):
+            itemName = rng.choice(itemNames)
+            start = time.time()
+            basket.addItem(itemName)
+            threadAddTimes.append(time.time() - start)
+
+            if ix % readEvery == 0:
+                basket.total()
+
+        addTimes.extend(threadAddTimes)
+
+    threads = [threading.Thread(target=scan, args=(threadIndex,))
+               for threadIndex in xrange(numThreads)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.time() - start
+    addTimes.sort()
+
+    return elapsed, addTimes
+
+
+def _percentile(sortedTimes, fraction):
+    """
+    Returns:
+        float. The given percentile of the sorted times, in milliseconds.
+    """
+    return 1000 * sortedTimes[min(int(fraction * len(sortedTimes)), len(sortedTimes) - 1)]
+
+
+def main(numAdds=2000, readEvery=10):
+    inventory = _randomInventory()
+    itemNames = [item.name() for item in inventory.getItems()]
+
+    for numThreads in (1, 2, 4, 8):
+        numOps = numThreads * numAdds
+        print("%d threads, %d adds, reading the total every %d adds:"
+              % (numThreads, numOps, readEvery))
+
+        for name, basketClass in (("locked", _LockedBasket),
+                                  ("thread-safe", ThreadSafeBasket)):
+            elapsed, addTimes = _run(basketClass(inventory), itemNames, numThreads, numAdds,
+                                     readEvery)
+            print("    %-12s %6.0f adds/s   add p50=%.3fms  p99=%.3fms  max=%.1fms"
+                  % (name, numOps / elapsed, _percentile(addTimes, 0.5),
+                     _percentile(addTimes, 0.99), 1000 * addTimes[-1]))
+
+
+if __name__ == "__main__":
+    main()
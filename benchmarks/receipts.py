@@ -0,0 +1,101 @@
+"""
+Benchmark comparing writing the receipts for a large batch of baskets with
+Receipt.WriteReceipt against a ReceiptRenderer, which only formats each entry
+once. Most baskets are drawn from a small set of best-selling items.
+
+Run from the root of the repository:
+
+    python -m benchmarks.receipts
+"""
+import random
+import time
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.Receipt import (
+    Receipt,
+    ReceiptRenderer
+)
+
+
+class _NullFile(object):
+    """
+    File-like object discarding everything written to it.
+    """
+
+    def write(self, data):
+        pass
+
+
+def _randomBaskets(numItems=20000, numBestSellers=2000, numBaskets=5000,
+                   maxBasketSize=30, seed=1):
+    """
+    Returns:
+        list of Basket. Random baskets, with nine in ten items drawn from the
+            best-sellers.
+    """
+    rng = random.Random(seed)
+
+    inventory = Inventory()
+    inventory.addItems(Item("item %d" % ix, rng.randint(1, 1000), "group%d" % rng.randint(0, 20))
+                       for ix in xrange(numItems))
+
+    baskets = []
+    for ix in xrange(numBaskets):
+        basket = Basket(inventory)
+        for count in xrange(rng.randint(1, maxBasketSize)):
+            if rng.random() < 0.9:
+                itemIndex = rng.randint(0, numBestSellers - 1)
+            else:
+                itemIndex = rng.randint(0, numItems - 1)
+
+            basket.addItem("item %d" % itemIndex, rng.choice((1, 1, 1, 2, 3)))
+
+        basket.total()
+        baskets.append(basket)
+
+    return baskets
+
+
+def _timeReceipts(writeReceipt, baskets):
+    """
+    Returns:
+        float. The CPU time taken to write the receipts for the given baskets,
+            in seconds.
+    """
+    outputFile = _NullFile()
+    start = time.clock()
+    for basket in baskets:
+        writeReceipt(basket, outputFile)
+
+    return time.clock() - start
+
+
+def main(numRuns=15):
+    baskets = _randomBaskets()
+
+    # The first run starts with nothing cached
+    renderer = ReceiptRenderer()
+    coldTime = _timeReceipts(renderer.writeReceipt, baskets)
+    stats = renderer.stats()
+
+    # Alternate the runs, so that both are slowed down by anything else
+    # running alike, and take the quickest of each
+    receiptTimes = []
+    rendererTimes = []
+    for run in xrange(numRuns):
+        receiptTimes.append(_timeReceipts(Receipt.WriteReceipt, baskets))
+        rendererTimes.append(_timeReceipts(renderer.writeReceipt, baskets))
+
+    receiptTime = min(receiptTimes)
+    rendererTime = min(rendererTimes)
+
+    print("Writing %d receipts:  Receipt=%.2fs  ReceiptRenderer=%.2fs  speedup=%.2fx  "
+          "(first run=%.2fs, hit rate=%.0f%%)"
+          % (len(baskets), receiptTime, rendererTime, receiptTime / rendererTime,
+             coldTime, 100.0 * stats["hits"] / (stats["hits"] + stats["misses"])))
+
+
+if __name__ == "__main__":
+    main()
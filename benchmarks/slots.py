@@ -0,0 +1,104 @@
+"""
+Benchmark comparing the memory use + attribute access speed of the slotted
+Item class against an equivalent class with a per-instance __dict__.
+
+Run from the root of the repository:
+
+    python -m benchmarks.slots
+"""
+import sys
+import timeit
+
+from python.Basket import Basket
+from python.Item import Item
+
+
+class _DictItem(object):
+    """
+    Equivalent of Item without __slots__, for comparison.
+    """
+
+    def __init__(self, name, price, promoGroup=""):
+        self.__name = name
+        self.__price = price
+        self.__promoGroup = promoGroup
+
+    def name(self):
+        return self.__name
+
+    def price(self):
+        return self.__price
+
+    def promoGroup(self):
+        return self.__promoGroup
+
+
+class _DictInventory(object):
+    """
+    Inventory holding the given item objects as they are. Inventory stores
+    items in columns, and builds a slotted Item for every lookup, so it would
+    price with slotted Items whatever class the items were added as.
+    """
+
+    def __init__(self, items):
+        self.__itemsByName = dict((item.name(), item) for item in items)
+
+    def getItem(self, itemName):
+        return self.__itemsByName.get(itemName)
+
+
+def _itemSize(item):
+    """
+    Returns:
+        int. The number of bytes used by the item itself, excluding the
+            attribute values which are shared with other items.
+    """
+    size = sys.getsizeof(item)
+    if hasattr(item, "__dict__"):
+        size += sys.getsizeof(item.__dict__)
+
+    return size
+
+
+def _timePricing(itemClass, numItems=300, numRepeats=20):
+    """
+    Times pricing a basket containing the given number of items, all in the
+    same promo group, using items of the given class.
+
+    Returns:
+        float. The best time taken to price the basket, in seconds.
+    """
+    inventory = _DictInventory(itemClass("item%d" % ix, ix % 17 + 1, "group")
+                               for ix in xrange(numItems))
+
+    def price():
+        basket = Basket(inventory)
+        basket.addItems(dict(("item%d" % ix, 2) for ix in xrange(numItems)))
+        basket.total()
+
+    return min(timeit.repeat(price, number=10, repeat=numRepeats))
+
+
+def main():
+    slottedItem = Item("beans", 100, "canned")
+    dictItem = _DictItem("beans", 100, "canned")
+
+    slottedSize = _itemSize(slottedItem)
+    dictSize = _itemSize(dictItem)
+    print("Bytes per item:     slots=%d  dict=%d  saved=%d"
+          % (slottedSize, dictSize, dictSize - slottedSize))
+
+    accessCount = 1000000
+    slottedAccess = min(timeit.repeat(slottedItem.price, number=accessCount, repeat=5))
+    dictAccess = min(timeit.repeat(dictItem.price, number=accessCount, repeat=5))
+    print("price() access:     slots=%.1fns  dict=%.1fns"
+          % (slottedAccess * 1e9 / accessCount, dictAccess * 1e9 / accessCount))
+
+    slottedPricing = _timePricing(Item)
+    dictPricing = _timePricing(_DictItem)
+    print("Pricing loop:       slots=%.2fms  dict=%.2fms  speedup=%.2fx"
+          % (slottedPricing * 1e3, dictPricing * 1e3, dictPricing / slottedPricing))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Benchmark suite timing each stage of pricing a basket, over synthetic
+inventories + baskets of several sizes and shapes, to judge performance
+changes by.
+
+The inventories are generated with test.utils.generateRandomInventory, at
+each of the given sizes and promo group mixes:
+
+    none    No promo groups - only the three-for-two offer applies.
+    few     3 promo groups, so each group is large.
+    mixed   The 12 standard promo groups, with a fifth of items in none.
+    many    1000 promo groups, so each group is small.
+
+The baskets are drawn from items chosen with test.utils.generateRandomItems,
+in each of the given profiles:
+
+    small       Up to 10 items, one of each.
+    bulk        Up to 5 items, 10-100 of each.
+    promoHeavy  Up to 20 items from a single promo group, in multiples of 3
+                where there's no group.
+
+Each of these is timed separately:
+
+    loadCsv         Reading the inventory CSV file, per run.
+    loadSnapshot    Opening a compiled snapshot of the inventory, per run.
+    addItem         Basket.addItem, per call.
+    compute         Pricing the basket (Basket.total, which runs
+                    Basket.__compute), per basket.
+    receipt         Receipt.GetReceipt, per basket.
+
+The results are written as JSON lines, one for each stage + inventory (and
+basket profile), with the number of operations, the throughput and the
+latency percentiles in microseconds:
+
+    {"benchmark": "addItem", "inventorySize": 1000, "promoMix": "few",
+     "basketProfile": "small", "count": 10921, "seconds": 0.031,
+     "opsPerSecond": 352290.3, "p50Us": 2.1, "p90Us": 3.1, "p99Us": 5.0,
+     "maxUs": 41.0}
+
+Run from the root of the repository:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 1000 100000 --mixes few --output results.jsonl
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from timeit import default_timer
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Receipt import Receipt
+from python.Snapshot import (
+    compileSnapshot,
+    loadInventory
+)
+from python.main import readItems
+from test.utils import (
+    generateRandomInventory,
+    generateRandomItems,
+    promoGroups
+)
+
+
+# The default inventory sizes, in rows
+DefaultSizes = (1000, 100000, 1000000)
+
+# The promo groups to choose from for each mix, where "" means no group
+PromoMixes = OrderedDict([
+    ("none", [""]),
+    ("few", promoGroups[:3]),
+    ("mixed", promoGroups + [""] * 3),
+    ("many", ["group%d" % ix for ix in xrange(1000)]),
+])
+
+# The number of items to draw the baskets from, for each inventory
+_ItemPoolSize = 20000
+
+
+def _percentile(sortedTimes, percent):
+    """
+    Args:
+        sortedTimes (list of float): Times in seconds, sorted.
+        percent (float): The percentile to find.
+
+    Returns:
+        float. The given percentile of the times, by nearest rank, in
+            microseconds.
+    """
+    index = max(0, int(round(percent / 100.0 * len(sortedTimes))) - 1)
+    return round(sortedTimes[min(index, len(sortedTimes) - 1)] * 1e6, 1)
+
+
+def _result(benchmark, inventorySize, promoMix, basketProfile, times):
+    """
+    Args:
+        benchmark (str): The name of the stage timed.
+        inventorySize (int): The number of rows in the inventory.
+        promoMix (str): The promo group mix of the inventory.
+        basketProfile (str): The profile of the baskets, or None.
+        times (list of float): The time taken by each operation, in seconds.
+
+    Returns:
+        OrderedDict. The result, with the throughput + latency percentiles.
+    """
+    sortedTimes = sorted(times)
+    seconds = sum(sortedTimes)
+
+    result = OrderedDict()
+    result["benchmark"] = benchmark
+    result["inventorySize"] = inventorySize
+    result["promoMix"] = promoMix
+    result["basketProfile"] = basketProfile
+    result["count"] = len(sortedTimes)
+    result["seconds"] = round(seconds, 6)
+    result["opsPerSecond"] = round(len(sortedTimes) / seconds, 1) if seconds else None
+    result["p50Us"] = _percentile(sortedTimes, 50)
+    result["p90Us"] = _percentile(sortedTimes, 90)
+    result["p99Us"] = _percentile(sortedTimes, 99)
+    result["maxUs"] = round(sortedTimes[-1] * 1e6, 1)
+
+    return result
+
+
+def _writeInventory(tempDir, size, promoMix, seed):
+    """
+    Generates an inventory CSV file, with names made up to fill the size.
+
+    Returns:
+        str. The path to the inventory file.
+    """
+    wordsPath = os.path.join(tempDir, "words%d.txt" % size)
+    if not os.path.exists(wordsPath):
+        with open(wordsPath, "w") as wordsFile:
+            wordsFile.writelines("item%07d\n" % ix for ix in xrange(size))
+
+    inventoryPath = os.path.join(tempDir, "inventory%d-%s.csv" % (size, promoMix))
+    random.seed(seed)
+    generateRandomInventory(wordsPath, inventoryPath, size, PromoMixes[promoMix])
+
+    return inventoryPath
+
+
+def _itemPool(tempDir, size, seed):
+    """
+    Returns:
+        list of str. Item names chosen from the inventory at random, with
+            repeats, to draw the baskets from.
+    """
+    itemsPath = os.path.join(tempDir, "items%d.txt" % size)
+    random.seed(seed)
+    generateRandomItems(os.path.join(tempDir, "words%d.txt" % size), itemsPath,
+                        _ItemPoolSize)
+
+    return list(readItems(itemsPath))
+
+
+def _randomBaskets(inventory, itemPool, basketProfile, numBaskets, rng):
+    """
+    Returns:
+        list of list of (str, int). The item names + counts to add for each
+            basket.
+    """
+    if basketProfile == "small":
+        return [[(rng.choice(itemPool), 1) for ix in xrange(rng.randint(1, 10))]
+                for basketIx in xrange(numBaskets)]
+
+    if basketProfile == "bulk":
+        return [[(rng.choice(itemPool), rng.randint(10, 100))
+                 for ix in xrange(rng.randint(1, 5))]
+                for basketIx in xrange(numBaskets)]
+
+    # Promo-heavy baskets fill up on a single promo group, or buy items with
+    # no group in threes
+    namesByGroup = {}
+    for itemName in itemPool:
+        namesByGroup.setdefault(inventory.getItem(itemName).promoGroup(), []).append(itemName)
+
+    groups = sorted(namesByGroup)
+    baskets = []
+    for basketIx in xrange(numBaskets):
+        group = rng.choice(groups)
+        names = namesByGroup[group]
+        if group:
+            items = [(rng.choice(names), rng.randint(1, 3)) for ix in xrange(rng.randint(6, 20))]
+        else:
+            items = [(rng.choice(names), 3 * rng.randint(1, 3)) for ix in xrange(rng.randint(3, 10))]
+
+        baskets.append(items)
+
+    return baskets
+
+
+def _timeLoading(inventoryPath, size, promoMix, numRuns):
+    """
+    Returns:
+        (Inventory, list of OrderedDict). The inventory read from the CSV
+            file, and the results for loading it.
+    """
+    csvTimes = []
+    for run in xrange(numRuns):
+        inventory = Inventory()
+        start = default_timer()
+        inventory.readFromDisk(inventoryPath)
+        csvTimes.append(default_timer() - start)
+
+    compileSnapshot(inventoryPath)
+    snapshotTimes = []
+    for run in xrange(numRuns):
+        start = default_timer()
+        loadInventory(inventoryPath)
+        snapshotTimes.append(default_timer() - start)
+
+    return inventory, [_result("loadCsv", size, promoMix, None, csvTimes),
+                       _result("loadSnapshot", size, promoMix, None, snapshotTimes)]
+
+
+def _timeBaskets(inventory, baskets, size, promoMix, basketProfile):
+    """
+    Returns:
+        list of OrderedDict. The results for adding the items to, pricing +
+            writing the receipt for each basket.
+    """
+    addTimes = []
+    computeTimes = []
+    receiptTimes = []
+    timer = default_timer
+
+    for items in baskets:
+        basket = Basket(inventory)
+        addItem = basket.addItem
+        for itemName, count in items:
+            start = timer()
+            addItem(itemName, count)
+            addTimes.append(timer() - start)
+
+        start = timer()
+        basket.total()
+        computeTimes.append(timer() - start)
+
+        start = timer()
+        Receipt.GetReceipt(basket)
+        receiptTimes.append(timer() - start)
+
+    return [_result("addItem", size, promoMix, basketProfile, addTimes),
+            _result("compute", size, promoMix, basketProfile, computeTimes),
+            _result("receipt", size, promoMix, basketProfile, receiptTimes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DefaultSizes,
+                        help="Inventory sizes, in rows")
+    parser.add_argument("--mixes", nargs="+", choices=PromoMixes.keys(),
+                        default=PromoMixes.keys(), help="Promo group mixes")
+    parser.add_argument("--profiles", nargs="+", choices=("small", "bulk", "promoHeavy"),
+                        default=("small", "bulk", "promoHeavy"), help="Basket profiles")
+    parser.add_argument("--baskets", type=int, default=2000,
+                        help="Number of baskets for each profile")
+    parser.add_argument("--loadRuns", type=int, default=3,
+                        help="Number of times to load each inventory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="File to write the results to (default: stdout)")
+    args = parser.parse_args()
+
+    outputFile = open(args.output, "w") if args.output else sys.stdout
+
+    def write(result):
+        outputFile.write("%s\n" % json.dumps(result))
+        outputFile.flush()
+
+    environment = OrderedDict()
+    environment["benchmark"] = "environment"
+    environment["python"] = platform.python_version()
+    environment["implementation"] = platform.python_implementation()
+    environment["platform"] = platform.platform()
+    write(environment)
+
+    tempDir = tempfile.mkdtemp(prefix="checkoutBenchmarks")
+    try:
+        for size in args.sizes:
+            for promoMix in args.mixes:
+                sys.stderr.write("Benchmarking inventory of %d rows, %s promo groups...\n"
+                                 % (size, promoMix))
+
+                inventoryPath = _writeInventory(tempDir, size, promoMix, args.seed)
+                inventory, results = _timeLoading(inventoryPath, size, promoMix, args.loadRuns)
+                for result in results:
+                    write(result)
+
+                itemPool = _itemPool(tempDir, size, args.seed)
+                for basketProfile in args.profiles:
+                    rng = random.Random(args.seed)
+                    baskets = _randomBaskets(inventory, itemPool, basketProfile,
+                                             args.baskets, rng)
+
+                    # Keep the garbage collector from landing in the timings
+                    gc.collect()
+                    gc.disable()
+                    try:
+                        results = _timeBaskets(inventory, baskets, size, promoMix,
+                                               basketProfile)
+                    finally:
+                        gc.enable()
+
+                    for result in results:
+                        write(result)
+
+                # Free the inventory before generating the next one
+                del inventory, itemPool
+                os.remove(inventoryPath)
+
+    finally:
+        shutil.rmtree(tempDir)
+        if outputFile is not sys.stdout:
+            outputFile.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark comparing pricing a large batch of random baskets with a Basket per
+basket against the NumPy VectorizedPricer. Requires NumPy.
+
+Run from the root of the repository:
+
+    python -m benchmarks.vectorized
+"""
+import random
+import time
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.VectorizedPricer import VectorizedPricer
+
+
+def _randomBatch(numItems=5000, numBaskets=100000, maxBasketSize=20, seed=1):
+    """
+    Returns:
+        (Inventory, list of dict of str -> int). An inventory of random items,
+            and random baskets of those items.
+    """
+    rng = random.Random(seed)
+
+    inventory = Inventory()
+    inventory.addItems(Item("item%d" % ix, rng.randint(1, 1000), "group%d" % rng.randint(0, 20))
+                       for ix in xrange(numItems))
+
+    baskets = [dict(("item%d" % rng.randint(0, numItems - 1), rng.randint(1, 5))
+                    for count in xrange(rng.randint(1, maxBasketSize)))
+               for ix in xrange(numBaskets)]
+
+    return inventory, baskets
+
+
+def main():
+    inventory, baskets = _randomBatch()
+
+    start = time.time()
+    basket = Basket(inventory)
+    basketTotals = []
+    for items in baskets:
+        basket.clear()
+        basket.addItems(items)
+        basketTotals.append(basket.total())
+
+    basketTime = time.time() - start
+
+    pricer = VectorizedPricer(inventory)
+    basketIndices, itemIndices, counts, numBaskets = pricer.countMatrix(baskets)
+
+    start = time.time()
+    totals, savings = pricer.price(basketIndices, itemIndices, counts, numBaskets)
+    vectorizedTime = time.time() - start
+
+    assert list(totals) == basketTotals
+
+    print("Pricing %d baskets:  Basket=%.2fs  vectorized=%.3fs  speedup=%.0fx"
+          % (len(baskets), basketTime, vectorizedTime, basketTime / vectorizedTime))
+
+
+if __name__ == "__main__":
+    main()
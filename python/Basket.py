@@ -1,15 +1,21 @@
-from collections import defaultdict
+from collections import (
+    defaultdict,
+    OrderedDict
+)
 
 from Promos import (
     ThreeForTwoPromo,
     CheapestFreePromo
 )
+from VersionedInventory import VersionedInventory
 
 class BasketEntry(object):
     """
     Class representing a single entry in a basket - an item and a counter.
     """
 
+    __slots__ = ("__item", "__count")
+
     # Initializer -------------------------------------------------------------
 
     def __init__(self, item):
@@ -86,18 +92,30 @@ class BasketEntry(object):
 class Basket(object):
     """
     Class representing the contents of a basket.
+
+    The cost of the basket is computed incrementally - each promo group (and
+    each item which isn't in a promo group) is priced separately, and only the
+    groups + items which have changed since the last computation are repriced.
     """
 
     # Initializer -------------------------------------------------------------
 
-    def __init__(self, inventory):
+    def __init__(self, inventory, index=None):
         """
         Initializes an instance of the class.
 
         Args:
-            inventory (Inventory): The inventory to use with this basket.
+            inventory (Inventory): The inventory to use with this basket. If
+                this is a VersionedInventory, the basket uses the version
+                which is current now, and isn't affected by later updates.
+            index (BasketIndex): An index to keep up to date with the items
+                in this basket, or None. (Default: None)
         """
+        if isinstance(inventory, VersionedInventory):
+            inventory = inventory.current()
+
         self.__inventory = inventory
+        self.__index = index
 
         # Dictionary mapping item name -> BasketEntry
         self._entriesByName = {}
@@ -105,16 +123,36 @@ class Basket(object):
         # Dictionary mapping promo group -> set of item names
         self._itemsByPromoGroup = defaultdict(set)
 
-        # Flag indicating whether the cost + savings need computing
-        self.__dirty = False
+        # The promo groups + names of items not in a promo group which need
+        # repricing
+        self.__dirtyGroups = set()
+        self.__dirtyNames = set()
+
+        # Dictionaries mapping promo group / item name -> (cost, savings) pairs
+        # for the last time the group / item was priced
+        self.__pricingByGroup = {}
+        self.__pricingByName = {}
+
+        # Dictionary mapping item name -> ThreeForTwoPromo
+        self.__threeForTwoByName = {}
+
+        # Dictionary mapping promo group -> list of CheapestFreePromo, one for
+        # each distinct bundle
+        self.__cheapestFreeByGroup = {}
 
         # The cost + savings once computed
-        self.__total = 0.0
-        self.__savings = 0.0
-        self.__promos = []
+        self.__total = 0
+        self.__savings = 0
 
     # Public Instance Methods -------------------------------------------------
 
+    def inventory(self):
+        """
+        Returns:
+            Inventory or InventoryVersion. The inventory used by this basket.
+        """
+        return self.__inventory
+
     def addItem(self, itemName, count=1):
         """
         Adds an item to the basket.
@@ -125,7 +163,12 @@ class Basket(object):
 
         Raises:
             KeyError: If the given item name isn't found in our inventory.
+            ValueError: If the given count is < 0.
         """
+        # Check the count before adding an entry for the item
+        if count < 0:
+            raise ValueError("Count must be > 0")
+
         # Increment the number of this item in our dict of items
         entry = self._entriesByName.get(itemName)
         if entry is None:
@@ -136,23 +179,97 @@ class Basket(object):
             entry = BasketEntry(item)
             self._entriesByName[itemName] = entry
 
-        # Add this item to the set of items for its promo group
+            if self.__index is not None:
+                self.__index.addItem(self, item)
+
+        entry.increment(count)
+
+        # Mark the item's promo group (or the item itself, if it's not in a
+        # promo group) as needing repricing
         item = entry.item()
         promoGroup = item.promoGroup()
         if promoGroup:
             self._itemsByPromoGroup[promoGroup].add(item.name())
+            self.__dirtyGroups.add(promoGroup)
+        else:
+            self.__dirtyNames.add(itemName)
 
-        entry.increment(count)
+    def addItems(self, items):
+        """
+        Adds several items to the basket at once.
 
-        # Set the flag so that we know to recompute the cost of the basket
-        self.__dirty = True
+        Each distinct item name is only looked up in the inventory once, and
+        names which aren't found in the inventory are skipped rather than
+        raising an exception.
+
+        Args:
+            items (iterable of str, or dict of str -> int): The names of the
+                items to add, or a dictionary mapping item name -> count.
+
+        Raises:
+            ValueError: If any of the given counts is < 0, in which case
+                none of the items are added.
+
+        Returns:
+            list of str. The names of any items which weren't found in our
+                inventory, in the order they were first seen.
+        """
+        # Collapse repeated names into counts
+        if hasattr(items, "iteritems"):
+            counts = items
+        else:
+            counts = OrderedDict()
+            for itemName in items:
+                counts[itemName] = counts.get(itemName, 0) + 1
+
+        # Check every count before changing anything, so that a bad count
+        # can't leave the basket half updated
+        for count in counts.itervalues():
+            if count < 0:
+                raise ValueError("Count must be > 0")
+
+        unknownNames = []
+        dirtyGroups = set()
+        dirtyNames = set()
+
+        for itemName, count in counts.iteritems():
+            entry = self._entriesByName.get(itemName)
+            if entry is None:
+                item = self.__inventory.getItem(itemName)
+                if item is None:
+                    unknownNames.append(itemName)
+                    continue
+
+                entry = BasketEntry(item)
+                self._entriesByName[itemName] = entry
+
+                if self.__index is not None:
+                    self.__index.addItem(self, item)
+
+                promoGroup = item.promoGroup()
+                if promoGroup:
+                    self._itemsByPromoGroup[promoGroup].add(itemName)
+
+            entry.increment(count)
+
+            promoGroup = entry.item().promoGroup()
+            if promoGroup:
+                dirtyGroups.add(promoGroup)
+            else:
+                dirtyNames.add(itemName)
+
+        # Mark everything we've touched as needing repricing in one go
+        self.__dirtyGroups.update(dirtyGroups)
+        self.__dirtyNames.update(dirtyNames)
+
+        return unknownNames
 
     def total(self):
         """
         Returns:
-            float. The cost of the basket, taking offers into account.
+            int. The cost of the basket in pence, taking offers into account.
         """
-        if self.__dirty:
+        if self.__isDirty():
             self.__compute()
 
         return self.__total
@@ -160,22 +277,40 @@ class Basket(object):
     def savings(self):
         """
         Returns:
-            float. The total savings in this basket from offers.
+            int. The total savings in this basket from offers, in pence.
         """
-        if self.__dirty:
+        if self.__isDirty():
             self.__compute()
 
         return self.__savings
 
-    def promos(self):
+    def promos(self, expand=False):
         """
+        Args:
+            expand (bool): If True, identical promos are listed separately,
+                rather than as a single promo with a multiplicity.
+                (Default: False)
+
         Returns:
             list of _PromoEntry. The promotional offers in this basket.
         """
-        if self.__dirty:
+        if self.__isDirty():
             self.__compute()
 
-        return list(self.__promos)
+        # List the three-for-twos first, then the promo groups
+        promos = []
+        for itemName in self._entriesByName:
+            promo = self.__threeForTwoByName.get(itemName)
+            if promo is not None:
+                promos.append(promo)
+
+        for promoGroup in self._itemsByPromoGroup:
+            promos.extend(self.__cheapestFreeByGroup.get(promoGroup, ()))
+
+        if expand:
+            promos = [single for promo in promos for single in promo.expand()]
+
+        return promos
 
     def numItems(self):
         """
@@ -196,14 +331,80 @@ class Basket(object):
         """
         return list(self._entriesByName.values())
 
+    def updateItems(self, itemNames):
+        """
+        Looks up the given items in the inventory again, after their prices
+        or promo groups have changed, and marks them for repricing. Items
+        which have been removed from the inventory are removed from the
+        basket.
+
+        Args:
+            itemNames (iterable of str): The names of the items which have
+                changed. Names which aren't in the basket are ignored.
+
+        Returns:
+            list of str. The names of the items removed from the basket.
+        """
+        removedNames = []
+        for itemName in itemNames:
+            entry = self._entriesByName.get(itemName)
+            if entry is None:
+                continue
+
+            oldItem = entry.item()
+            item = self.__inventory.getItem(itemName)
+            if item is not None and item == oldItem:
+                continue
+
+            self.__unpriceItem(oldItem)
+
+            if item is None:
+                del self._entriesByName[itemName]
+                removedNames.append(itemName)
+
+                if self.__index is not None:
+                    self.__index.removeItem(self, oldItem)
+
+                continue
+
+            # An entry's item can't be changed, so replace the entry
+            newEntry = BasketEntry(item)
+            newEntry.increment(entry.count())
+            self._entriesByName[itemName] = newEntry
+
+            promoGroup = item.promoGroup()
+            if promoGroup:
+                self._itemsByPromoGroup[promoGroup].add(itemName)
+                self.__dirtyGroups.add(promoGroup)
+            else:
+                self.__dirtyNames.add(itemName)
+
+            if self.__index is not None and promoGroup != oldItem.promoGroup():
+                self.__index.removeItem(self, oldItem)
+                self.__index.addItem(self, item)
+
+        return removedNames
+
     def clear(self):
         """
         Empties the basket.
         """
+        if self.__index is not None:
+            for entry in self._entriesByName.itervalues():
+                self.__index.removeItem(self, entry.item())
+
         self._entriesByName = {}
         self._itemsByPromoGroup = defaultdict(set)
 
-        self.__dirty = True
+        self.__dirtyGroups = set()
+        self.__dirtyNames = set()
+        self.__pricingByGroup = {}
+        self.__pricingByName = {}
+        self.__threeForTwoByName = {}
+        self.__cheapestFreeByGroup = {}
+
+        self.__total = 0
+        self.__savings = 0
 
     def copyFrom(self, other):
         """
@@ -213,104 +414,230 @@ class Basket(object):
             other (Basket): The basket to copy to.
         """
         self.clear()
-        for itemName, entry in other._entriesByName.iteritems():
-            self.addItem(itemName, entry.count())
+        self.addItems(dict((itemName, entry.count())
+                           for itemName, entry in other._entriesByName.iteritems()))
 
     # Private Instance Methods ------------------------------------------------
 
+    def __isDirty(self):
+        """
+        Returns:
+            bool. True if any part of the basket needs repricing.
+        """
+        return bool(self.__dirtyGroups or self.__dirtyNames)
+
     def __compute(self):
         """
-        Computes the cost + savings of the basket.
+        Reprices the promo groups + items which have changed since the last
+        computation, and updates the cost + savings of the basket.
         """
-        self.__total = 0.0
-        self.__savings = 0.0
-        self.__promos = []
+        for itemName in self.__dirtyNames:
+            cost, savings = self.__priceItem(itemName)
+            self.__updatePricing(self.__pricingByName, itemName, cost, savings)
 
-        # Make a duplicate basket to save our state
-        originalBasket = Basket(self.__inventory)
-        originalBasket.copyFrom(self)
+        for promoGroup in self.__dirtyGroups:
+            cost, savings = self.__pricePromoGroup(promoGroup)
+            self.__updatePricing(self.__pricingByGroup, promoGroup, cost, savings)
 
-        # First look for three-for-twos
-        self.__processThreeForTwos()
+        # Clear the dirty sets so that we don't recompute unless we need to
+        self.__dirtyNames = set()
+        self.__dirtyGroups = set()
 
-        # Then handle promo groups
-        self.__processPromoGroups()
+    def __unpriceItem(self, item):
+        """
+        Removes an item's contribution to the price of the basket, before the
+        item is replaced or removed.
 
-        # Then add whatever's left
-        for itemName, entry in self._entriesByName.iteritems():
-            item = entry.item()
-            count = entry.count()
-            self.__total += count * item.price()
+        Args:
+            item (Item): The item's current value in the basket.
+        """
+        itemName = item.name()
+        promoGroup = item.promoGroup()
+        if promoGroup:
+            # The rest of the group needs repricing without it
+            self._itemsByPromoGroup[promoGroup].discard(itemName)
+            self.__dirtyGroups.add(promoGroup)
+        else:
+            self.__updatePricing(self.__pricingByName, itemName, 0, 0)
+            del self.__pricingByName[itemName]
+            self.__dirtyNames.discard(itemName)
 
-        # Restore the original contents of the basket
-        self.copyFrom(originalBasket)
+        self.__threeForTwoByName.pop(itemName, None)
 
-        # Set the flag so that we don't recompute unless we need to
-        self.__dirty = False
+    def __updatePricing(self, pricing, key, cost, savings):
+        """
+        Replaces the cost + savings stored for the given key, adjusting the
+        cost + savings of the basket by the difference.
 
-    def __processThreeForTwos(self):
+        Args:
+            pricing (dict): The dictionary mapping key -> (cost, savings).
+            key (str): The promo group or item name being priced.
+            cost (int): The new cost for the key, in pence.
+            savings (int): The new savings for the key, in pence.
         """
-        Processes all three-for-two offers found in the basket, and removes the
-        processed items.
+        oldCost, oldSavings = pricing.get(key, (0, 0))
+        pricing[key] = (cost, savings)
+
+        self.__total += cost - oldCost
+        self.__savings += savings - oldSavings
+
+    def __priceItem(self, itemName):
         """
-        for itemName, entry in self._entriesByName.iteritems():
-            count = entry.count()
-            numThreeForTwos = count / 3
-            if numThreeForTwos > 0:
-                item = entry.item()
-                price = item.price()
+        Prices an item which isn't in a promo group.
 
-                promo = ThreeForTwoPromo(item, numThreeForTwos)
-                self.__promos.append(promo)
+        Args:
+            itemName (str): The name of the item to price.
 
-                self.__total += promo.cost()
-                self.__savings += promo.savings()
+        Returns:
+            tuple of (int, int). The cost + savings for the item, in pence.
+        """
+        entry = self._entriesByName[itemName]
+        cost, savings, count = self.__priceThreeForTwo(entry)
+        cost += count * entry.item().price()
 
-                # Take 3 off the counter for this entry
-                entry.decrement(numThreeForTwos * 3)
+        return cost, savings
 
-    def __processPromoGroups(self):
+    def __pricePromoGroup(self, promoGroup):
         """
-        Processes all promo group offers found in the basket, and removes the
-        processed items.
+        Prices all the items in a promo group.
+
+        Three-for-two offers are applied first, then the remaining items are
+        bundled into "cheapest free" offers.
+
+        Args:
+            promoGroup (str): The promo group to price.
+
+        Returns:
+            tuple of (int, int). The cost + savings for the promo group, in
+                pence.
         """
-        for promoGroup, itemNames in self._itemsByPromoGroup.iteritems():
-            # Build a list of entries for this promo group
-            entries = []
-            numItems = 0
-            for itemName in itemNames:
-                entry = self._entriesByName.get(itemName)
-                if entry.count() > 0:
-                    entries.append(entry)
-                    numItems += entry.count()
+        cost = 0
+        savings = 0
 
-            while numItems >= 3:
-                # Sort the entries by increasing price of the item
-                entries.sort(key=lambda entry: entry.item().price())
+        # Apply three-for-twos, and build a list of (item, count) pairs for the
+        # remaining items
+        remaining = []
+        numItems = 0
+        for itemName in self._itemsByPromoGroup[promoGroup]:
+            entry = self._entriesByName[itemName]
+            entryCost, entrySavings, count = self.__priceThreeForTwo(entry)
+            cost += entryCost
+            savings += entrySavings
+
+            if count > 0:
+                remaining.append((entry.item(), count))
+                numItems += count
+
+        # Sort the remaining items by decreasing price, once. We're being nice
+        # and giving the best discount we can, so the items are bundled into
+        # threes from the most expensive downwards, and the cheapest item in
+        # each bundle is free. That means every third unit in this order is
+        # free, until there are fewer than three units left.
+
+        # NOTE: this is where we could be stingy if we wanted to, and
+        # charge for the most expensive + give the cheapest for free.
+        remaining.sort(key=lambda pair: pair[0].price(), reverse=True)
+        numBundledItems = numItems - numItems % 3
+
+        # Walk the runs of identical items - units at positions 2, 5, 8, ...
+        # within the bundled units are free, and there are (position / 3) free
+        # units before any given position.
+        position = 0
+        for item, count in remaining:
+            price = item.price()
+            start = min(position, numBundledItems)
+            end = min(position + count, numBundledItems)
+            numFree = end / 3 - start / 3
+
+            cost += (count - numFree) * price
+            savings += numFree * price
+
+            position += count
+
+        promos = self.__buildCheapestFreePromos(remaining, numBundledItems / 3)
+        if promos:
+            self.__cheapestFreeByGroup[promoGroup] = promos
+        else:
+            self.__cheapestFreeByGroup.pop(promoGroup, None)
+
+        return cost, savings
+
+    def __buildCheapestFreePromos(self, remaining, numBundles):
+        """
+        Builds the "cheapest free" promos for the given items, aggregating
+        identical bundles into a single promo.
 
-                # Take the last three items from the end - we charge for the
-                # first two, and give the third for free.
+        Args:
+            remaining (list of (Item, int)): The items + counts to bundle, in
+                order of decreasing price.
+            numBundles (int): The number of bundles to build.
+
+        Returns:
+            list of CheapestFreePromo. The promos for each distinct bundle.
+        """
+        # List of [items, numPromos] pairs - since the items are sorted,
+        # identical bundles are always next to each other
+        bundles = []
+        items = []
+        for item, count in remaining:
+            while count > 0 and numBundles > 0:
+                if not items and count >= 3:
+                    # Bundle as many of this item with itself as we can
+                    numPromos = min(count / 3, numBundles)
+                    self.__appendBundle(bundles, [item, item, item], numPromos)
+                    count -= 3 * numPromos
+                    numBundles -= numPromos
+                    continue
+
+                items.append(item)
+                count -= 1
+                if len(items) == 3:
+                    self.__appendBundle(bundles, items, 1)
+                    items = []
+                    numBundles -= 1
+
+        return [CheapestFreePromo(items, numPromos) for items, numPromos in bundles]
+
+    def __appendBundle(self, bundles, items, numPromos):
+        """
+        Adds a bundle of items to the given list, merging it with the last
+        bundle if the items are the same.
 
-                # NOTE: this is where we could be stingy if we wanted to, and
-                # charge for the most expensive + give the cheapest for free.
-                # Instead we're being nice and giving the best discount we can.
-                items = []
-                for x in xrange(3):
-                    lastEntry = entries[-1]
-                    items.append(lastEntry.item())
+        Args:
+            bundles (list of [list of Item, int]): The bundles built so far.
+            items (list of Item): The items in the bundle.
+            numPromos (int): The number of these bundles to add.
+        """
+        if bundles:
+            lastBundle = bundles[-1]
+            lastItems = lastBundle[0]
+            if all(lastItems[ix] is items[ix] for ix in xrange(3)):
+                lastBundle[1] += numPromos
+                return
 
-                    # Decrement the counter for this entry, and remove it if 0
-                    newCount = lastEntry.decrement()
-                    if newCount == 0:
-                        entries.pop()
+        bundles.append([items, numPromos])
 
-                promo = CheapestFreePromo(items)
-                self.__promos.append(promo)
+    def __priceThreeForTwo(self, entry):
+        """
+        Applies the three-for-two offer to the given entry, replacing any
+        previous three-for-two promo for the entry's item.
 
-                self.__total += promo.cost()
-                self.__savings += promo.savings()
+        Args:
+            entry (BasketEntry): The entry to price.
 
+        Returns:
+            tuple of (int, int, int). The cost + savings of the offer in pence,
+                and the number of items not included in the offer.
+        """
+        item = entry.item()
+        count = entry.count()
+        numThreeForTwos = count / 3
 
-                numItems -= 3
+        if numThreeForTwos == 0:
+            self.__threeForTwoByName.pop(item.name(), None)
+            return 0, 0, count
 
+        promo = ThreeForTwoPromo(item, numThreeForTwos)
+        self.__threeForTwoByName[item.name()] = promo
 
+        return promo.cost(), promo.savings(), count - numThreeForTwos * 3
@@ -0,0 +1,151 @@
+""" Module providing an index from items to the baskets holding them. """
+import weakref
+
+
+class BasketIndex(object):
+    """
+    Class keeping track of which open baskets hold each item + promo group,
+    so that when the inventory changes, only the baskets holding the changed
+    items need repricing.
+
+    Baskets created with an index keep it up to date as items are added +
+    the basket is cleared. Baskets are held by weak references, so a basket
+    which is no longer used drops out of the index without being cleared.
+
+    The baskets must use an inventory which changes in place, like
+    Inventory - baskets using a VersionedInventory stick with the version
+    they were created with, so never need repricing.
+
+    Not thread-safe - use it from the same thread as its baskets.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self):
+        """
+        Initializes an instance of the class.
+        """
+        # Dictionary mapping item name -> WeakSet of Basket
+        self.__basketsByName = {}
+
+        # Dictionary mapping promo group -> WeakKeyDictionary mapping Basket ->
+        # the number of items in the basket in the group
+        self.__basketsByPromoGroup = {}
+
+    # Public Instance Methods -------------------------------------------------
+
+    def addItem(self, basket, item):
+        """
+        Records that a basket holds an item. Called by Basket when an item is
+        first added.
+
+        Args:
+            basket (Basket): The basket.
+            item (Item): The item.
+        """
+        baskets = self.__basketsByName.get(item.name())
+        if baskets is None:
+            baskets = self.__basketsByName[item.name()] = weakref.WeakSet()
+
+        baskets.add(basket)
+
+        promoGroup = item.promoGroup()
+        if promoGroup:
+            counts = self.__basketsByPromoGroup.get(promoGroup)
+            if counts is None:
+                counts = self.__basketsByPromoGroup[promoGroup] = weakref.WeakKeyDictionary()
+
+            counts[basket] = counts.get(basket, 0) + 1
+
+    def removeItem(self, basket, item):
+        """
+        Records that a basket no longer holds an item. Called by Basket when
+        an item is removed, or the basket is cleared.
+
+        Args:
+            basket (Basket): The basket.
+            item (Item): The item.
+        """
+        baskets = self.__basketsByName.get(item.name())
+        if baskets is not None:
+            baskets.discard(basket)
+            if not baskets:
+                del self.__basketsByName[item.name()]
+
+        promoGroup = item.promoGroup()
+        counts = self.__basketsByPromoGroup.get(promoGroup) if promoGroup else None
+        if counts is not None and basket in counts:
+            if counts[basket] > 1:
+                counts[basket] -= 1
+            else:
+                del counts[basket]
+                if not counts:
+                    del self.__basketsByPromoGroup[promoGroup]
+
+    def basketsWithItem(self, itemName):
+        """
+        Args:
+            itemName (str): The name of an item.
+
+        Returns:
+            list of Basket. The open baskets holding the item.
+        """
+        baskets = self.__basketsByName.get(itemName)
+        if baskets is None:
+            return []
+
+        baskets = list(baskets)
+        if not baskets:
+            # All the baskets have gone away
+            del self.__basketsByName[itemName]
+
+        return baskets
+
+    def basketsInPromoGroup(self, promoGroup):
+        """
+        Args:
+            promoGroup (str): The name of a promo group.
+
+        Returns:
+            list of Basket. The open baskets holding any items in the group.
+        """
+        counts = self.__basketsByPromoGroup.get(promoGroup)
+        if counts is None:
+            return []
+
+        baskets = counts.keys()
+        if not baskets:
+            del self.__basketsByPromoGroup[promoGroup]
+
+        return baskets
+
+    def applyChanges(self, inventory, changes):
+        """
+        Applies a set of changes to an inventory, and marks the changed items
+        for repricing in the baskets holding them. Each basket is repriced
+        the next time its price is read, and only the promo groups + items
+        which have changed are repriced.
+
+        Args:
+            inventory (Inventory): The inventory used by the indexed baskets.
+            changes (InventoryChanges): The changes to apply.
+
+        Returns:
+            list of Basket. The baskets affected by the changes.
+        """
+        inventory.applyChanges(changes)
+
+        # Find the changed names in each basket, so that each basket is only
+        # updated once. Added items can't be in any baskets yet.
+        changedNames = [item.name() for item in changes.changed()]
+        changedNames.extend(changes.removed())
+
+        namesByBasket = {}
+        for itemName in changedNames:
+            for basket in self.basketsWithItem(itemName):
+                namesByBasket.setdefault(basket, []).append(itemName)
+
+        for basket, itemNames in namesByBasket.iteritems():
+            basket.updateItems(itemNames)
+
+        return namesByBasket.keys()
@@ -0,0 +1,720 @@
+"""
+Module for pricing a stream of baskets in one go, e.g. for auditing a day's
+transactions.
+
+Baskets can be given as JSON lines, one basket per line:
+
+    {"id": "basket1", "items": ["beans", "beans", "peas"]}
+    {"id": "basket2", "items": {"beans": 2, "peas": 1}}
+
+or as CSV rows with a header, where consecutive rows with the same basket id
+make up a basket, and the count column is optional:
+
+    basketId,item,count
+    basket1,beans,2
+    basket1,peas,1
+    basket2,beans,1
+
+The baskets are read, priced + written out one at a time, so the memory used
+doesn't depend on the number of baskets. They can also be priced in parallel
+by a pool of worker processes.
+"""
+import cPickle
+import csv
+import json
+import multiprocessing
+from collections import (
+    deque,
+    OrderedDict
+)
+from itertools import (
+    groupby,
+    islice
+)
+
+from PricingCache import (
+    DefaultCacheSize,
+    PricingCache
+)
+from Receipt import formatPrice
+from ReceiptData import (
+    ReceiptDataWriter,
+    encodeReceiptData,
+    promosData,
+    receiptData,
+    toUtf8
+)
+
+
+# The supported formats for batches of baskets
+BatchFormats = ("jsonl", "csv")
+
+# The default number of baskets sent to a worker process at a time
+DefaultChunkSize = 256
+
+# The number of chunks queued for each worker process - enough to keep them
+# busy, while bounding the number of baskets held in memory
+ChunksPerWorker = 4
+
+# The keys of results which hold lists of OrderedDicts
+_ListKeys = ("entries", "promos")
+
+# The cache each worker process prices its baskets with, and the functions
+# it reads them, prices them + converts the results with
+_workerPricingCache = None
+_workerParseRecord = None
+_workerPriceResult = None
+_workerEncodeResult = None
+
+
+def batchFormatForPath(filePath):
+    """
+    Args:
+        filePath (str): Path to a batch file.
+
+    Returns:
+        str. The format of the file - "csv" for files ending in .csv,
+            otherwise "jsonl".
+    """
+    return "csv" if filePath.lower().endswith(".csv") else "jsonl"
+
+
+def readBaskets(batchFile, batchFormat="jsonl"):
+    """
+    Reads baskets from the given stream, one at a time.
+
+    Baskets which can't be read are still yielded, with an error message
+    instead of the items, so that each basket in the input gets a result.
+
+    Args:
+        batchFile (file): The stream to read from.
+        batchFormat (str): The format of the stream - one of BatchFormats.
+            (Default: "jsonl")
+
+    Raises:
+        ValueError: If the format isn't recognised.
+
+    Returns:
+        generator of (str, OrderedDict of str -> int, str). For each basket,
+            its id, the count of each item name + an error message, or None.
+    """
+    readRecords, parseRecord = _recordFunctions(batchFormat)
+
+    return (parseRecord(record) for record in readRecords(batchFile))
+
+
+def priceBasket(pricingCache, basketId, items, error=None):
+    """
+    Prices the given items.
+
+    Args:
+        pricingCache (PricingCache): The cache to price the items with.
+        basketId (str): The id of the basket.
+        items (OrderedDict of str -> int): The count of each item name.
+        error (str): An error message for a basket which couldn't be read,
+            in which case the items are ignored. (Default: None)
+
+    Returns:
+        OrderedDict. The result for the basket - its id, then either the
+            total, savings, promos + any unknown item names, or the error.
+            Prices are formatted in pounds.
+    """
+    result = OrderedDict()
+    result["id"] = basketId
+
+    if error is not None:
+        result["error"] = error
+        return result
+
+    pricedBasket = pricingCache.price(items)
+
+    result["total"] = formatPrice(pricedBasket.total())
+    result["savings"] = formatPrice(pricedBasket.savings())
+    result["promos"] = promosData(pricedBasket.promos())
+    result["unknownItems"] = list(pricedBasket.unknownNames())
+
+    return result
+
+
+def priceReceipt(pricingCache, basketId, items, error=None):
+    """
+    Prices the given items, giving the full receipt rather than just the
+    totals.
+
+    Args:
+        pricingCache (PricingCache): The cache to price the items with.
+        basketId (str): The id of the basket.
+        items (OrderedDict of str -> int): The count of each item name.
+        error (str): An error message for a basket which couldn't be read,
+            in which case the items are ignored. (Default: None)
+
+    Returns:
+        OrderedDict. The result for the basket - its id, then either the
+            receipt (see ReceiptData.receiptData) + any unknown item names,
+            or the error.
+    """
+    if error is not None:
+        return priceBasket(None, basketId, None, error)
+
+    pricedBasket = pricingCache.price(items)
+
+    result = OrderedDict()
+    result["id"] = basketId
+    result.update(receiptData(pricedBasket))
+    result["unknownItems"] = list(pricedBasket.unknownNames())
+
+    return result
+
+
+def priceBaskets(inventory, baskets, cacheSize=DefaultCacheSize):
+    """
+    Prices the given baskets, one at a time.
+
+    Args:
+        inventory (Inventory): The inventory to price the baskets with.
+        baskets (iterable of (str, OrderedDict of str -> int, str)): The
+            baskets to price, as returned by readBaskets.
+        cacheSize (int): The number of priced baskets to keep, so that
+            repeated baskets aren't priced again. (Default: DefaultCacheSize)
+
+    Returns:
+        generator of OrderedDict. The result for each basket, in order - see
+            priceBasket.
+    """
+    pricingCache = PricingCache(inventory, cacheSize)
+    for basketId, items, error in baskets:
+        yield priceBasket(pricingCache, basketId, items, error)
+
+
+def priceBatch(inventory, batchFile, batchFormat="jsonl", numWorkers=1,
+               chunkSize=DefaultChunkSize, cacheSize=DefaultCacheSize, receipts=False):
+    """
+    Reads + prices the baskets in the given stream, optionally using a pool of
+    worker processes.
+
+    The raw baskets are sent to the workers in chunks, so that reading them
+    is shared between the workers too, and the results are returned in the
+    same order as the baskets. Only a few chunks per worker are in progress
+    at once, so the memory used doesn't depend on the number of baskets.
+
+    The workers share the inventory rather than each being sent a copy -
+    they're forked with it already loaded, and snapshots + databases are
+    reopened by path in each worker.
+
+    Args:
+        inventory (Inventory): The inventory to price the baskets with.
+        batchFile (file): The stream to read the baskets from.
+        batchFormat (str): The format of the stream - one of BatchFormats.
+            (Default: "jsonl")
+        numWorkers (int): The number of worker processes to use. If <= 1,
+            the baskets are priced in this process. (Default: 1)
+        chunkSize (int): The number of baskets to send to a worker at a time.
+            (Default: DefaultChunkSize)
+        cacheSize (int): The number of priced baskets for each process to
+            keep, so that repeated baskets aren't priced again.
+            (Default: DefaultCacheSize)
+        receipts (bool): If True, give the full receipt for each basket
+            rather than just the totals. (Default: False)
+
+    Raises:
+        ValueError: If the format isn't recognised.
+
+    Returns:
+        generator of OrderedDict. The result for each basket, in order - see
+            priceBasket, or priceReceipt for receipts. Baskets which a worker
+            failed to price have an error result.
+    """
+    priceResult = priceReceipt if receipts else priceBasket
+    results = _priceBatch(inventory, batchFile, batchFormat, numWorkers,
+                          chunkSize, cacheSize, priceResult, _packResult)
+
+    return (_unpackResult(result) for result in results)
+
+
+def writeBatch(inventory, batchFile, outputFile, batchFormat="jsonl",
+               numWorkers=1, chunkSize=DefaultChunkSize, cacheSize=DefaultCacheSize,
+               receiptFormat=None):
+    """
+    Reads + prices the baskets in the given stream, writing the results to the
+    given output stream. See priceBatch.
+
+    The results are encoded by the workers, so that this process only has to
+    write them out, as they arrive.
+
+    Args:
+        inventory (Inventory): The inventory to price the baskets with.
+        batchFile (file): The stream to read the baskets from.
+        outputFile (file): The stream to write the results to.
+        batchFormat (str): The format of the stream - one of BatchFormats.
+            (Default: "jsonl")
+        numWorkers (int): The number of worker processes to use. If <= 1,
+            the baskets are priced in this process. (Default: 1)
+        chunkSize (int): The number of baskets to send to a worker at a time.
+            (Default: DefaultChunkSize)
+        cacheSize (int): The number of priced baskets for each process to
+            keep, so that repeated baskets aren't priced again.
+            (Default: DefaultCacheSize)
+        receiptFormat (str): The format to write the full receipt for each
+            basket in - one of ReceiptData.ReceiptFormats - or None to write
+            the totals as JSON lines, as returned by priceBasket.
+            (Default: None)
+
+    Raises:
+        ValueError: If either format isn't recognised.
+
+    Returns:
+        (int, int). The number of results written, and how many were errors.
+    """
+    if receiptFormat is None:
+        results = _priceBatch(inventory, batchFile, batchFormat, numWorkers,
+                              chunkSize, cacheSize, priceBasket, _encodeResult)
+        writer = None
+    else:
+        writer = ReceiptDataWriter(outputFile, receiptFormat)
+        results = _priceBatch(inventory, batchFile, batchFormat, numWorkers,
+                              chunkSize, cacheSize, priceReceipt,
+                              _receiptEncoders[receiptFormat])
+
+    numResults = 0
+    numErrors = 0
+    for encodedResult, isError in results:
+        if writer is None:
+            outputFile.write(encodedResult)
+        else:
+            writer.writeEncoded(encodedResult)
+
+        numResults += 1
+        if isError:
+            numErrors += 1
+
+    if writer is not None:
+        writer.close()
+
+    return numResults, numErrors
+
+
+# Private Functions -----------------------------------------------------------
+
+def _priceBatch(inventory, batchFile, batchFormat, numWorkers, chunkSize,
+                cacheSize, priceResult, encodeResult):
+    """
+    Reads + prices the baskets in the given stream. See priceBatch.
+
+    Args:
+        priceResult (function): The function to price each basket with - like
+            priceBasket.
+        encodeResult (function): The function to convert each result with,
+            before it's sent back from a worker.
+
+    Returns:
+        generator of object. The encoded result for each basket, in order.
+    """
+    readRecords, parseRecord = _recordFunctions(batchFormat)
+    records = readRecords(batchFile)
+
+    if numWorkers <= 1:
+        pricingCache = PricingCache(inventory, cacheSize)
+        return (_priceRecord(pricingCache, parseRecord, priceResult, encodeResult, record)
+                for record in records)
+
+    return _priceRecordsParallel(inventory, records, batchFormat, numWorkers,
+                                 chunkSize, cacheSize, priceResult, encodeResult)
+
+
+def _priceRecordsParallel(inventory, records, batchFormat, numWorkers, chunkSize,
+                          cacheSize, priceResult, encodeResult):
+    """
+    Prices the given raw baskets using a pool of worker processes. See
+    _priceBatch.
+    """
+    pool = multiprocessing.Pool(numWorkers, _initWorker,
+                                (inventory, batchFormat, cacheSize, priceResult,
+                                 encodeResult))
+    try:
+        maxPending = numWorkers * ChunksPerWorker
+        pending = deque()
+
+        for chunk in _chunks(records, chunkSize):
+            pending.append((chunk, pool.apply_async(_priceChunk, (chunk, ))))
+
+            # Wait for the oldest chunk once enough are queued
+            if len(pending) >= maxPending:
+                for result in _chunkResults(encodeResult, *pending.popleft()):
+                    yield result
+
+        while pending:
+            for result in _chunkResults(encodeResult, *pending.popleft()):
+                yield result
+
+        pool.close()
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _initWorker(inventory, batchFormat, cacheSize, priceResult, encodeResult):
+    """
+    Sets up a worker process.
+
+    Args:
+        inventory (Inventory): The inventory to price baskets with.
+        batchFormat (str): The format of the baskets.
+        cacheSize (int): The number of priced baskets to keep.
+        priceResult (function): The function to price each basket with.
+        encodeResult (function): The function to convert each result with.
+    """
+    global _workerPricingCache, _workerParseRecord, _workerPriceResult, _workerEncodeResult
+
+    # Snapshots + databases can't share their open file or connection with
+    # the parent process, so reopen them from their pickled state, which is
+    # just their path
+    if hasattr(inventory, "__getstate__"):
+        inventory = cPickle.loads(cPickle.dumps(inventory, cPickle.HIGHEST_PROTOCOL))
+
+    _workerPricingCache = PricingCache(inventory, cacheSize)
+    _workerParseRecord = _recordFunctions(batchFormat)[1]
+    _workerPriceResult = priceResult
+    _workerEncodeResult = encodeResult
+
+
+def _priceChunk(records):
+    """
+    Reads + prices a chunk of raw baskets in a worker process.
+
+    Args:
+        records (list of tuple): The raw baskets to price.
+
+    Returns:
+        list of object. The encoded result for each basket, in order.
+    """
+    return [_priceRecord(_workerPricingCache, _workerParseRecord, _workerPriceResult,
+                         _workerEncodeResult, record)
+            for record in records]
+
+
+def _priceRecord(pricingCache, parseRecord, priceResult, encodeResult, record):
+    """
+    Reads, prices + encodes a raw basket. Never raises, so that one bad
+    basket can't stop the batch.
+
+    Args:
+        pricingCache (PricingCache): The cache to price the items with.
+        parseRecord (function): The function to read the raw basket with.
+        priceResult (function): The function to price the basket with - like
+            priceBasket.
+        encodeResult (function): The function to convert the result with.
+        record (tuple): The raw basket.
+
+    Returns:
+        object. The encoded result for the basket - see priceBasket. If
+            pricing fails, an encoded error result.
+    """
+    # Report the basket by its raw id if it can't even be read
+    basketId = _recordId(record)
+    try:
+        basketId, items, error = parseRecord(record)
+        return encodeResult(priceResult(pricingCache, basketId, items, error))
+
+    except Exception as exception:
+        return encodeResult(priceBasket(None, basketId, None,
+                                        "couldn't price basket - %s" % exception))
+
+
+def _chunkResults(encodeResult, records, asyncResult):
+    """
+    Waits for a worker process to price a chunk of raw baskets.
+
+    Args:
+        encodeResult (function): The function the results are converted with.
+        records (list of tuple): The raw baskets sent to the worker.
+        asyncResult (multiprocessing.pool.AsyncResult): The pending result.
+
+    Returns:
+        list of object. The encoded result for each basket, in order - if the
+            worker failed, an error result for each basket.
+    """
+    try:
+        return asyncResult.get()
+
+    except Exception as exception:
+        # Don't read the baskets again here - if one of them broke the worker,
+        # it could break this process too
+        return [encodeResult(priceBasket(None, _recordId(record), None,
+                                         "worker failed - %s" % exception))
+                for record in records]
+
+
+def _encodeResult(result):
+    """
+    Args:
+        result (OrderedDict): A result returned by priceBasket.
+
+    Returns:
+        (str, bool). The result as a JSON line, and whether it's an error.
+    """
+    return "%s\n" % json.dumps(result), "error" in result
+
+
+def _encodeJsonReceipt(result):
+    """
+    Args:
+        result (OrderedDict): A result returned by priceReceipt.
+
+    Returns:
+        (str, bool). The result as JSON, and whether it's an error.
+    """
+    return encodeReceiptData(result, "json"), "error" in result
+
+
+def _encodeCsvReceipt(result):
+    """
+    Args:
+        result (OrderedDict): A result returned by priceReceipt.
+
+    Returns:
+        (str, bool). The result as CSV rows, and whether it's an error.
+    """
+    return encodeReceiptData(result, "csv"), "error" in result
+
+
+# Dictionary mapping receipt format -> function to encode receipts with
+_receiptEncoders = {
+    "json": _encodeJsonReceipt,
+    "jsonl": _encodeResult,
+    "csv": _encodeCsvReceipt,
+}
+
+
+def _packResult(result):
+    """
+    Converts a result to nested tuples, which are much quicker to pickle than
+    OrderedDicts.
+
+    Args:
+        result (OrderedDict): A result returned by priceBasket or
+            priceReceipt.
+
+    Returns:
+        tuple. The packed result.
+    """
+    packed = []
+    for key, value in result.iteritems():
+        if key in _ListKeys:
+            value = [tuple(element.iteritems()) for element in value]
+
+        packed.append((key, value))
+
+    return tuple(packed)
+
+
+def _unpackResult(packed):
+    """
+    Args:
+        packed (tuple): A result packed by _packResult.
+
+    Returns:
+        OrderedDict. The result.
+    """
+    result = OrderedDict(packed)
+    for key in _ListKeys:
+        if key in result:
+            result[key] = [OrderedDict(element) for element in result[key]]
+
+    return result
+
+
+def _chunks(iterable, chunkSize):
+    """
+    Args:
+        iterable (iterable): The values to split up.
+        chunkSize (int): The maximum number of values in each chunk.
+
+    Returns:
+        generator of list. The values, in consecutive chunks.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunkSize))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def _recordId(record):
+    """
+    Args:
+        record (tuple): A raw basket, as read by _readJsonRecords or
+            _readCsvRecords.
+
+    Returns:
+        str. The id of the basket, without reading it - the line number for
+            JSON lines, or the basket id for CSV.
+    """
+    return toUtf8(record[0])
+
+
+def _recordFunctions(batchFormat):
+    """
+    Args:
+        batchFormat (str): The format of a batch - one of BatchFormats.
+
+    Raises:
+        ValueError: If the format isn't recognised.
+
+    Returns:
+        (function, function). The functions to split a stream of this format
+            into raw baskets, and to read a raw basket.
+    """
+    if batchFormat == "jsonl":
+        return _readJsonRecords, _parseJsonRecord
+
+    if batchFormat == "csv":
+        return _readCsvRecords, _parseCsvRecord
+
+    raise ValueError("Unknown batch format: %r - expected one of %s"
+                     % (batchFormat, ", ".join(BatchFormats)))
+
+
+def _readJsonRecords(batchFile):
+    """
+    Args:
+        batchFile (file): A stream of JSON lines.
+
+    Returns:
+        generator of (int, str). The line number + contents of each non-blank
+            line.
+    """
+    lineNumber = 0
+    for line in batchFile:
+        lineNumber += 1
+        if line.strip():
+            yield lineNumber, line
+
+
+def _parseJsonRecord(record):
+    """
+    Args:
+        record ((int, str)): A line number + JSON line.
+
+    Returns:
+        (str, OrderedDict of str -> int, str). The basket - see readBaskets.
+    """
+    lineNumber, line = record
+
+    # Baskets without an id are identified by their line number
+    basketId = str(lineNumber)
+    try:
+        value = json.loads(line)
+        if isinstance(value, dict):
+            basketId = toUtf8(value.get("id", basketId))
+            items = value.get("items")
+        else:
+            items = value
+
+        return basketId, _countItems(items), None
+
+    except ValueError as exception:
+        return basketId, None, "invalid basket on line %d - %s" % (lineNumber, exception)
+
+
+def _readCsvRecords(batchFile):
+    """
+    Args:
+        batchFile (file): A stream of CSV rows, with a header.
+
+    Returns:
+        generator of (str, list of (int, list of str)). The id of each basket,
+            with the line number + columns of each of its rows.
+    """
+    reader = csv.reader(batchFile)
+
+    # Skip the header
+    next(reader, None)
+
+    rows = ((reader.line_num, row) for row in reader if row)
+    for basketId, basketRows in groupby(rows, key=lambda numberedRow: numberedRow[1][0]):
+        yield basketId, list(basketRows)
+
+
+def _parseCsvRecord(record):
+    """
+    Args:
+        record ((str, list of (int, list of str))): A basket id + its rows.
+
+    Returns:
+        (str, OrderedDict of str -> int, str). The basket - see readBaskets.
+    """
+    basketId, rows = record
+
+    items = OrderedDict()
+    for lineNumber, row in rows:
+        try:
+            if len(row) < 2 or len(row) > 3:
+                raise ValueError("expected 2 or 3 columns, got %d" % len(row))
+
+            count = _parseCount(row[2]) if len(row) == 3 and row[2] else 1
+            itemName = row[1].strip()
+            items[itemName] = items.get(itemName, 0) + count
+
+        except ValueError as exception:
+            return basketId, None, "invalid basket on line %d - %s" % (lineNumber, exception)
+
+    return basketId, items, None
+
+
+def _countItems(items):
+    """
+    Args:
+        items (list of str, or dict of str -> int): The item names in a basket,
+            or the count of each item name.
+
+    Raises:
+        ValueError: If the items aren't a list of names or a dictionary of
+            counts.
+
+    Returns:
+        OrderedDict of str -> int. The count of each item name.
+    """
+    counts = OrderedDict()
+    if isinstance(items, dict):
+        for itemName, count in items.iteritems():
+            counts[toUtf8(itemName)] = _parseCount(count)
+
+    elif isinstance(items, list):
+        for itemName in items:
+            if not isinstance(itemName, basestring):
+                raise ValueError("item names must be strings - got %r" % (itemName, ))
+
+            itemName = toUtf8(itemName)
+            counts[itemName] = counts.get(itemName, 0) + 1
+
+    else:
+        raise ValueError("items must be a list of names or a dictionary of counts")
+
+    return counts
+
+
+def _parseCount(count):
+    """
+    Args:
+        count (int or str): An item count.
+
+    Raises:
+        ValueError: If the count isn't a positive integer.
+
+    Returns:
+        int. The count.
+    """
+    if isinstance(count, basestring) and count.strip().isdigit():
+        value = int(count)
+    elif isinstance(count, (int, long)) and not isinstance(count, bool):
+        value = count
+    else:
+        raise ValueError("count must be a positive integer - got %r" % (count, ))
+
+    if value < 1:
+        raise ValueError("count must be a positive integer - got %r" % (count, ))
+
+    return value
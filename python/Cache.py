@@ -0,0 +1,124 @@
+""" Module providing a bounded least-recently-used cache. """
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Class providing a dictionary-like cache holding at most a fixed number of
+    entries, which discards the least recently used entry when full.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, maxSize):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            maxSize (int): The maximum number of entries to hold.
+
+        Raises:
+            ValueError: If the given size is < 1.
+        """
+        if maxSize < 1:
+            raise ValueError("Cache size must be >= 1 - got %r" % maxSize)
+
+        self.__maxSize = maxSize
+        self.__entries = OrderedDict()
+
+        # Counters for reporting how well the cache is doing
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    # Public Instance Methods -------------------------------------------------
+
+    def get(self, key, default=None):
+        """
+        Looks up an entry, marking it as the most recently used.
+
+        Args:
+            key (hashable): The key to look up.
+            default (object): The value to return if the key isn't cached.
+                (Default: None)
+
+        Returns:
+            object. The cached value, or the default.
+        """
+        try:
+            value = self.__entries.pop(key)
+        except KeyError:
+            self.__misses += 1
+            return default
+
+        self.__entries[key] = value
+        self.__hits += 1
+
+        return value
+
+    def put(self, key, value):
+        """
+        Adds or replaces an entry, discarding the least recently used entry
+        if the cache is full.
+
+        Args:
+            key (hashable): The key to store.
+            value (object): The value to store.
+        """
+        entries = self.__entries
+        if key in entries:
+            del entries[key]
+        elif len(entries) >= self.__maxSize:
+            entries.popitem(last=False)
+            self.__evictions += 1
+
+        entries[key] = value
+
+    def remove(self, key):
+        """
+        Discards an entry, if it's cached.
+
+        Args:
+            key (hashable): The key to discard.
+        """
+        self.__entries.pop(key, None)
+
+    def clear(self):
+        """
+        Discards all entries.
+        """
+        self.__entries.clear()
+
+    def maxSize(self):
+        """
+        Returns:
+            int. The maximum number of entries held.
+        """
+        return self.__maxSize
+
+    def stats(self):
+        """
+        Returns:
+            dict. The number of hits, misses + evictions so far, and the
+                current number of entries.
+        """
+        return {
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "evictions": self.__evictions,
+            "size": len(self.__entries),
+        }
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of entries currently held.
+        """
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        """
+        Returns:
+            bool. True if the key is cached. Doesn't count as a use.
+        """
+        return key in self.__entries
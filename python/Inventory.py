@@ -1,9 +1,36 @@
 import csv
+import multiprocessing
 import os
+from array import array
+from collections import OrderedDict
+from cStringIO import StringIO
+
+from Item import (
+    Item,
+    parsePrice
+)
+from Receipt import formatPrice
+
+# Files smaller than this are always parsed in a single process
+MinParallelFileSize = 1 << 20
+
+# The number of chunks to split a file into for each parsing process, so that
+# the work is spread evenly even if some chunks are slower to parse
+ChunksPerProcess = 4
+
+# The size of the blocks read when scanning a file for chunk boundaries
+_ScanBlockSize = 1 << 22
 
-from Item import Item
 
 class Inventory(object):
+    """
+    Class representing the items available to buy.
+
+    The items are stored in columns rather than as Item instances - each item
+    has an index into a list of names, an array of prices, and an array of
+    promo group codes. The promo group names are interned into a small table
+    which the codes index into.
+    """
 
     # Initializer -------------------------------------------------------------
 
@@ -11,7 +38,10 @@ class Inventory(object):
         """
         Initializes an instance of the class.
         """
-        self.__items = {}
+        # Counter which changes whenever the contents do
+        self.__version = 0
+
+        self.__clear()
 
     # Public Instance Methods -------------------------------------------------
 
@@ -25,8 +55,7 @@ class Inventory(object):
         Args:
             item (Item): The item to add.
         """
-        itemName = item.name()
-        self.__items[item.name()] = item
+        self.__addRow(item.name(), item.price(), item.promoGroup())
 
     def addItems(self, items):
         """
@@ -41,60 +70,219 @@ class Inventory(object):
         for item in items:
             self.addItem(item)
 
-    def readFromDisk(self, filePath):
+    def readFromDisk(self, filePath, numProcesses=1, warn=None):
         """
         Replaces the inventory with the contents of the given CSV file.
 
+        If more than one process is requested, the file is split into chunks
+        on record boundaries, and the chunks are parsed in separate processes.
+        The result is the same as reading the file in a single process.
+
         Args:
             filePath (str): Path to the file to read.
+            numProcesses (int): The number of processes to parse the file
+                with. (Default: 1)
+            warn (function): The function to report each bad row in the file
+                with, given the warning message, or None to print them.
+                (Default: None)
 
         Raises:
             IOError: If a readable file doesn't exist at the given path.
         """
+        if warn is None:
+            warn = printWarning
+
         # Clear the existing contents
-        self.__items = {}
+        self.__clear()
 
         # This will raise IOError if the file can't be opened for reading
         with open(filePath) as csvFile:
-            csvReader = csv.reader(csvFile, delimiter=',')
-            lineCount = 0
-
-            for row in csvReader:
-                rowLength = len(row)
-                if lineCount == 0:
-                    # Check the header row
-                    if (rowLength < 3):
-                        print("[WARNING] : bad header row: %r" % row)
-                    else:
-                        if (row[0] != "name"
-                                or row[1] != "price"
-                                or row[2] != "promoGroup"):
-                            print("[WARNING] : bad header row: %r - expected "
-                                  "'name,price,promoGroup'")
-
-                elif rowLength > 0:
-                    if rowLength < 2:
-                        print("[WARNING] : bad inventory entry: %r" % row)
-                    else:
-                        name = row[0]
+            fileStat = os.fstat(csvFile.fileno())
+            fileSize = fileStat.st_size
+            self.__source = (filePath, fileStat.st_mtime, fileSize)
+
+            if numProcesses <= 1 or fileSize < MinParallelFileSize:
+                rows = _parseRecords(csvFile, 1, True, warn)
+                for name, price, promoGroup in rows:
+                    self.__addRow(name, price, promoGroup)
+
+                return
+
+            chunks = _findChunks(csvFile, fileSize, numProcesses * ChunksPerProcess, warn)
+
+        # Parse the chunks in parallel, and add the rows in file order so
+        # that the last of any duplicate names wins
+        tasks = [(filePath, start, end, firstLineNumber)
+                 for start, end, firstLineNumber in chunks]
+
+        pool = multiprocessing.Pool(numProcesses)
+        try:
+            for rows, warnings in pool.imap(_parseChunk, tasks):
+                for warning in warnings:
+                    warn(warning)
 
-                        # Be cautious about the price - might not like being
-                        # converted to a float
-                        try:
-                            price = float(row[1])
-                        except ValueError as exception:
-                            print("[WARNING] : bad price for inventory entry: %r" % row)
-                            continue
+                for name, price, promoGroup in rows:
+                    self.__addRow(name, price, promoGroup)
+
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def reloadFromDisk(self, filePath, numProcesses=1):
+        """
+        Updates the inventory to match the contents of the given CSV file,
+        applying only the items which have been added, changed or removed.
+
+        If the file is the one last read, and its modification time + size
+        haven't changed, it isn't read again.
+
+        Args:
+            filePath (str): Path to the file to read.
+            numProcesses (int): The number of processes to parse the file
+                with. (Default: 1)
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes made to the inventory.
+        """
+        with open(filePath) as csvFile:
+            fileStat = os.fstat(csvFile.fileno())
 
-                        if rowLength > 2:
-                            promoGroup = row[2]
-                        else:
-                            promoGroup = ""
+        source = (filePath, fileStat.st_mtime, fileStat.st_size)
+        if source == self.__source:
+            return InventoryChanges()
 
-                        item = Item(name, price, promoGroup)
-                        self.addItem(item)
+        changes = self.diffFromDisk(filePath, numProcesses)
+        self.applyChanges(changes)
+        self.__source = source
 
-                lineCount += 1
+        return changes
+
+    def diffFromDisk(self, filePath, numProcesses=1):
+        """
+        Compares the inventory with the contents of the given CSV file,
+        without changing the inventory.
+
+        Args:
+            filePath (str): Path to the file to read.
+            numProcesses (int): The number of processes to parse the file
+                with. (Default: 1)
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes which would make the inventory match
+                the file.
+        """
+        newInventory = Inventory()
+        newInventory.readFromDisk(filePath, numProcesses)
+
+        return self.diff(newInventory)
+
+    def diff(self, other):
+        """
+        Compares the inventory with another inventory.
+
+        Args:
+            other (Inventory): The inventory to compare with.
+
+        Returns:
+            InventoryChanges. The changes which would make this inventory
+                match the other inventory.
+        """
+        addedItems = []
+        changedItems = []
+
+        for otherIndex, name in enumerate(other.__names):
+            price = other.__prices[otherIndex]
+            promoGroup = other.__promoGroups[other.__promoGroupCodes[otherIndex]]
+
+            index = self.__indexByName.get(name)
+            if index is None:
+                addedItems.append(Item(name, price, promoGroup))
+
+            elif (self.__prices[index] != price
+                    or self.__promoGroups[self.__promoGroupCodes[index]] != promoGroup):
+                changedItems.append(Item(name, price, promoGroup))
+
+        removedNames = [name for name in self.__names
+                        if name not in other.__indexByName]
+
+        return InventoryChanges(addedItems, changedItems, removedNames)
+
+    def readDeltaFromDisk(self, filePath):
+        """
+        Reads a delta CSV file, and works out the changes it would make to the
+        inventory, without changing the inventory.
+
+        A delta file has a header row of 'op,name,price,promoGroup', followed
+        by rows with an op of 'set' to add or update an item, or 'delete' to
+        remove an item (in which case the price + promo group can be left
+        out). Later rows for the same item override earlier ones.
+
+        Args:
+            filePath (str): Path to the file to read.
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes the delta would make.
+        """
+        return changesFromItems(self, readDelta(filePath))
+
+    def applyDeltaFromDisk(self, filePath):
+        """
+        Applies the changes in a delta CSV file to the inventory. See
+        readDeltaFromDisk for the format of the file.
+
+        Args:
+            filePath (str): Path to the file to read.
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes made to the inventory.
+        """
+        changes = self.readDeltaFromDisk(filePath)
+        self.applyChanges(changes)
+
+        return changes
+
+    def copy(self):
+        """
+        Returns:
+            Inventory. A new inventory with the same contents as this one.
+        """
+        inventory = Inventory()
+        inventory.__indexByName = dict(self.__indexByName)
+        inventory.__names = list(self.__names)
+        inventory.__prices = array("l", self.__prices)
+        inventory.__promoGroupCodes = array("i", self.__promoGroupCodes)
+        inventory.__promoGroups = list(self.__promoGroups)
+        inventory.__promoGroupCodesByName = dict(self.__promoGroupCodesByName)
+
+        return inventory
+
+    def applyChanges(self, changes):
+        """
+        Applies a set of changes to the inventory.
+
+        Args:
+            changes (InventoryChanges): The changes to apply.
+        """
+        for item in changes.added():
+            self.addItem(item)
+
+        for item in changes.changed():
+            self.addItem(item)
+
+        for name in changes.removed():
+            self.__removeRow(name)
 
     def getItem(self, itemName):
         """
@@ -102,36 +290,492 @@ class Inventory(object):
             Item or None. The item in our inventory with the given name, or
                 None if no such item was found.
         """
-        return self.__items.get(itemName)
+        index = self.__indexByName.get(itemName)
+        if index is None:
+            return None
+
+        return self.__itemAt(index)
 
     def getItems(self):
         """
         Returns:
             list of Item. The items in our inventory.
         """
-        return list(self.__items.values())
+        return [self.__itemAt(index) for index in xrange(len(self.__names))]
 
     def getItemsPretty(self):
         """
         Returns:
             str. A nicely formatted string representing the items in our inventory.
         """
-        # Get the longest entry in each field
-        maxNameLength = 0
-        maxPriceLength = 0
+        return formatItemsPretty(self.getItems())
+
+    def version(self):
+        """
+        Returns:
+            int. A number which changes whenever the contents of the
+                inventory change.
+        """
+        return self.__version
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of items in our inventory.
+        """
+        return len(self.__names)
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __clear(self):
+        """
+        Empties the inventory.
+        """
+        # Dictionary mapping item name -> index into the columns
+        self.__indexByName = {}
+
+        # The columns - the name, price (in pence) and promo group code of the
+        # item at each index
+        self.__names = []
+        self.__prices = array("l")
+        self.__promoGroupCodes = array("i")
+
+        # The promo group name for each promo group code, and the reverse.
+        # Code 0 is always the empty promo group.
+        self.__promoGroups = [""]
+        self.__promoGroupCodesByName = {"": 0}
+
+        # The path, modification time + size of the file last read
+        self.__source = None
+
+        self.__version += 1
+
+    def __addRow(self, name, price, promoGroup):
+        """
+        Adds an item to the columns, overwriting any item with the same name.
+
+        Args:
+            name (str): The name of the item.
+            price (int): The price of the item, in pence.
+            promoGroup (str): The name of the item's promo group.
+        """
+        promoGroupCode = self.__promoGroupCodesByName.get(promoGroup)
+        if promoGroupCode is None:
+            promoGroupCode = len(self.__promoGroups)
+            self.__promoGroups.append(promoGroup)
+            self.__promoGroupCodesByName[promoGroup] = promoGroupCode
+
+        self.__version += 1
+
+        index = self.__indexByName.get(name)
+        if index is None:
+            self.__indexByName[name] = len(self.__names)
+            self.__names.append(name)
+            self.__prices.append(price)
+            self.__promoGroupCodes.append(promoGroupCode)
+        else:
+            self.__prices[index] = price
+            self.__promoGroupCodes[index] = promoGroupCode
+
+    def __removeRow(self, name):
+        """
+        Removes an item from the columns, if it's present. The last row is
+        moved into its place, so that the columns stay contiguous.
+
+        Args:
+            name (str): The name of the item to remove.
+        """
+        index = self.__indexByName.pop(name, None)
+        if index is None:
+            return
+
+        self.__version += 1
+
+        lastIndex = len(self.__names) - 1
+        if index != lastIndex:
+            lastName = self.__names[lastIndex]
+            self.__names[index] = lastName
+            self.__prices[index] = self.__prices[lastIndex]
+            self.__promoGroupCodes[index] = self.__promoGroupCodes[lastIndex]
+            self.__indexByName[lastName] = index
+
+        self.__names.pop()
+        self.__prices.pop()
+        self.__promoGroupCodes.pop()
+
+    def __itemAt(self, index):
+        """
+        Args:
+            index (int): The index of the item in the columns.
+
+        Returns:
+            Item. A new Item for the row at the given index.
+        """
+        return Item(self.__names[index],
+                    self.__prices[index],
+                    self.__promoGroups[self.__promoGroupCodes[index]])
+
+
+class InventoryChanges(object):
+    """
+    Class describing the items added to, changed in and removed from an
+    inventory.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, addedItems=(), changedItems=(), removedNames=()):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            addedItems (list of Item): The items which are new.
+                (Default: none)
+            changedItems (list of Item): The new values of the items whose
+                price or promo group has changed. (Default: none)
+            removedNames (list of str): The names of the items which have been
+                removed. (Default: none)
+        """
+        self.__addedItems = list(addedItems)
+        self.__changedItems = list(changedItems)
+        self.__removedNames = list(removedNames)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def added(self):
+        """
+        Returns:
+            list of Item. The items which are new.
+        """
+        return list(self.__addedItems)
+
+    def changed(self):
+        """
+        Returns:
+            list of Item. The new values of the items which have changed.
+        """
+        return list(self.__changedItems)
+
+    def removed(self):
+        """
+        Returns:
+            list of str. The names of the items which have been removed.
+        """
+        return list(self.__removedNames)
+
+    def isEmpty(self):
+        """
+        Returns:
+            bool. True if there are no changes.
+        """
+        return not (self.__addedItems or self.__changedItems or self.__removedNames)
+
+    def __repr__(self):
+        """
+        Returns:
+            str. A string representation of the changes.
+        """
+        return ("InventoryChanges <added=%d, changed=%d, removed=%d>"
+                % (len(self.__addedItems), len(self.__changedItems),
+                   len(self.__removedNames)))
+
+
+def readDelta(filePath):
+    """
+    Reads a delta CSV file. See Inventory.readDeltaFromDisk for the format of
+    the file.
+
+    Args:
+        filePath (str): Path to the file to read.
+
+    Raises:
+        IOError: If a readable file doesn't exist at the given path.
+
+    Returns:
+        OrderedDict of str -> Item. The new value of each item in the delta,
+            or None if the item is deleted.
+    """
+    newItems = OrderedDict()
+
+    with open(filePath) as csvFile:
+        for name, price, promoGroup in _parseDeltaRecords(csvFile, printWarning):
+            if price is None:
+                newItems[name] = None
+            else:
+                newItems[name] = Item(name, price, promoGroup)
+
+    return newItems
+
+
+def changesFromItems(inventory, newItems):
+    """
+    Works out the changes that setting the given items would make to an
+    inventory.
+
+    Args:
+        inventory (Inventory): The inventory to compare with. Any object with
+            a getItem method can be used.
+        newItems (dict of str -> Item): The new value of each item, or None if
+            the item is to be removed.
+
+    Returns:
+        InventoryChanges. The changes, leaving out any items which would stay
+            the same.
+    """
+    addedItems = []
+    changedItems = []
+    removedNames = []
+
+    for name, item in newItems.iteritems():
+        currentItem = inventory.getItem(name)
+        if item is None:
+            if currentItem is not None:
+                removedNames.append(name)
+
+        elif currentItem is None:
+            addedItems.append(item)
+
+        elif not currentItem == item:
+            changedItems.append(item)
+
+    return InventoryChanges(addedItems, changedItems, removedNames)
+
+
+def formatItemsPretty(items):
+    """
+    Args:
+        items (list of Item): The items to format.
+
+    Returns:
+        str. A nicely formatted string representing the items, one per line.
+    """
+    # Get the longest entry in each field
+    maxNameLength = max([len(item.name()) for item in items] or [0])
+    maxPriceLength = max([len(formatPrice(item.price())) for item in items] or [0])
+
+    lines = []
+    for item in items:
+        name = item.name().ljust(maxNameLength)
+        price = formatPrice(item.price()).rjust(maxPriceLength)
+
+        line = "%s @ %s - %s" % (name, price, item.promoGroup())
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def printWarning(message):
+    """
+    Prints a warning about the contents of an inventory file.
+
+    Args:
+        message (str): The warning to print.
+    """
+    print("[WARNING] : %s" % message)
+
+
+def _parseRecords(lines, firstLineNumber, hasHeader, warn):
+    """
+    Parses the records of an inventory CSV file.
+
+    Args:
+        lines (iterable of str): The lines to parse.
+        firstLineNumber (int): The line number in the file of the first line.
+        hasHeader (bool): Whether the first record is the header row.
+        warn (callable): Function to call with a message for each bad record.
+
+    Returns:
+        generator of (str, int, str). The name, price (in pence) and promo
+            group of each valid record.
+    """
+    csvReader = csv.reader(lines, delimiter=',')
+    lineCount = 0
+
+    # The line number on which the current record starts
+    lineNumber = firstLineNumber
+
+    for row in csvReader:
+        rowLength = len(row)
+        if lineCount == 0 and hasHeader:
+            # Check the header row
+            if (rowLength < 3):
+                warn("bad header row on line %d: %r" % (lineNumber, row))
+            else:
+                if (row[0] != "name"
+                        or row[1] != "price"
+                        or row[2] != "promoGroup"):
+                    warn("bad header row on line %d: %r - expected "
+                         "'name,price,promoGroup'" % (lineNumber, row))
+
+        elif rowLength > 0:
+            if rowLength < 2:
+                warn("bad inventory entry on line %d: %r" % (lineNumber, row))
+            else:
+                name = row[0]
+
+                # Be cautious about the price - might not like being
+                # converted to pence
+                try:
+                    price = parsePrice(row[1])
+                except ValueError as exception:
+                    warn("bad price for inventory entry on line %d: %r" % (lineNumber, row))
+                    price = None
+
+                if price is not None:
+                    if rowLength > 2:
+                        promoGroup = row[2]
+                    else:
+                        promoGroup = ""
+
+                    yield name, price, promoGroup
+
+        lineCount += 1
+        lineNumber = firstLineNumber + csvReader.line_num
+
+
+def _parseDeltaRecords(lines, warn):
+    """
+    Parses the records of an inventory delta CSV file.
+
+    Args:
+        lines (iterable of str): The lines to parse.
+        warn (callable): Function to call with a message for each bad record.
+
+    Returns:
+        generator of (str, int, str). The name, price (in pence) and promo
+            group of each valid record, or (name, None, None) for a deletion.
+    """
+    csvReader = csv.reader(lines, delimiter=',')
+    lineNumber = 1
+
+    for row in csvReader:
+        rowLength = len(row)
+        if lineNumber == 1:
+            # Check the header row
+            if row[:4] != ["op", "name", "price", "promoGroup"]:
+                warn("bad delta header row on line %d: %r - expected "
+                     "'op,name,price,promoGroup'" % (lineNumber, row))
+
+        elif rowLength > 0:
+            op = row[0]
+            if op == "delete" and rowLength >= 2:
+                yield row[1], None, None
+
+            elif op == "set" and rowLength >= 3:
+                try:
+                    price = parsePrice(row[2])
+                except ValueError as exception:
+                    warn("bad price for delta entry on line %d: %r" % (lineNumber, row))
+                    price = None
+
+                if price is not None:
+                    if rowLength > 3:
+                        promoGroup = row[3]
+                    else:
+                        promoGroup = ""
+
+                    yield row[1], price, promoGroup
+
+            else:
+                warn("bad delta entry on line %d: %r" % (lineNumber, row))
+
+        lineNumber = 1 + csvReader.line_num
+
+
+def _findChunks(csvFile, fileSize, numChunks, warn):
+    """
+    Splits a CSV file into roughly equal chunks, which start + end on record
+    boundaries - i.e. on line breaks which aren't inside a quoted field.
+
+    A quote which doesn't start or end a field (e.g. a stray quote in the
+    middle of a name) throws off the count of quotes, so the rest of the file
+    looks like it's inside quotes, and is left as one chunk.
+
+    Args:
+        csvFile (file): The open CSV file.
+        fileSize (int): The size of the file, in bytes.
+        numChunks (int): The number of chunks to aim for.
+        warn (callable): Function to call with a message if the file can't
+            be split into that many chunks because of unbalanced quotes.
+
+    Returns:
+        list of (int, int, int). The start + end offset of each chunk, and the
+            line number of its first line.
+    """
+    chunks = []
+    start = 0
+    firstLineNumber = 1
+
+    # The position we've scanned up to, and whether that's inside quotes
+    position = 0
+    inQuotes = False
+    lineNumber = 1
+
+    for chunkIndex in xrange(1, numChunks):
+        target = max(fileSize * chunkIndex / numChunks, position)
+
+        # Count the quotes + lines up to the target. Escaped quotes are
+        # doubled, so they don't change whether we're inside quotes.
+        csvFile.seek(position)
+        while position < target:
+            block = csvFile.read(min(_ScanBlockSize, target - position))
+            if not block:
+                break
+
+            inQuotes ^= block.count('"') % 2 == 1
+            lineNumber += block.count("\n")
+            position += len(block)
+
+        # Then find the next line break outside quotes
+        csvFile.seek(position)
+        boundary = None
+        for line in csvFile:
+            inQuotes ^= line.count('"') % 2 == 1
+            position += len(line)
+            if line.endswith("\n"):
+                lineNumber += 1
+                if not inQuotes:
+                    boundary = position
+                    break
+
+        if boundary is None:
+            if inQuotes:
+                warn("unbalanced quotes after line %d - split the file into %d chunk(s) "
+                     "rather than %d"
+                     % (firstLineNumber, len(chunks) + 1, numChunks))
+
+            break
+
+        chunks.append((start, boundary, firstLineNumber))
+        start = boundary
+        firstLineNumber = lineNumber
+
+    chunks.append((start, fileSize, firstLineNumber))
+
+    return chunks
+
+
+def _parseChunk(task):
+    """
+    Parses a chunk of an inventory CSV file. Run in a worker process.
 
-        for item in self.__items.itervalues():
-            maxNameLength = max(maxNameLength, len(item.name()))
-            maxPriceLength = max(maxPriceLength, len("%.2f" % item.price()))
+    Args:
+        task (tuple of (str, int, int, int)): The path of the file, the start
+            + end offset of the chunk, and the line number of its first line.
 
-        lines = []
-        for item in self.__items.itervalues():
-            name = item.name().ljust(maxNameLength)
-            price = ("%.2f" % item.price()).rjust(maxPriceLength)
-            promoGroup = item.promoGroup()
+    Returns:
+        tuple of (list of (str, int, str), list of str). The name, price (in
+            pence) and promo group of each valid record, and the warnings for
+            any bad records.
+    """
+    filePath, start, end, firstLineNumber = task
 
-            line = "%s @ %s - %s" % (name, price, promoGroup)
-            lines.append(line)
+    with open(filePath) as csvFile:
+        csvFile.seek(start)
+        data = csvFile.read(end - start)
 
-        return "\n".join(lines)
+    warnings = []
+    rows = list(_parseRecords(StringIO(data), firstLineNumber, start == 0,
+                              warnings.append))
 
+    return rows, warnings
@@ -1,13 +1,68 @@
 
+import re
+from decimal import (
+    Decimal,
+    InvalidOperation,
+    ROUND_HALF_UP
+)
+
+# Regex matching prices with at most two decimal places
+_simplePriceRegex = re.compile(r"^(-?)(\d+)(?:\.(\d{0,2}))?$")
+
+
+def parsePrice(text):
+    """
+    Parses a price in pounds into an exact number of pence.
+
+    Args:
+        text (str): The price to parse, e.g. "1.25".
+
+    Raises:
+        ValueError: If the text isn't a valid, finite price.
+
+    Returns:
+        int. The price in pence, rounded to the nearest penny.
+    """
+    text = text.strip()
+
+    # Fast path for the common case of plain prices with up to two decimal
+    # places, which don't need rounding
+    match = _simplePriceRegex.match(text)
+    if match is not None:
+        sign, pounds, pence = match.groups()
+        price = int(pounds) * 100 + int((pence or "").ljust(2, "0"))
+        return -price if sign else price
+
+    try:
+        price = Decimal(text)
+    except InvalidOperation:
+        raise ValueError("Invalid price: %r" % text)
+
+    if not price.is_finite():
+        raise ValueError("Invalid price: %r" % text)
+
+    pence = (price * 100).quantize(Decimal(1), ROUND_HALF_UP)
+
+    return int(pence)
+
 
 class Item(object):
+    """
+    Class representing an item in the inventory.
+
+    Uses __slots__ rather than a per-instance __dict__, since inventories can
+    hold millions of items.
+    """
+
+    __slots__ = ("__name", "__price", "__promoGroup")
+
     def __init__(self, name, price, promoGroup=""):
         """
         Initializes an instance of the class.
 
         Args:
             name (str): Name of the item.
-            price (float): Price of the item.
+            price (int): Price of the item, in pence.
             promoGroup (str): Name of the item's promo group. (Optional)
         """
         self.__name = name
@@ -0,0 +1,275 @@
+""" Module providing a cache of basket prices, for pricing repeated baskets. """
+from collections import OrderedDict
+
+from Basket import Basket
+from Cache import LRUCache
+
+
+# The default number of priced baskets to keep in memory
+DefaultCacheSize = 4096
+
+
+class PricedBasket(object):
+    """
+    Class holding the result of pricing a basket.
+    """
+
+    __slots__ = ("__total", "__savings", "__promos", "__unknownNames", "__entries")
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, total, savings, promos, unknownNames, entries=()):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            total (int): The cost of the basket in pence, taking offers into
+                account.
+            savings (int): The total savings from offers, in pence.
+            promos (list of _PromoEntry): The offers in the basket.
+            unknownNames (list of str): The names of any items which weren't
+                found in the inventory.
+            entries (list of BasketEntry): The entries in the basket, which
+                mustn't be changed afterwards. (Default: none)
+        """
+        self.__total = total
+        self.__savings = savings
+        self.__promos = tuple(promos)
+        self.__unknownNames = tuple(unknownNames)
+        self.__entries = tuple(entries)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def total(self):
+        """
+        Returns:
+            int. The cost of the basket in pence, taking offers into account.
+        """
+        return self.__total
+
+    def savings(self):
+        """
+        Returns:
+            int. The total savings from offers, in pence.
+        """
+        return self.__savings
+
+    def promos(self, expand=False):
+        """
+        Args:
+            expand (bool): If True, identical promos are listed separately,
+                rather than as a single promo with a multiplicity.
+                (Default: False)
+
+        Returns:
+            tuple of _PromoEntry. The offers in the basket.
+        """
+        if expand:
+            return tuple(single for promo in self.__promos for single in promo.expand())
+
+        return self.__promos
+
+    def entries(self):
+        """
+        Returns:
+            tuple of BasketEntry. The entries in the basket.
+        """
+        return self.__entries
+
+    def unknownNames(self):
+        """
+        Returns:
+            tuple of str. The names of any items which weren't found in the
+                inventory, in the order they were first seen.
+        """
+        return self.__unknownNames
+
+
+class PricingCache(object):
+    """
+    Class pricing baskets of items from an inventory, keeping the most
+    recently priced baskets so that identical baskets aren't priced again.
+
+    Baskets are identified by the inventory's version and the sorted count of
+    each item name, so the order the items are given in doesn't matter. When
+    the inventory changes, all the cached prices are discarded.
+
+    Not thread-safe - use a separate cache for each thread.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, inventory, maxSize=DefaultCacheSize):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            inventory (Inventory): The inventory to price baskets with. Must
+                have a version method, like Inventory.version.
+            maxSize (int): The maximum number of priced baskets to keep, or 0
+                to not keep any. (Default: DefaultCacheSize)
+
+        Raises:
+            ValueError: If the given size is < 0.
+        """
+        if maxSize < 0:
+            raise ValueError("Cache size must be >= 0 - got %r" % maxSize)
+
+        self.__inventory = inventory
+        self.__maxSize = maxSize
+        self.__cache = LRUCache(maxSize) if maxSize > 0 else None
+
+        # The basket used to price baskets which aren't cached, and the
+        # inventory version it was created for
+        self.__basket = None
+        self.__version = None
+
+        # Counters for reporting misses when the cache is disabled, and how
+        # often the inventory has changed
+        self.__misses = 0
+        self.__invalidations = 0
+
+    # Public Instance Methods -------------------------------------------------
+
+    def inventory(self):
+        """
+        Returns:
+            Inventory. The inventory baskets are priced with.
+        """
+        return self.__inventory
+
+    def price(self, items):
+        """
+        Prices a basket of the given items.
+
+        Args:
+            items (iterable of str, or dict of str -> int): The names of the
+                items in the basket, or a dictionary mapping item name ->
+                count.
+
+        Returns:
+            PricedBasket. The price of the basket.
+        """
+        if self.__inventory.version() != self.__version:
+            self.__invalidate()
+
+        counts = _countItems(items)
+        sortedCounts = tuple(sorted(counts.iteritems()))
+
+        if self.__cache is None:
+            self.__misses += 1
+            pricedBasket = self.__price(sortedCounts)
+        else:
+            key = (self.__version, sortedCounts)
+            pricedBasket = self.__cache.get(key)
+            if pricedBasket is None:
+                pricedBasket = self.__price(sortedCounts)
+                self.__cache.put(key, pricedBasket)
+
+        # The basket was priced with the items in sorted order, so list any
+        # unknown names in the order they were given instead
+        unknownNames = pricedBasket.unknownNames()
+        if len(unknownNames) > 1:
+            unknownNames = set(unknownNames)
+            pricedBasket = PricedBasket(
+                pricedBasket.total(), pricedBasket.savings(), pricedBasket.promos(),
+                [itemName for itemName in counts if itemName in unknownNames],
+                pricedBasket.entries())
+
+        return pricedBasket
+
+    def clear(self):
+        """
+        Discards all the cached prices.
+        """
+        if self.__cache is not None:
+            self.__cache.clear()
+
+    def maxSize(self):
+        """
+        Returns:
+            int. The maximum number of priced baskets kept.
+        """
+        return self.__maxSize
+
+    def stats(self):
+        """
+        Returns:
+            dict. The number of hits, misses, evictions + invalidations (times
+                the prices were discarded because the inventory changed) so
+                far, and the current number of priced baskets kept.
+        """
+        if self.__cache is None:
+            stats = {"hits": 0, "misses": self.__misses, "evictions": 0, "size": 0}
+        else:
+            stats = self.__cache.stats()
+
+        stats["invalidations"] = self.__invalidations
+
+        return stats
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of priced baskets currently kept.
+        """
+        return len(self.__cache) if self.__cache is not None else 0
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __invalidate(self):
+        """
+        Discards the cached prices + basket after the inventory has changed.
+        """
+        if self.__version is not None:
+            self.__invalidations += 1
+            self.clear()
+
+        # A basket created with a VersionedInventory sticks with the version
+        # which was current when it was created, so we need a new one, and
+        # that's the version its prices are for
+        self.__basket = Basket(self.__inventory)
+        self.__version = self.__basket.inventory().version()
+
+    def __price(self, sortedCounts):
+        """
+        Prices a basket, without using the cache.
+
+        The items are always added in sorted order, so that the promos are
+        listed in the same order however the items were given.
+
+        Args:
+            sortedCounts (tuple of (str, int)): The count of each item name,
+                sorted by name.
+
+        Returns:
+            PricedBasket. The price of the basket.
+        """
+        basket = self.__basket
+        basket.clear()
+        unknownNames = basket.addItems(OrderedDict(sortedCounts))
+
+        # Clearing the basket replaces its entries rather than changing them,
+        # so they can be kept
+        return PricedBasket(basket.total(), basket.savings(), basket.promos(),
+                            unknownNames, basket.entries())
+
+
+def _countItems(items):
+    """
+    Args:
+        items (iterable of str, or dict of str -> int): The names of some
+            items, or a dictionary mapping item name -> count.
+
+    Returns:
+        OrderedDict of str -> int, or dict of str -> int. The count of each
+            item name.
+    """
+    if hasattr(items, "iteritems"):
+        return items
+
+    counts = OrderedDict()
+    for itemName in items:
+        counts[itemName] = counts.get(itemName, 0) + 1
+
+    return counts
@@ -1,19 +1,32 @@
 
-
-
 class _PromoEntry(object):
     """
     Base class for promotional groupings of items.
+
+    A single promo entry may represent several identical promos, in which case
+    the cost + savings are the totals for all of them.
     """
 
-    def __init__(self, items):
+    __slots__ = ("_items", "_numPromos")
+
+    def __init__(self, items, numPromos=1):
         """
         Initializes an instance of the class.
 
         Args:
             items (list of Item): The items for this promo.
+            numPromos (int): The number of identical promos this entry
+                represents. (Default: 1)
         """
         self._items = items
+        self._numPromos = numPromos
+
+    def numPromos(self):
+        """
+        Returns:
+            int. The number of identical promos this entry represents.
+        """
+        return self._numPromos
 
     def cost(self):
         raise NotImplementedError("Must be defined in derived class")
@@ -24,9 +37,14 @@ class _PromoEntry(object):
     def name(self):
         raise NotImplementedError("Must be defined in derived class")
 
+    def expand(self):
+        raise NotImplementedError("Must be defined in derived class")
+
 
 class ThreeForTwoPromo(_PromoEntry):
 
+    __slots__ = ()
+
     def __init__(self, item, numPromos=1):
         """
         Initializes an instance of the class.
@@ -35,22 +53,21 @@ class ThreeForTwoPromo(_PromoEntry):
             item (Item): The item for this promo.
             numPromos (int): The number of 3-for-2 promos. (Default: 1)
         """
-        _PromoEntry.__init__(self, [item])
-        self.__count = numPromos
+        _PromoEntry.__init__(self, [item], numPromos)
 
     def cost(self):
         """
         Returns:
-            float. The cost for this promotion.
+            int. The cost for this promotion, in pence.
         """
-        return 2 * self._items[0].price() * self.__count
+        return 2 * self._items[0].price() * self._numPromos
 
     def savings(self):
         """
         Returns:
-            float. The savings from this promotion.
+            int. The savings from this promotion, in pence.
         """
-        return self._items[0].price() * self.__count
+        return self._items[0].price() * self._numPromos
 
     def name(self):
         """
@@ -59,19 +76,30 @@ class ThreeForTwoPromo(_PromoEntry):
         """
         return "%s - 3 for 2" % self._items[0].name()
 
+    def expand(self):
+        """
+        Returns:
+            list of ThreeForTwoPromo. A separate promo for each 3-for-2.
+        """
+        return [ThreeForTwoPromo(self._items[0]) for x in xrange(self._numPromos)]
+
 class CheapestFreePromo(_PromoEntry):
 
-    def __init__(self, items):
+    __slots__ = ()
+
+    def __init__(self, items, numPromos=1):
         """
         Initializes an instance of the class.
 
         Args:
             items (list of Item): The items for this promo.
+            numPromos (int): The number of identical bundles of these items.
+                (Default: 1)
 
         Raises:
             ValueError: If fewer than three items are provided.
         """
-        _PromoEntry.__init__(self, items)
+        _PromoEntry.__init__(self, items, numPromos)
 
         if len(items) < 3:
             raise ValueError("Not enough items provided")
@@ -81,16 +109,16 @@ class CheapestFreePromo(_PromoEntry):
     def cost(self):
         """
         Returns:
-            float. The cost for this promotion.
+            int. The cost for this promotion, in pence.
         """
-        return sum(item.price() for item in self._items[:-1])
+        return sum(item.price() for item in self._items[:-1]) * self._numPromos
 
     def savings(self):
         """
         Returns:
-            float. The savings from this promotion.
+            int. The savings from this promotion, in pence.
         """
-        return self._items[-1].price()
+        return self._items[-1].price() * self._numPromos
 
     def name(self):
         """
@@ -99,9 +127,18 @@ class CheapestFreePromo(_PromoEntry):
         """
         return "%s - buy 3 get cheapest free" % self._items[0].promoGroup()
 
+    def expand(self):
+        """
+        Returns:
+            list of CheapestFreePromo. A separate promo for each bundle.
+        """
+        return [CheapestFreePromo(list(self._items)) for x in xrange(self._numPromos)]
+
 
 class NoPromo(_PromoEntry):
 
+    __slots__ = ()
+
     def __init__(self, item):
         """
         Initializes an instance of the class.
@@ -114,16 +151,16 @@ class NoPromo(_PromoEntry):
     def cost(self):
         """
         Returns:
-            float. The cost for this promotion.
+            int. The cost for this promotion, in pence.
         """
         return sum(item.price() for item in self._items)
 
     def savings(self):
         """
         Returns:
-            float. The savings from this promotion.
+            int. The savings from this promotion, in pence.
         """
-        return 0.0
+        return 0
 
     def name(self):
         """
@@ -131,3 +168,10 @@ class NoPromo(_PromoEntry):
             str. The name of this promotion.
         """
         return ""
+
+    def expand(self):
+        """
+        Returns:
+            list of NoPromo. A list containing just this promo.
+        """
+        return [self]
@@ -1,15 +1,27 @@
+from cStringIO import StringIO
+
+
+# The default number of items to keep the formatted receipt columns of
+DefaultFragmentCacheSize = 8192
+
+# The number of different counts of each item to keep the formatted lines of
+_MaxCountsPerItem = 4
+
 
 def formatPrice(price):
     """
     Returns a formatted price string.
 
     Args:
-        price (float): The price to format.
+        price (int): The price to format, in pence.
 
     Returns:
-        str. The formatted price.
+        str. The formatted price, in pounds.
     """
-    return "%.2f" % price
+    sign = "-" if price < 0 else ""
+    pounds, pence = divmod(abs(price), 100)
+
+    return "%s%d.%02d" % (sign, pounds, pence)
 
 
 def formatName(name, maxWidth):
@@ -43,76 +55,382 @@ class Receipt(object):
     # There's a space between the columns, so separators need one extra char
     SeparatorWidth = NameColumnWidth + PriceColumnWidth + 1
 
+    # The number of lines to collect before writing them to the file
+    WriteBatchSize = 256
+
     @classmethod
-    def GetReceipt(cls, basket):
+    def GetReceipt(cls, basket, expandPromos=False):
         """
         Generates a receipt for the given basket.
 
         Args:
             basket (Basket): The basket for which to generate a receipt.
+            expandPromos (bool): If True, list each bundle of identical promos
+                separately, rather than on a single line. (Default: False)
 
         Returns:
             str. A string representing the receipt for our basket.
         """
-        # Store a list of pairs of strings, to format into two columns
-        lines = []
-        separator = ("-" * cls.SeparatorWidth, "")
-        separator2 = ("=" * cls.SeparatorWidth, "")
+        receiptFile = StringIO()
+        cls.WriteReceipt(basket, receiptFile, expandPromos)
+
+        return receiptFile.getvalue()
+
+    @classmethod
+    def WriteReceipt(cls, basket, outputFile, expandPromos=False):
+        """
+        Writes a receipt for the given basket to a file, as it's generated.
+        The lines are written a batch at a time, so only a batch of lines is
+        held in memory at once.
+
+        The receipt is the same as GetReceipt's, so doesn't end in a newline.
+
+        Args:
+            basket (Basket): The basket for which to write a receipt.
+            outputFile (file): The file to write to. Any object with a write
+                method can be used.
+            expandPromos (bool): If True, list each bundle of identical promos
+                separately, rather than on a single line. (Default: False)
+        """
+        cls._WriteLines(cls._IterLines(basket, expandPromos, cls._FormatEntry),
+                        outputFile)
+
+    @classmethod
+    def Layout(cls):
+        """
+        Returns:
+            tuple of int. The widths of the margin + columns, which determine
+                how each line is formatted.
+        """
+        return (cls.LeftMarginWidth, cls.NameColumnWidth, cls.PriceColumnWidth)
+
+    # Protected Class Methods -------------------------------------------------
+
+    @classmethod
+    def _FormatLine(cls, name, price):
+        """
+        Adds a left-hand margin to a line, and justifies its columns.
+
+        Args:
+            name (str): The name column.
+            price (str): The price column.
+
+        Returns:
+            str. The formatted line.
+        """
+        formattedName = name.ljust(cls.NameColumnWidth)
+        formattedPrice = price.rjust(cls.PriceColumnWidth)
+
+        return "%s %s %s" % (cls.LeftMarginWidth * " ", formattedName, formattedPrice)
+
+    @classmethod
+    def _FormatEntry(cls, item, count):
+        """
+        Formats the lines listing an entry in a basket.
+
+        Args:
+            item (Item): The item in the entry.
+            count (int): The number of the item in the basket - at least 1.
+
+        Returns:
+            tuple of str. The formatted lines.
+        """
+        name = item.name()
+        price = item.price()
+
+        nameWidth = cls.NameColumnWidth
+        if count == 1:
+            # Format the name to the width of the column
+            return (cls._FormatLine(formatName(name, nameWidth), formatPrice(price)),)
+
+        # Use the extra space for the name if we have multiples - we put the
+        # count and price on a separate line
+        nameWidth += cls.PriceColumnWidth
+
+        return (cls._FormatLine(formatName(name, nameWidth), ""),
+                cls._FormatCountLine(count, price, formatPrice(price)))
+
+    @classmethod
+    def _FormatItem(cls, item):
+        """
+        Formats the parts of an entry's lines which only depend on the item.
+
+        Args:
+            item (Item): The item.
+
+        Returns:
+            tuple of (tuple of str, str, str). The lines listing a single
+                instance of the item, the line naming the item when there's
+                more than one, and the item's formatted price.
+        """
+        name = item.name()
+        formattedPrice = formatPrice(item.price())
+        nameWidth = cls.NameColumnWidth
+
+        return ((cls._FormatLine(formatName(name, nameWidth), formattedPrice),),
+                cls._FormatLine(formatName(name, nameWidth + cls.PriceColumnWidth), ""),
+                formattedPrice)
+
+    @classmethod
+    def _FormatCountLine(cls, count, price, formattedPrice):
+        """
+        Formats the line giving the count + total price of an entry with more
+        than one instance of an item.
+
+        Args:
+            count (int): The number of the item in the basket.
+            price (int): The price of the item in pence.
+            formattedPrice (str): The formatted price of the item.
+
+        Returns:
+            str. The formatted line.
+        """
+        formattedCount = "%s @ %s" % (str(count).rjust(cls.PriceColumnWidth), formattedPrice)
+
+        return cls._FormatLine(formattedCount, formatPrice(count * price))
+
+    @classmethod
+    def _IterLines(cls, basket, expandPromos, formatEntry):
+        """
+        Generates the formatted lines of a receipt, a few lines at a time.
+
+        Args:
+            basket (Basket): The basket for which to generate a receipt.
+            expandPromos (bool): If True, list each bundle of identical promos
+                separately, rather than on a single line.
+            formatEntry (callable): Called with the item + count of each entry
+                in the basket, returning its formatted lines - like
+                _FormatEntry.
+
+        Returns:
+            generator of tuple of str. The formatted lines - each entry's
+                lines are generated together.
+        """
+        separator = cls._FormatLine("-" * cls.SeparatorWidth, "")
+        separator2 = cls._FormatLine("=" * cls.SeparatorWidth, "")
 
         # First just list all the entries
-        lines.append(separator2)
-        totalBeforePromos = 0.0
+        yield (separator2,)
+        totalBeforePromos = 0
         for entry in basket.entries():
             count = entry.count()
             if count <= 0:
                 continue
 
             item = entry.item()
-            name = item.name()
-            price = item.price()
-            totalPrice = count * price
-
-            nameWidth = cls.NameColumnWidth
-            if count == 1:
-                # Format the name to the width of the column
-                lines.append((formatName(name, nameWidth), "%.2f" % price))
-            else:
-                # Use the extra space for the name if we have multiples - we
-                # put the count and price on a separate line
-                nameWidth += cls.PriceColumnWidth
-                lines.append((formatName(name, nameWidth), ""))
-                formattedCount = "%s @ %s" % (str(count).rjust(cls.PriceColumnWidth), formatPrice(price))
-                lines.append((formattedCount, formatPrice(totalPrice)))
+            yield formatEntry(item, count)
 
-            totalBeforePromos += totalPrice
+            totalBeforePromos += count * item.price()
 
         # Add a sub-total for the amount before promos
-        lines.append(separator)
-        lines.append(("SUB-TOTAL:", formatPrice(totalBeforePromos)))
+        lines = [separator, cls._FormatLine("SUB-TOTAL:", formatPrice(totalBeforePromos))]
 
         # Now give details of promos
         lines.append(separator)
-        lines.append(("OFFERS:", ""))
-        for promo in basket.promos():
-            lines.append(("%s%s" % (cls.LeftMarginWidth * " ", promo.name()),
-                                    formatPrice(-promo.savings())))
+        lines.append(cls._FormatLine("OFFERS:", ""))
+        yield lines
+
+        for promo in basket.promos(expandPromos):
+            yield (cls._FormatLine("%s%s" % (cls.LeftMarginWidth * " ", promo.name()),
+                                   formatPrice(-promo.savings())),)
 
         # Then total savings
-        lines.append(separator)
-        lines.append(("TOTAL SAVINGS:", formatPrice(basket.savings())))
+        lines = [separator, cls._FormatLine("TOTAL SAVINGS:", formatPrice(basket.savings()))]
 
         # Then add the total to pay
         lines.append(separator2)
-        lines.append(("TOTAL TO PAY:", formatPrice(basket.total())))
+        lines.append(cls._FormatLine("TOTAL TO PAY:", formatPrice(basket.total())))
         lines.append(separator2)
 
-        # Add a left-hand margin and justify the columns
-        outputLines = []
-        for name, price in lines:
-            formattedName = name.ljust(cls.NameColumnWidth)
-            formattedPrice = price.rjust(cls.PriceColumnWidth)
-            outputLines.append(
-                "%s %s %s" % (cls.LeftMarginWidth * " ", formattedName, formattedPrice))
+        yield lines
+
+    @classmethod
+    def _WriteLines(cls, lines, outputFile):
+        """
+        Writes lines to a file, separated by newlines, a batch at a time.
+
+        Args:
+            lines (iterable of (sequence of str)): The lines to write, a few
+                at a time, like _IterLines.
+            outputFile (file): The file to write to.
+        """
+        batch = []
+        lineSeparator = ""
+        for someLines in lines:
+            batch.extend(someLines)
+            if len(batch) >= cls.WriteBatchSize:
+                outputFile.write(lineSeparator + "\n".join(batch))
+                lineSeparator = "\n"
+                batch = []
+
+        if batch:
+            outputFile.write(lineSeparator + "\n".join(batch))
+
+
+class ReceiptRenderer(object):
+    """
+    Class generating receipts like Receipt, keeping the formatted name +
+    price columns of the most recently seen items so that they're only
+    formatted once.
+
+    Items are identified by their name + price, so a changed price is never
+    listed with columns formatted for the old one. The formatted columns are
+    discarded if the layout of the receipt class changes.
+
+    The formatted columns are kept in two generations of at most half the
+    maximum size - when the newest generation is full, the oldest is
+    discarded, and items found in the oldest generation are moved to the
+    newest. That keeps the items in frequent use at the cost of a dictionary
+    lookup, rather than the bookkeeping of an exact least-recently-used
+    cache.
+
+    Not thread-safe - use a separate renderer for each thread.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, maxSize=DefaultFragmentCacheSize, receiptClass=Receipt):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            maxSize (int): The maximum number of items to keep the formatted
+                columns of. (Default: DefaultFragmentCacheSize)
+            receiptClass (class): Receipt, or a subclass of it with a
+                different layout. (Default: Receipt)
+
+        Raises:
+            ValueError: If the given size is < 2.
+        """
+        if maxSize < 2:
+            raise ValueError("Cache size must be >= 2 - got %r" % maxSize)
+
+        self.__receiptClass = receiptClass
+        self.__generationSize = maxSize // 2
+        self.__layout = receiptClass.Layout()
+
+        # Dictionaries mapping (name, price) -> formatted columns, as returned
+        # by Receipt._FormatItem, plus a dictionary mapping count -> lines for
+        # the counts seen with more than one of the item
+        self.__newFragments = {}
+        self.__oldFragments = {}
+
+        # Counters for reporting how well the cache is doing
+        self.__hits = 0
+        self.__misses = 0
+
+    # Public Instance Methods -------------------------------------------------
+
+    def getReceipt(self, basket, expandPromos=False):
+        """
+        Generates a receipt for the given basket, the same as
+        Receipt.GetReceipt.
+
+        Args:
+            basket (Basket): The basket for which to generate a receipt.
+            expandPromos (bool): If True, list each bundle of identical promos
+                separately, rather than on a single line. (Default: False)
+
+        Returns:
+            str. A string representing the receipt for our basket.
+        """
+        receiptFile = StringIO()
+        self.writeReceipt(basket, receiptFile, expandPromos)
+
+        return receiptFile.getvalue()
+
+    def writeReceipt(self, basket, outputFile, expandPromos=False):
+        """
+        Writes a receipt for the given basket to a file, the same as
+        Receipt.WriteReceipt.
+
+        Args:
+            basket (Basket): The basket for which to write a receipt.
+            outputFile (file): The file to write to. Any object with a write
+                method can be used.
+            expandPromos (bool): If True, list each bundle of identical promos
+                separately, rather than on a single line. (Default: False)
+        """
+        receiptClass = self.__receiptClass
+        layout = receiptClass.Layout()
+        if layout != self.__layout:
+            self.clear()
+            self.__layout = layout
+
+        receiptClass._WriteLines(
+            receiptClass._IterLines(basket, expandPromos, self.__formatEntry), outputFile)
+
+    def clear(self):
+        """
+        Discards all the formatted columns.
+        """
+        self.__newFragments = {}
+        self.__oldFragments = {}
+
+    def stats(self):
+        """
+        Returns:
+            dict. The number of hits + misses so far, and the current number
+                of items whose formatted columns are kept.
+        """
+        return {
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "size": len(self),
+        }
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of items whose formatted columns are currently
+                kept.
+        """
+        return len(self.__newFragments) + len(self.__oldFragments)
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __formatEntry(self, item, count):
+        """
+        Formats the lines listing an entry in a basket, using the item's
+        formatted columns if they've been formatted recently.
+
+        Args:
+            item (Item): The item in the entry.
+            count (int): The number of the item in the basket.
+
+        Returns:
+            tuple of str. The formatted lines.
+        """
+        price = item.price()
+        key = (item.name(), price)
+        fragments = self.__newFragments.get(key)
+        if fragments is None:
+            fragments = self.__oldFragments.pop(key, None)
+            if fragments is None:
+                self.__misses += 1
+                fragments = self.__receiptClass._FormatItem(item) + ({},)
+            else:
+                self.__hits += 1
+
+            if len(self.__newFragments) >= self.__generationSize:
+                self.__oldFragments = self.__newFragments
+                self.__newFragments = {}
+
+            self.__newFragments[key] = fragments
+        else:
+            self.__hits += 1
+
+        singleLines, nameLine, formattedPrice, countLines = fragments
+        if count == 1:
+            return singleLines
+
+        lines = countLines.get(count)
+        if lines is None:
+            lines = (nameLine,
+                     self.__receiptClass._FormatCountLine(count, price, formattedPrice))
+
+            # Only keep the lines for the most common counts of each item
+            if len(countLines) < _MaxCountsPerItem:
+                countLines[count] = lines
 
-        # Join the output with newlines + return
-        return "\n".join(outputLines)
+        return lines
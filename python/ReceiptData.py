@@ -0,0 +1,304 @@
+"""
+Module providing receipts as structured data, for other programs to read
+rather than people - the same contents as Receipt, without the text layout.
+
+A receipt lists each entry (name, count, unit price + line total), the
+sub-total before offers, each promo (name, count + savings), then the total
+savings + total to pay. Prices are formatted in pounds, as strings, so that
+they're exact.
+
+Receipts can be written as:
+
+    json    An indented JSON object, or a JSON array of objects for several
+            receipts.
+    jsonl   A JSON object on a single line for each receipt.
+    csv     A row for each entry, promo + total, with a header row:
+
+                basketId,type,name,count,price,amount
+                ,entry,beans,3,1.00,3.00
+                ,subtotal,,,,3.00
+                ,promo,beans - 3 for 2,1,,-1.00
+                ,savings,,,,1.00
+                ,total,,,,2.00
+"""
+import csv
+import json
+from cStringIO import StringIO
+from collections import OrderedDict
+
+from Receipt import formatPrice
+
+
+# The supported formats for structured receipts
+ReceiptFormats = ("json", "jsonl", "csv")
+
+# The columns of the CSV format
+CsvColumns = ("basketId", "type", "name", "count", "price", "amount")
+
+
+class ReceiptDataWriter(object):
+    """
+    Class writing a stream of structured receipts to a file, as they're
+    given.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, outputFile, receiptFormat):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            outputFile (file): The file to write to. Any object with a write
+                method can be used.
+            receiptFormat (str): The format to write - one of ReceiptFormats.
+
+        Raises:
+            ValueError: If the format isn't recognised.
+        """
+        self.__encode = _encoderFor(receiptFormat)
+        self.__outputFile = outputFile
+        self.__receiptFormat = receiptFormat
+        self.__numReceipts = 0
+
+    # Public Instance Methods -------------------------------------------------
+
+    def write(self, data):
+        """
+        Writes a receipt.
+
+        Args:
+            data (OrderedDict): The receipt, as returned by receiptData.
+        """
+        self.writeEncoded(self.__encode(data))
+
+    def writeEncoded(self, encodedData):
+        """
+        Writes a receipt which has already been encoded, e.g. by another
+        process.
+
+        Args:
+            encodedData (str): The receipt, as returned by encodeReceiptData.
+        """
+        outputFile = self.__outputFile
+        if self.__receiptFormat == "json":
+            # Write the receipts as an array, one receipt at a time
+            outputFile.write(",\n" if self.__numReceipts else "[\n")
+        elif self.__receiptFormat == "csv" and not self.__numReceipts:
+            outputFile.write(_encodeCsvRows([CsvColumns]))
+
+        outputFile.write(encodedData)
+        self.__numReceipts += 1
+
+    def close(self):
+        """
+        Finishes writing the receipts. Doesn't close the file.
+        """
+        if self.__receiptFormat == "json":
+            self.__outputFile.write("\n]\n" if self.__numReceipts else "[]\n")
+        elif self.__receiptFormat == "csv" and not self.__numReceipts:
+            self.__outputFile.write(_encodeCsvRows([CsvColumns]))
+
+    def numReceipts(self):
+        """
+        Returns:
+            int. The number of receipts written so far.
+        """
+        return self.__numReceipts
+
+
+def receiptData(basket, expandPromos=False):
+    """
+    Args:
+        basket (Basket): The basket to list. Any object with entries, promos,
+            savings + total methods can be used, like Basket.
+        expandPromos (bool): If True, list each bundle of identical promos
+            separately, rather than as a single promo with a count.
+            (Default: False)
+
+    Returns:
+        OrderedDict. The receipt - its entries, subtotal, promos, savings +
+            total.
+    """
+    entries = []
+    subtotal = 0
+    for entry in basket.entries():
+        count = entry.count()
+        if count <= 0:
+            continue
+
+        item = entry.item()
+        price = item.price()
+
+        entryData = OrderedDict()
+        entryData["name"] = item.name()
+        entryData["count"] = count
+        entryData["price"] = formatPrice(price)
+        entryData["total"] = formatPrice(count * price)
+        entries.append(entryData)
+
+        subtotal += count * price
+
+    data = OrderedDict()
+    data["entries"] = entries
+    data["subtotal"] = formatPrice(subtotal)
+    data["promos"] = promosData(basket.promos(expandPromos))
+    data["savings"] = formatPrice(basket.savings())
+    data["total"] = formatPrice(basket.total())
+
+    return data
+
+
+def promosData(promos):
+    """
+    Args:
+        promos (list of _PromoEntry): The offers in a basket.
+
+    Returns:
+        list of OrderedDict. The name, count + savings of each offer.
+    """
+    result = []
+    for promo in promos:
+        promoData = OrderedDict()
+        promoData["name"] = promo.name()
+        promoData["count"] = promo.numPromos()
+        promoData["savings"] = formatPrice(promo.savings())
+        result.append(promoData)
+
+    return result
+
+
+def toUtf8(value):
+    """
+    Args:
+        value (object): A value decoded from JSON, e.g. an item name or
+            basket id.
+
+    Returns:
+        str. The value as a UTF-8 encoded string, to match the inventory (and
+            since the csv module only writes byte strings).
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+
+    return str(value)
+
+
+def encodeReceiptData(data, receiptFormat):
+    """
+    Encodes a receipt, to be written with ReceiptDataWriter.writeEncoded.
+
+    Args:
+        data (OrderedDict): The receipt, as returned by receiptData. May also
+            have an "id", "unknownItems" or (in place of the receipt) an
+            "error".
+        receiptFormat (str): The format to encode it in - one of
+            ReceiptFormats.
+
+    Raises:
+        ValueError: If the format isn't recognised.
+
+    Returns:
+        str. The encoded receipt.
+    """
+    return _encoderFor(receiptFormat)(data)
+
+
+def writeReceiptData(data, outputFile, receiptFormat):
+    """
+    Writes a single receipt to a file. Unlike ReceiptDataWriter, a JSON
+    receipt is written as an indented object rather than an array.
+
+    Args:
+        data (OrderedDict): The receipt, as returned by receiptData.
+        outputFile (file): The file to write to. Any object with a write
+            method can be used.
+        receiptFormat (str): The format to write - one of ReceiptFormats.
+
+    Raises:
+        ValueError: If the format isn't recognised.
+    """
+    if receiptFormat == "json":
+        outputFile.write("%s\n" % json.dumps(data, indent=2, separators=(",", ": ")))
+        return
+
+    writer = ReceiptDataWriter(outputFile, receiptFormat)
+    writer.write(data)
+    writer.close()
+
+
+# Private Functions -----------------------------------------------------------
+
+def _encoderFor(receiptFormat):
+    """
+    Args:
+        receiptFormat (str): One of ReceiptFormats.
+
+    Raises:
+        ValueError: If the format isn't recognised.
+
+    Returns:
+        function. The function to encode a receipt in the format with.
+    """
+    if receiptFormat == "json":
+        return json.dumps
+
+    if receiptFormat == "jsonl":
+        return _encodeJsonLine
+
+    if receiptFormat == "csv":
+        return _encodeCsv
+
+    raise ValueError("Unknown receipt format: %r - expected one of %s"
+                     % (receiptFormat, ", ".join(ReceiptFormats)))
+
+
+def _encodeJsonLine(data):
+    """
+    Returns:
+        str. The receipt as a line of JSON.
+    """
+    return "%s\n" % json.dumps(data)
+
+
+def _encodeCsv(data):
+    """
+    Returns:
+        str. The receipt as CSV rows, without the header.
+    """
+    basketId = toUtf8(data.get("id", ""))
+    if "error" in data:
+        return _encodeCsvRows([(basketId, "error", toUtf8(data["error"]), "", "", "")])
+
+    rows = []
+    for entry in data["entries"]:
+        rows.append((basketId, "entry", entry["name"], entry["count"], entry["price"],
+                     entry["total"]))
+
+    rows.append((basketId, "subtotal", "", "", "", data["subtotal"]))
+
+    for promo in data["promos"]:
+        rows.append((basketId, "promo", promo["name"], promo["count"], "",
+                     "-%s" % promo["savings"]))
+
+    rows.append((basketId, "savings", "", "", "", data["savings"]))
+    rows.append((basketId, "total", "", "", "", data["total"]))
+
+    for itemName in data.get("unknownItems", ()):
+        rows.append((basketId, "unknown", toUtf8(itemName), "", "", ""))
+
+    return _encodeCsvRows(rows)
+
+
+def _encodeCsvRows(rows):
+    """
+    Args:
+        rows (list of sequence): The rows to encode.
+
+    Returns:
+        str. The rows in CSV format.
+    """
+    csvFile = StringIO()
+    csv.writer(csvFile, lineterminator="\n").writerows(rows)
+
+    return csvFile.getvalue()
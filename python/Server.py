@@ -0,0 +1,468 @@
+"""
+Module providing a long-running checkout server, which loads the inventory
+once and then prices baskets for any number of clients.
+
+Clients connect over TCP or a Unix socket, and send requests as JSON lines.
+Each request gets a single JSON line in response, in the same order:
+
+    {"op": "open"}                              -> {"ok": true, "basket": "1"}
+    {"op": "add", "basket": "1", "items": ["beans", "peas"]}
+                                                -> {"ok": true, "unknownItems": []}
+    {"op": "total", "basket": "1"}              -> {"ok": true, "total": "2.50",
+                                                    "savings": "0.00", ...}
+    {"op": "receipt", "basket": "1"}            -> {"ok": true, "receipt": "..."}
+    {"op": "close", "basket": "1"}              -> {"ok": true}
+    {"op": "price", "items": {"beans": 3}}      -> {"ok": true, "total": "2.00", ...}
+
+The items can be given as a list of names, or a dictionary mapping name ->
+count. Failed requests get {"ok": false, "error": "..."} instead. Baskets
+belong to the server rather than a connection, so a client can reconnect and
+carry on with an open basket.
+
+Connections are handled together by a single asyncore event loop, so no
+request waits for another client's connection.
+"""
+import asynchat
+import asyncore
+import json
+import os
+import socket
+import stat
+from collections import OrderedDict
+
+from Basket import Basket
+from PricingCache import PricingCache
+from Receipt import (
+    ReceiptRenderer,
+    formatPrice
+)
+from ReceiptData import (
+    promosData,
+    toUtf8
+)
+
+
+# The longest request line accepted, in bytes
+MaxRequestSize = 1 << 20
+
+# How often the event loop checks whether it's been asked to stop, in seconds
+_PollInterval = 0.1
+
+
+class RequestError(Exception):
+    """
+    Raised when a request can't be carried out.
+    """
+    pass
+
+
+class CheckoutService(object):
+    """
+    Class carrying out checkout requests, independent of how they're received.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, inventory, cacheSize=None):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            inventory (Inventory): The inventory to price baskets with.
+            cacheSize (int): The number of one-off baskets (see the "price"
+                request) to keep the prices of, or None for the default.
+                (Default: None)
+        """
+        self.__inventory = inventory
+        if cacheSize is None:
+            self.__pricingCache = PricingCache(inventory)
+        else:
+            self.__pricingCache = PricingCache(inventory, cacheSize)
+
+        # Keep the formatted receipt lines of the items seen most often
+        self.__receiptRenderer = ReceiptRenderer()
+
+        # Dictionary mapping basket id -> open Basket
+        self.__baskets = {}
+        self.__nextBasketId = 1
+
+        # Dictionary mapping request op -> method carrying it out
+        self.__handlers = {
+            "open": self.__open,
+            "add": self.__add,
+            "total": self.__total,
+            "receipt": self.__receipt,
+            "close": self.__close,
+            "price": self.__price,
+        }
+
+    # Public Instance Methods -------------------------------------------------
+
+    def numBaskets(self):
+        """
+        Returns:
+            int. The number of open baskets.
+        """
+        return len(self.__baskets)
+
+    def handleRequest(self, request):
+        """
+        Carries out a request.
+
+        Args:
+            request (dict): The request, with an "op" key naming the operation
+                and any arguments it takes.
+
+        Returns:
+            OrderedDict. The response - "ok" is True if the request succeeded,
+                otherwise there's an "error" message.
+        """
+        response = OrderedDict()
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+
+            handler = self.__handlers.get(request.get("op"))
+            if handler is None:
+                raise RequestError("unknown op: %s - expected one of %s"
+                                   % (json.dumps(request.get("op")),
+                                      ", ".join(sorted(self.__handlers))))
+
+            response["ok"] = True
+            handler(request, response)
+
+        except RequestError as exception:
+            response.clear()
+            response["ok"] = False
+            response["error"] = str(exception)
+
+        except Exception as exception:
+            # Don't let a bug in one request take the connection down
+            response.clear()
+            response["ok"] = False
+            response["error"] = "couldn't carry out request - %s" % exception
+
+        return response
+
+    def handleLine(self, line):
+        """
+        Carries out a request given as a line of JSON.
+
+        Args:
+            line (str): The request.
+
+        Returns:
+            str. The response, as a line of JSON.
+        """
+        try:
+            request = json.loads(line)
+
+        except ValueError as exception:
+            response = OrderedDict()
+            response["ok"] = False
+            response["error"] = "invalid request - %s" % exception
+
+        else:
+            response = self.handleRequest(request)
+
+        return "%s\n" % json.dumps(response)
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __open(self, request, response):
+        """
+        Opens a new, empty basket.
+        """
+        basketId = str(self.__nextBasketId)
+        self.__nextBasketId += 1
+
+        self.__baskets[basketId] = Basket(self.__inventory)
+        response["basket"] = basketId
+
+    def __add(self, request, response):
+        """
+        Adds items to an open basket.
+        """
+        basket = self.__getBasket(request)
+        unknownNames = basket.addItems(_getItems(request))
+        response["unknownItems"] = unknownNames
+
+    def __total(self, request, response):
+        """
+        Prices an open basket.
+        """
+        basket = self.__getBasket(request)
+        _addPricing(response, basket.total(), basket.savings(), basket.promos())
+
+    def __receipt(self, request, response):
+        """
+        Generates the receipt for an open basket.
+        """
+        basket = self.__getBasket(request)
+        response["receipt"] = self.__receiptRenderer.getReceipt(
+            basket, bool(request.get("expandPromos")))
+
+    def __close(self, request, response):
+        """
+        Closes an open basket.
+        """
+        self.__getBasket(request)
+        del self.__baskets[request.get("basket")]
+
+    def __price(self, request, response):
+        """
+        Prices a one-off basket of items, without opening it.
+        """
+        pricedBasket = self.__pricingCache.price(_getItems(request))
+        _addPricing(response, pricedBasket.total(), pricedBasket.savings(),
+                    pricedBasket.promos())
+        response["unknownItems"] = list(pricedBasket.unknownNames())
+
+    def __getBasket(self, request):
+        """
+        Args:
+            request (dict): A request with a "basket" id.
+
+        Raises:
+            RequestError: If the basket isn't open.
+
+        Returns:
+            Basket. The open basket.
+        """
+        basketId = request.get("basket")
+        basket = self.__baskets.get(basketId) if isinstance(basketId, basestring) else None
+        if basket is None:
+            raise RequestError("no open basket with id: %s" % json.dumps(basketId))
+
+        return basket
+
+
+class CheckoutServer(asyncore.dispatcher):
+    """
+    Class listening for connections to a CheckoutService.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, service, address):
+        """
+        Initializes an instance of the class, and starts listening.
+
+        Args:
+            service (CheckoutService): The service to carry out requests.
+            address (str or (str, int)): The path of a Unix socket, or the
+                host + port to listen on. Port 0 picks a free port.
+
+        Raises:
+            socket.error: If the address can't be listened on, or a Unix
+                socket path is taken by something other than a socket.
+        """
+        # Use our own socket map, so that servers don't share an event loop
+        self.__socketMap = {}
+        asyncore.dispatcher.__init__(self, map=self.__socketMap)
+
+        self.__service = service
+        self.__stopping = False
+
+        if isinstance(address, basestring):
+            # Remove a socket left behind by a previous server, but never
+            # anything else
+            try:
+                mode = os.stat(address).st_mode
+            except OSError:
+                mode = None
+
+            if mode is not None:
+                if not stat.S_ISSOCK(mode):
+                    raise socket.error("path exists and isn't a socket: %r" % address)
+
+                os.remove(address)
+
+            self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.bind(address)
+        self.listen(128)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def address(self):
+        """
+        Returns:
+            str or (str, int). The address being listened on.
+        """
+        return self.socket.getsockname()
+
+    def serveForever(self):
+        """
+        Handles connections until stop is called.
+        """
+        while not self.__stopping:
+            asyncore.loop(timeout=_PollInterval, map=self.__socketMap, count=1)
+
+        asyncore.close_all(map=self.__socketMap)
+
+    def stop(self):
+        """
+        Asks serveForever to return, closing all connections. Can be called
+        from any thread.
+        """
+        self.__stopping = True
+
+    # asyncore Methods --------------------------------------------------------
+
+    def handle_accept(self):
+        """
+        Starts handling a new connection.
+        """
+        pair = self.accept()
+        if pair is None:
+            return
+
+        connection, address = pair
+        if connection.family == socket.AF_INET:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        _CheckoutConnection(connection, self.__service, self.__socketMap)
+
+
+class _CheckoutConnection(asynchat.async_chat):
+    """
+    Class handling the requests on a single connection.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, connection, service, socketMap):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            connection (socket.socket): The connected socket.
+            service (CheckoutService): The service to carry out requests.
+            socketMap (dict): The event loop's socket map.
+        """
+        asynchat.async_chat.__init__(self, connection, map=socketMap)
+        self.set_terminator("\n")
+
+        self.__service = service
+        self.__buffer = []
+        self.__bufferSize = 0
+        self.__tooLarge = False
+
+    # asynchat Methods --------------------------------------------------------
+
+    def collect_incoming_data(self, data):
+        """
+        Buffers part of a request line.
+        """
+        if self.__tooLarge:
+            return
+
+        self.__bufferSize += len(data)
+        if self.__bufferSize > MaxRequestSize:
+            # Give up on the connection, rather than buffer any more
+            self.__tooLarge = True
+            self.__buffer = []
+            self.push('{"ok": false, "error": "request too large"}\n')
+            self.close_when_done()
+            return
+
+        self.__buffer.append(data)
+
+    def found_terminator(self):
+        """
+        Carries out a complete request line, and sends the response.
+        """
+        if self.__tooLarge:
+            return
+
+        line = "".join(self.__buffer)
+        self.__buffer = []
+        self.__bufferSize = 0
+
+        if line.strip():
+            self.push(self.__service.handleLine(line))
+
+
+def parseAddress(address):
+    """
+    Args:
+        address (str): A "host:port" or ":port" to listen on, or the path of a
+            Unix socket.
+
+    Raises:
+        ValueError: If the port isn't a number, or a bare port number is given
+            without the colon.
+
+    Returns:
+        str or (str, int). The address, as used by CheckoutServer.
+    """
+    if ":" not in address:
+        # Catch a forgotten colon, rather than listening on a socket file
+        # named after the port
+        if address.isdigit():
+            raise ValueError("invalid address: %r - use ':%s' to listen on a port"
+                             % (address, address))
+
+        return address
+
+    host, port = address.rsplit(":", 1)
+    if not port.isdigit():
+        raise ValueError("invalid port in address: %r" % address)
+
+    return (host or "127.0.0.1", int(port))
+
+
+# Private Functions -----------------------------------------------------------
+
+def _getItems(request):
+    """
+    Args:
+        request (dict): A request with "items".
+
+    Raises:
+        RequestError: If the items aren't a list of names or a dictionary of
+            counts.
+
+    Returns:
+        list of str, or dict of str -> int. The items.
+    """
+    items = request.get("items")
+    if isinstance(items, list):
+        if not all(isinstance(itemName, basestring) for itemName in items):
+            raise RequestError("item names must be strings")
+
+        return [toUtf8(itemName) for itemName in items]
+
+    if isinstance(items, dict):
+        counts = OrderedDict()
+        for itemName, count in items.iteritems():
+            # Match the counts accepted in batches
+            if not isinstance(count, (int, long)) or isinstance(count, bool) or count < 1:
+                raise RequestError("item counts must be positive integers - got %s"
+                                   % json.dumps(count))
+
+            counts[toUtf8(itemName)] = count
+
+        return counts
+
+    raise RequestError("items must be a list of names or a dictionary of counts")
+
+
+def _addPricing(response, total, savings, promos):
+    """
+    Adds the price of a basket to a response.
+
+    Args:
+        response (OrderedDict): The response to add to.
+        total (int): The cost of the basket in pence.
+        savings (int): The savings in the basket in pence.
+        promos (list of _PromoEntry): The offers in the basket.
+    """
+    response["total"] = formatPrice(total)
+    response["savings"] = formatPrice(savings)
+    response["promos"] = promosData(promos)
@@ -0,0 +1,588 @@
+"""
+Module providing a compiled, memory-mapped binary snapshot of an inventory.
+
+A snapshot file is laid out as follows, with all integers little-endian and
+every section aligned to 8 bytes:
+
+    header              magic, format version, counts, details of the source
+                        CSV file, and the offset of each section below
+    name offsets        uint64[numItems + 1] - offsets into the string table
+    promo group offsets uint64[numPromoGroups + 1] - offsets into the string
+                        table
+    warning offsets     uint64[numWarnings + 1] - offsets into the string
+                        table
+    string table        the item names, followed by the promo group names,
+                        then the warnings about bad rows in the CSV file
+    prices              int64[numItems] - the price of each item, in pence
+    promo group codes   uint32[numItems] - the promo group of each item
+    hash index          uint32[2 * numSlots] - an open-addressed hash table
+                        of (CRC-32 of the item name, item index + 1) pairs,
+                        with an index of 0 for an empty slot
+
+Opening a snapshot only reads the header - items are decoded from the mapped
+file as they're looked up, so the time taken to open a snapshot doesn't depend
+on the size of the inventory. The name hashes are stored in the hash index so
+that only the names of items with a matching hash are ever read. The warnings
+are kept so that they can be repeated whenever the snapshot is loaded, rather
+than only when it's compiled.
+
+The file is mapped read-only and shared, so several processes using the same
+snapshot share the same pages of memory.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+
+from Cache import LRUCache
+from Inventory import (
+    Inventory,
+    formatItemsPretty,
+    printWarning
+)
+from Item import Item
+
+
+# The magic bytes at the start of every snapshot, and the format version -
+# bump the version whenever the layout changes
+Magic = "CHKSNAP\0"
+FormatVersion = 3
+
+# Header layout: magic, version, numItems, numPromoGroups, numWarnings,
+# numSlots, sourceMtime, sourceSize, sourceHash, then the offset of each
+# section
+_HeaderFormat = "<8sIIIIIdQ20sQQQQQQQ"
+_HeaderSize = struct.calcsize(_HeaderFormat)
+
+# The layout + position of the source file's mtime + size in the header
+_SourceStatFormat = "<dQ"
+_SourceStatOffset = struct.calcsize("<8sIIIII")
+
+# The extension added to the CSV file path to give the default snapshot path
+SnapshotExtension = ".snapshot"
+
+# The default number of recently looked up items to keep decoded in memory
+DefaultCacheSize = 1024
+
+
+class SnapshotError(Exception):
+    """
+    Exception raised when a snapshot file is missing, corrupt or out of date.
+    """
+    pass
+
+
+def defaultSnapshotPath(csvPath):
+    """
+    Args:
+        csvPath (str): Path to an inventory CSV file.
+
+    Returns:
+        str. The default path of the snapshot for the given CSV file.
+    """
+    return csvPath + SnapshotExtension
+
+
+def hashFile(filePath):
+    """
+    Args:
+        filePath (str): Path to the file to hash.
+
+    Returns:
+        str. The SHA-1 digest of the file's contents.
+    """
+    sha = hashlib.sha1()
+    with open(filePath, "rb") as fileIn:
+        for block in iter(lambda: fileIn.read(1 << 20), ""):
+            sha.update(block)
+
+    return sha.digest()
+
+
+def hashName(name):
+    """
+    Args:
+        name (str): An item name.
+
+    Returns:
+        int. The hash of the name used for the snapshot's hash index.
+    """
+    return zlib.crc32(name) & 0xffffffff
+
+
+def compileSnapshot(csvPath, snapshotPath=None, numProcesses=1, warn=None):
+    """
+    Reads the given inventory CSV file, and writes it out as a snapshot.
+
+    The snapshot is written to a temporary file first and then renamed, so
+    readers never see a partially written snapshot.
+
+    Args:
+        csvPath (str): Path to the inventory CSV file to compile.
+        snapshotPath (str): Path to the snapshot to write. (Default: the CSV
+            file path with the snapshot extension added)
+        numProcesses (int): The number of processes to parse the CSV file
+            with. (Default: 1)
+        warn (function): The function to report each bad row in the CSV
+            file with, or None to print them. (Default: None)
+
+    Raises:
+        IOError: If the CSV file can't be read, or the snapshot can't be
+            written.
+
+    Returns:
+        str. The path of the snapshot written.
+    """
+    if snapshotPath is None:
+        snapshotPath = defaultSnapshotPath(csvPath)
+
+    # Record the details of the source before reading it, so that a change
+    # made while we're compiling makes the snapshot look out of date
+    sourceStat = os.stat(csvPath)
+    sourceHash = hashFile(csvPath)
+
+    if warn is None:
+        warn = printWarning
+
+    # Keep the warnings, to repeat when the snapshot is loaded
+    warnings = []
+
+    def recordWarning(message):
+        warnings.append(message)
+        warn(message)
+
+    inventory = Inventory()
+    inventory.readFromDisk(csvPath, numProcesses, recordWarning)
+    items = inventory.getItems()
+
+    # Intern the promo group names
+    promoGroups = [""]
+    promoGroupCodesByName = {"": 0}
+    promoGroupCodes = []
+    for item in items:
+        promoGroup = item.promoGroup()
+        code = promoGroupCodesByName.get(promoGroup)
+        if code is None:
+            code = len(promoGroups)
+            promoGroups.append(promoGroup)
+            promoGroupCodesByName[promoGroup] = code
+
+        promoGroupCodes.append(code)
+
+    # Build the string table + offsets
+    names = [item.name() for item in items]
+    nameOffsets = _offsets(names, 0)
+    promoGroupOffsets = _offsets(promoGroups, nameOffsets[-1])
+    warningOffsets = _offsets(warnings, promoGroupOffsets[-1])
+    strings = "".join(names) + "".join(promoGroups) + "".join(warnings)
+
+    # Build the hash index, at most half full
+    numSlots = 1
+    while numSlots < 2 * len(items):
+        numSlots *= 2
+
+    mask = numSlots - 1
+    slots = [0] * (2 * numSlots)
+    for index, name in enumerate(names):
+        nameHash = hashName(name)
+        slot = nameHash & mask
+        while slots[2 * slot + 1]:
+            slot = (slot + 1) & mask
+
+        slots[2 * slot] = nameHash
+        slots[2 * slot + 1] = index + 1
+
+    # Lay out the sections
+    sections = [
+        struct.pack("<%dQ" % len(nameOffsets), *nameOffsets),
+        struct.pack("<%dQ" % len(promoGroupOffsets), *promoGroupOffsets),
+        struct.pack("<%dQ" % len(warningOffsets), *warningOffsets),
+        strings,
+        struct.pack("<%dq" % len(items), *[item.price() for item in items]),
+        struct.pack("<%dI" % len(items), *promoGroupCodes),
+        struct.pack("<%dI" % len(slots), *slots),
+    ]
+
+    offsets = []
+    offset = _align(_HeaderSize)
+    for section in sections:
+        offsets.append(offset)
+        offset = _align(offset + len(section))
+
+    header = struct.pack(_HeaderFormat, Magic, FormatVersion, len(items),
+                         len(promoGroups), len(warnings), numSlots, sourceStat.st_mtime,
+                         sourceStat.st_size, sourceHash, *offsets)
+
+    tempPath = "%s.tmp%d" % (snapshotPath, os.getpid())
+    try:
+        with open(tempPath, "wb") as fileOut:
+            fileOut.write(header)
+            for offset, section in zip(offsets, sections):
+                fileOut.write("\0" * (offset - fileOut.tell()))
+                fileOut.write(section)
+
+        os.rename(tempPath, snapshotPath)
+
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+
+    return snapshotPath
+
+
+def isSnapshotCurrent(csvPath, snapshotPath=None):
+    """
+    Checks whether the snapshot for the given CSV file is up to date.
+
+    The CSV file's modification time + size are checked first, and its
+    contents are only hashed if those have changed. If the contents still
+    match, the snapshot is updated with the new modification time + size, so
+    the file isn't hashed again next time.
+
+    Args:
+        csvPath (str): Path to the inventory CSV file.
+        snapshotPath (str): Path to the snapshot. (Default: the CSV file path
+            with the snapshot extension added)
+
+    Returns:
+        bool. True if the snapshot exists and matches the CSV file.
+    """
+    if snapshotPath is None:
+        snapshotPath = defaultSnapshotPath(csvPath)
+
+    try:
+        with open(snapshotPath, "rb") as fileIn:
+            header = _readHeader(fileIn.read(_HeaderSize))
+
+        sourceStat = os.stat(csvPath)
+
+    except (IOError, OSError, SnapshotError):
+        return False
+
+    if (header["sourceMtime"] == sourceStat.st_mtime
+            and header["sourceSize"] == sourceStat.st_size):
+        return True
+
+    if header["sourceHash"] != hashFile(csvPath):
+        return False
+
+    # Only the two fields change, so readers with the snapshot mapped aren't
+    # affected. If the snapshot is read-only, it's still current - it'll just
+    # be hashed again next time.
+    try:
+        with open(snapshotPath, "r+b") as fileOut:
+            fileOut.seek(_SourceStatOffset)
+            fileOut.write(struct.pack(_SourceStatFormat, sourceStat.st_mtime,
+                                      sourceStat.st_size))
+
+    except (IOError, OSError):
+        pass
+
+    return True
+
+
+def loadInventory(csvPath, snapshotPath=None, cacheSize=DefaultCacheSize,
+                  numProcesses=1, warn=None):
+    """
+    Opens the snapshot for the given CSV file, compiling it first if it's
+    missing or out of date. Any warnings about bad rows in the CSV file are
+    reported whether or not it's compiled.
+
+    Args:
+        csvPath (str): Path to the inventory CSV file.
+        snapshotPath (str): Path to the snapshot. (Default: the CSV file path
+            with the snapshot extension added)
+        cacheSize (int): The number of recently looked up items to keep
+            decoded in memory. (Default: DefaultCacheSize)
+        numProcesses (int): The number of processes to parse the CSV file
+            with, if the snapshot needs compiling. (Default: 1)
+        warn (function): The function to report each bad row in the CSV
+            file with, or None to print them. (Default: None)
+
+    Raises:
+        IOError: If the CSV file can't be read, or the snapshot can't be
+            written.
+
+    Returns:
+        SnapshotInventory. The inventory.
+    """
+    if snapshotPath is None:
+        snapshotPath = defaultSnapshotPath(csvPath)
+
+    if not isSnapshotCurrent(csvPath, snapshotPath):
+        # Compiling reports the warnings as the CSV file is read
+        compileSnapshot(csvPath, snapshotPath, numProcesses, warn)
+        return SnapshotInventory(snapshotPath, cacheSize)
+
+    inventory = SnapshotInventory(snapshotPath, cacheSize)
+    for warning in inventory.warnings():
+        (warn or printWarning)(warning)
+
+    return inventory
+
+
+class SnapshotInventory(object):
+    """
+    Class providing a read-only inventory backed by a memory-mapped snapshot.
+
+    Provides the same lookup methods as Inventory. Only the items which are
+    looked up are decoded, and the most recently used are cached.
+
+    Pickling an instance only pickles the path of the snapshot, so inventories
+    passed to other processes map the same file rather than copying it.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, snapshotPath, cacheSize=DefaultCacheSize):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            snapshotPath (str): Path to the snapshot file to open.
+            cacheSize (int): The number of recently looked up items to keep
+                decoded in memory. (Default: DefaultCacheSize)
+
+        Raises:
+            IOError: If the file can't be opened.
+            SnapshotError: If the file isn't a valid snapshot.
+        """
+        self.__path = snapshotPath
+        self.__cache = LRUCache(cacheSize)
+
+        with open(snapshotPath, "rb") as fileIn:
+            self.__map = mmap.mmap(fileIn.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = _readHeader(self.__map[:_HeaderSize])
+        self.__numItems = header["numItems"]
+        self.__numPromoGroups = header["numPromoGroups"]
+        self.__numWarnings = header["numWarnings"]
+        self.__numSlots = header["numSlots"]
+        self.__nameOffsetsOffset = header["nameOffsetsOffset"]
+        self.__promoGroupOffsetsOffset = header["promoGroupOffsetsOffset"]
+        self.__warningOffsetsOffset = header["warningOffsetsOffset"]
+        self.__stringsOffset = header["stringsOffset"]
+        self.__pricesOffset = header["pricesOffset"]
+        self.__promoGroupCodesOffset = header["promoGroupCodesOffset"]
+        self.__hashIndexOffset = header["hashIndexOffset"]
+
+        if self.__hashIndexOffset + 8 * self.__numSlots > len(self.__map):
+            raise SnapshotError("Snapshot %r is truncated" % snapshotPath)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def path(self):
+        """
+        Returns:
+            str. The path of the snapshot file.
+        """
+        return self.__path
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+        """
+        self.__map.close()
+
+    def cacheStats(self):
+        """
+        Returns:
+            dict. The statistics for the cache of decoded items.
+        """
+        return self.__cache.stats()
+
+    def getItem(self, itemName):
+        """
+        Returns:
+            Item or None. The item in our inventory with the given name, or
+                None if no such item was found.
+        """
+        item = self.__cache.get(itemName)
+        if item is not None:
+            return item
+
+        index = self.__findIndex(itemName)
+        if index is None:
+            return None
+
+        item = self.__itemAt(index)
+        self.__cache.put(itemName, item)
+
+        return item
+
+    def getItems(self):
+        """
+        Returns:
+            list of Item. The items in our inventory.
+        """
+        return [self.__itemAt(index) for index in xrange(self.__numItems)]
+
+    def getItemsPretty(self):
+        """
+        Returns:
+            str. A nicely formatted string representing the items in our inventory.
+        """
+        return formatItemsPretty(self.getItems())
+
+    def warnings(self):
+        """
+        Returns:
+            list of str. The warnings about bad rows in the CSV file the
+                snapshot was compiled from.
+        """
+        return [self.__stringAt(self.__warningOffsetsOffset, index)
+                for index in xrange(self.__numWarnings)]
+
+    def version(self):
+        """
+        Returns:
+            int. A number which changes whenever the contents of the
+                inventory change - always 1, since snapshots can't change.
+        """
+        return 1
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of items in our inventory.
+        """
+        return self.__numItems
+
+    def __getstate__(self):
+        """
+        Returns:
+            dict. The state to pickle - just enough to reopen the snapshot.
+        """
+        return {"path": self.__path, "cacheSize": self.__cache.maxSize()}
+
+    def __setstate__(self, state):
+        """
+        Reopens the snapshot when unpickling.
+
+        Args:
+            state (dict): The pickled state.
+        """
+        self.__init__(state["path"], state["cacheSize"])
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __findIndex(self, itemName):
+        """
+        Looks up an item name in the hash index.
+
+        Args:
+            itemName (str): The name of the item to find.
+
+        Returns:
+            int or None. The index of the item, or None if it wasn't found.
+        """
+        if not self.__numItems:
+            return None
+
+        mask = self.__numSlots - 1
+        nameHash = hashName(itemName)
+        slot = nameHash & mask
+        while True:
+            slotHash, entry = struct.unpack_from("<II", self.__map,
+                                                 self.__hashIndexOffset + 8 * slot)
+            if entry == 0:
+                return None
+
+            # Only compare the names if the hashes match
+            index = entry - 1
+            if slotHash == nameHash and self.__nameAt(index) == itemName:
+                return index
+
+            slot = (slot + 1) & mask
+
+    def __nameAt(self, index):
+        """
+        Returns:
+            str. The name of the item at the given index.
+        """
+        return self.__stringAt(self.__nameOffsetsOffset, index)
+
+    def __stringAt(self, offsetsOffset, index):
+        """
+        Args:
+            offsetsOffset (int): The offset of the table of string offsets.
+            index (int): The index of the string in the table.
+
+        Returns:
+            str. The string at the given index of the given table.
+        """
+        start, end = struct.unpack_from("<QQ", self.__map, offsetsOffset + 8 * index)
+
+        return self.__map[self.__stringsOffset + start:self.__stringsOffset + end]
+
+    def __itemAt(self, index):
+        """
+        Args:
+            index (int): The index of the item.
+
+        Returns:
+            Item. The item decoded from the snapshot at the given index.
+        """
+        price, = struct.unpack_from("<q", self.__map, self.__pricesOffset + 8 * index)
+        promoGroupCode, = struct.unpack_from("<I", self.__map,
+                                             self.__promoGroupCodesOffset + 4 * index)
+        promoGroup = self.__stringAt(self.__promoGroupOffsetsOffset, promoGroupCode)
+
+        return Item(self.__nameAt(index), price, promoGroup)
+
+
+def _offsets(strings, start):
+    """
+    Args:
+        strings (list of str): The strings to lay out one after another.
+        start (int): The offset of the first string.
+
+    Returns:
+        list of int. The offset of each string, followed by the end offset.
+    """
+    offsets = [start]
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    return offsets
+
+
+def _align(offset):
+    """
+    Returns:
+        int. The given offset rounded up to a multiple of 8.
+    """
+    return (offset + 7) & ~7
+
+
+def _readHeader(data):
+    """
+    Decodes a snapshot header.
+
+    Args:
+        data (str): The bytes at the start of the snapshot file.
+
+    Raises:
+        SnapshotError: If the data isn't a valid header for this version of
+            the format.
+
+    Returns:
+        dict. The header fields.
+    """
+    if len(data) < _HeaderSize:
+        raise SnapshotError("Snapshot header is truncated")
+
+    fields = struct.unpack(_HeaderFormat, data[:_HeaderSize])
+    if fields[0] != Magic:
+        raise SnapshotError("Not a snapshot file")
+
+    if fields[1] != FormatVersion:
+        raise SnapshotError("Unsupported snapshot version: %r" % fields[1])
+
+    names = ("magic", "version", "numItems", "numPromoGroups", "numWarnings",
+             "numSlots", "sourceMtime", "sourceSize", "sourceHash", "nameOffsetsOffset",
+             "promoGroupOffsetsOffset", "warningOffsetsOffset", "stringsOffset",
+             "pricesOffset", "promoGroupCodesOffset", "hashIndexOffset")
+
+    return dict(zip(names, fields))
@@ -0,0 +1,338 @@
+""" Module providing an inventory backed by a SQLite database. """
+import sqlite3
+import time
+
+from Cache import LRUCache
+from Inventory import Inventory
+from Item import Item
+from Receipt import formatPrice
+
+
+# The file extensions which are treated as SQLite databases
+DatabaseExtensions = (".db", ".sqlite", ".sqlite3")
+
+# The default number of recently looked up items to keep in memory
+DefaultCacheSize = 1024
+
+# The default number of seconds lookups can go without checking whether
+# another connection has changed the database
+DefaultCheckInterval = 1.0
+
+# The columns the inventory table must have
+_Columns = ("id", "name", "price", "promoGroup")
+
+
+def isDatabasePath(filePath):
+    """
+    Args:
+        filePath (str): Path to an inventory file.
+
+    Returns:
+        bool. True if the file should be treated as a SQLite database.
+    """
+    return filePath.lower().endswith(DatabaseExtensions)
+
+
+class SqliteInventory(object):
+    """
+    Class providing an inventory backed by a table in a SQLite database.
+
+    The table has an integer primary key, a unique 'name' column, a 'price'
+    column holding the price in pence, and an indexed 'promoGroup' column.
+    Recently looked up items are cached in memory, and the cache is dropped
+    whenever another connection changes the database. Checking for changes
+    takes a query, so lookups only check at most once per interval - call
+    version() to check straight away, e.g. before each batch of lookups.
+
+    Provides the same lookup methods as Inventory.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, databasePath, tableName="inventory",
+                 cacheSize=DefaultCacheSize, checkInterval=DefaultCheckInterval):
+        """
+        Initializes an instance of the class, creating the table + indices if
+        they don't already exist.
+
+        Args:
+            databasePath (str): Path to the database file.
+            tableName (str): The name of the table holding the inventory.
+                (Default: "inventory")
+            cacheSize (int): The number of recently looked up items to keep in
+                memory. (Default: DefaultCacheSize)
+            checkInterval (float): The number of seconds lookups can go
+                without checking whether another connection has changed the
+                database. (Default: DefaultCheckInterval)
+
+        Raises:
+            sqlite3.Error: If the database can't be opened.
+            ValueError: If the table already exists, but doesn't have the
+                columns of an inventory table.
+        """
+        self.__databasePath = databasePath
+        self.__tableName = tableName
+        self.__cache = LRUCache(cacheSize)
+        self.__checkInterval = checkInterval
+
+        # Counter which changes whenever the contents do, SQLite's counter of
+        # changes committed by other connections, and when lookups should next
+        # check it
+        self.__version = 0
+        self.__dataVersion = None
+        self.__nextCheckTime = 0
+
+        self.__connection = sqlite3.connect(databasePath)
+        self.__connection.text_factory = str
+
+        with self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS %s ("
+                "id INTEGER PRIMARY KEY, "
+                "name TEXT NOT NULL UNIQUE, "
+                "price INTEGER NOT NULL, "
+                "promoGroup TEXT NOT NULL DEFAULT '')" % tableName)
+
+        # Check an existing table up front, rather than failing on the first
+        # lookup
+        columns = [row[1] for row in
+                   self.__connection.execute("PRAGMA table_info(%s)" % tableName)]
+        missingColumns = [column for column in _Columns if column not in columns]
+        if missingColumns:
+            self.__connection.close()
+            raise ValueError("Table %r in %s isn't an inventory table - it's missing "
+                             "the columns: %s"
+                             % (tableName, databasePath, ", ".join(missingColumns)))
+
+        with self.__connection:
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS %s_promoGroup ON %s (promoGroup)"
+                % (tableName, tableName))
+
+        # The statements we use - sqlite3 keeps them prepared, keyed by the SQL
+        self.__selectItemSql = (
+            "SELECT name, price, promoGroup FROM %s WHERE name = ?" % tableName)
+        self.__selectPromoGroupSql = (
+            "SELECT name, price, promoGroup FROM %s WHERE promoGroup = ? ORDER BY id"
+            % tableName)
+        self.__selectAllSql = (
+            "SELECT name, price, promoGroup FROM %s ORDER BY id" % tableName)
+        self.__selectWidthsSql = (
+            "SELECT MAX(LENGTH(name)), MIN(price), MAX(price) FROM %s" % tableName)
+        self.__upsertSql = (
+            "INSERT OR REPLACE INTO %s (id, name, price, promoGroup) VALUES "
+            "((SELECT id FROM %s WHERE name = ?), ?, ?, ?)" % (tableName, tableName))
+        self.__deleteAllSql = "DELETE FROM %s" % tableName
+        self.__countSql = "SELECT COUNT(*) FROM %s" % tableName
+        self.__dataVersionSql = "PRAGMA data_version"
+
+    # Public Instance Methods -------------------------------------------------
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.__connection.close()
+
+    def cacheStats(self):
+        """
+        Returns:
+            dict. The statistics for the cache of recently looked up items.
+        """
+        return self.__cache.stats()
+
+    def addItem(self, item):
+        """
+        Adds the given item to the inventory.
+
+        Will silently override an item already in the inventory which has the
+        same name as the given item.
+
+        Args:
+            item (Item): The item to add.
+        """
+        self.addItems((item, ))
+
+    def addItems(self, items):
+        """
+        Adds the given items to the inventory, in a single transaction.
+
+        Silently overwrites any items already in the inventory which have the
+        same name as one of the given items.
+
+        Args:
+            items (list of Item): The items to add.
+        """
+        with self.__connection:
+            self.__upsertItems(items)
+
+        self.__cache.clear()
+        self.__version += 1
+
+    def readFromDisk(self, filePath, numProcesses=1):
+        """
+        Replaces the contents of the table with the contents of the given CSV
+        file.
+
+        Args:
+            filePath (str): Path to the file to read.
+            numProcesses (int): The number of processes to parse the file
+                with. (Default: 1)
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+        """
+        inventory = Inventory()
+        inventory.readFromDisk(filePath, numProcesses)
+
+        # Replace the contents in a single transaction, so that other
+        # connections never see the table empty
+        with self.__connection:
+            self.__connection.execute(self.__deleteAllSql)
+            self.__upsertItems(inventory.getItems())
+
+        self.__cache.clear()
+        self.__version += 1
+
+    def getItem(self, itemName):
+        """
+        Returns:
+            Item or None. The item in our inventory with the given name, or
+                None if no such item was found.
+        """
+        # Don't return cached items another connection has since changed -
+        # checking costs a query, so only check once per interval
+        if time.time() >= self.__nextCheckTime:
+            self.__checkDataVersion()
+
+        item = self.__cache.get(itemName)
+        if item is not None:
+            return item
+
+        row = self.__connection.execute(self.__selectItemSql, (itemName, )).fetchone()
+        if row is None:
+            return None
+
+        item = Item(*row)
+        self.__cache.put(itemName, item)
+
+        return item
+
+    def getItems(self):
+        """
+        Returns:
+            list of Item. The items in our inventory.
+        """
+        return [Item(*row) for row in self.__connection.execute(self.__selectAllSql)]
+
+    def getItemsByPromoGroup(self, promoGroup):
+        """
+        Args:
+            promoGroup (str): The name of the promo group.
+
+        Returns:
+            list of Item. The items in our inventory in the given promo group.
+        """
+        return [Item(*row) for row in
+                self.__connection.execute(self.__selectPromoGroupSql, (promoGroup, ))]
+
+    def getItemsPretty(self):
+        """
+        Returns:
+            str. A nicely formatted string representing the items in our inventory.
+        """
+        return "\n".join(self.iterItemsPretty())
+
+    def iterItemsPretty(self):
+        """
+        Streams the items from the database as nicely formatted lines.
+
+        Returns:
+            generator of str. A line representing each item in our inventory.
+        """
+        # Get the longest entry in each field - the longest price is either the
+        # most negative or the most positive
+        maxNameLength, minPrice, maxPrice = self.__connection.execute(
+            self.__selectWidthsSql).fetchone()
+        if maxNameLength is None:
+            return
+
+        maxPriceLength = max(len(formatPrice(minPrice)), len(formatPrice(maxPrice)))
+
+        for name, price, promoGroup in self.__connection.execute(self.__selectAllSql):
+            name = name.ljust(maxNameLength)
+            price = formatPrice(price).rjust(maxPriceLength)
+
+            yield "%s @ %s - %s" % (name, price, promoGroup)
+
+    def version(self):
+        """
+        Returns:
+            int. A number which changes whenever the contents of the
+                inventory change, including changes made by other connections
+                to the database.
+        """
+        self.__checkDataVersion()
+
+        return self.__version
+
+    def __len__(self):
+        """
+        Returns:
+            int. The number of items in our inventory.
+        """
+        count, = self.__connection.execute(self.__countSql).fetchone()
+
+        return count
+
+    def __getstate__(self):
+        """
+        Returns:
+            dict. The state to pickle - just enough to reconnect to the
+                database.
+        """
+        return {
+            "databasePath": self.__databasePath,
+            "tableName": self.__tableName,
+            "cacheSize": self.__cache.maxSize(),
+            "checkInterval": self.__checkInterval,
+        }
+
+    def __setstate__(self, state):
+        """
+        Reconnects to the database when unpickling.
+
+        Args:
+            state (dict): The pickled state.
+        """
+        self.__init__(state["databasePath"], state["tableName"], state["cacheSize"],
+                      state["checkInterval"])
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __upsertItems(self, items):
+        """
+        Adds or replaces the given items, in the current transaction.
+
+        Args:
+            items (list of Item): The items to add.
+        """
+        self.__connection.executemany(
+            self.__upsertSql,
+            ((item.name(), item.name(), item.price(), item.promoGroup())
+             for item in items))
+
+    def __checkDataVersion(self):
+        """
+        Checks whether another connection has changed the database, in which
+        case the items we've cached may be out of date, so are dropped, and
+        our version changes.
+        """
+        dataVersion, = self.__connection.execute(self.__dataVersionSql).fetchone()
+        self.__nextCheckTime = time.time() + self.__checkInterval
+        if dataVersion != self.__dataVersion:
+            if self.__dataVersion is not None:
+                self.__cache.clear()
+
+            self.__dataVersion = dataVersion
+            self.__version += 1
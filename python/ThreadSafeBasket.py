@@ -0,0 +1,309 @@
+""" Module providing a basket which can be shared between threads. """
+import threading
+
+from Basket import (
+    Basket,
+    BasketEntry
+)
+
+
+class BasketSnapshot(object):
+    """
+    Class holding an unchanging copy of the contents + prices of a basket.
+
+    Provides the same read methods as Basket, so can be used with
+    Receipt.GetReceipt.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, basket=None, numChanges=0):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            basket (Basket): The basket to copy, or None for an empty basket.
+                (Default: None)
+            numChanges (int): The number of changes made to the basket when
+                it was copied. (Default: 0)
+        """
+        self.__numChanges = numChanges
+
+        # The promos are replaced rather than changed when the basket is
+        # repriced, so they can be shared. The entries are changed, so are
+        # copied, keeping the items the basket was priced with even if the
+        # inventory changes afterwards.
+        self.__entries = []
+        if basket is None:
+            self.__promos = []
+            self.__total = 0
+            self.__savings = 0
+        else:
+            self.__promos = basket.promos()
+            self.__total = basket.total()
+            self.__savings = basket.savings()
+
+            for entry in basket.entries():
+                entryCopy = BasketEntry(entry.item())
+                entryCopy.increment(entry.count())
+                self.__entries.append(entryCopy)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def numChanges(self):
+        """
+        Returns:
+            int. The number of changes made to the basket when it was copied.
+        """
+        return self.__numChanges
+
+    def total(self):
+        """
+        Returns:
+            int. The cost of the basket in pence, taking offers into account.
+        """
+        return self.__total
+
+    def savings(self):
+        """
+        Returns:
+            int. The total savings in the basket from offers, in pence.
+        """
+        return self.__savings
+
+    def promos(self, expand=False):
+        """
+        Args:
+            expand (bool): If True, identical promos are listed separately,
+                rather than as a single promo with a multiplicity.
+                (Default: False)
+
+        Returns:
+            list of _PromoEntry. The promotional offers in the basket.
+        """
+        if expand:
+            return [single for promo in self.__promos for single in promo.expand()]
+
+        return list(self.__promos)
+
+    def numItems(self):
+        """
+        Returns:
+            int. The number of items in the basket.
+        """
+        return sum(entry.count() for entry in self.__entries)
+
+    def entries(self):
+        """
+        Returns:
+            list of BasketEntry. A list of the entries in the basket.
+        """
+        return list(self.__entries)
+
+
+class ThreadSafeBasket(object):
+    """
+    Class representing a basket which any number of threads can add items to
+    + price at the same time.
+
+    Added items are collected into a set of pending counts, under a lock
+    which is only held long enough to update them. Reading the price applies
+    the pending counts to an internal Basket and takes a BasketSnapshot of it,
+    under a second lock, so items can still be added while the basket is
+    being priced. Readers see every item added before they started reading,
+    and read the latest snapshot without any locking if nothing has changed.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, inventory):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            inventory (Inventory): The inventory to use.
+        """
+        self.__basket = Basket(inventory)
+
+        # Use the same inventory as the basket, in case it's pinned a version
+        self.__inventory = self.__basket.inventory()
+
+        # Lock protecting the pending counts - held briefly by writers
+        self.__pendingLock = threading.Lock()
+        self.__pendingCounts = {}
+        self.__knownNames = set()
+        self.__numChanges = 0
+
+        # Lock protecting the internal basket - held while pricing
+        self.__basketLock = threading.Lock()
+        self.__snapshot = BasketSnapshot()
+
+    # Public Instance Methods -------------------------------------------------
+
+    def inventory(self):
+        """
+        Returns:
+            Inventory or InventoryVersion. The inventory used by this basket.
+        """
+        return self.__inventory
+
+    def addItem(self, itemName, count=1):
+        """
+        Adds an item to the basket.
+
+        Args:
+            itemName (str): The name of the item to add.
+            count (int): The number of instances of the item to add. (Default: 1)
+
+        Raises:
+            KeyError: If the given item name isn't found in our inventory.
+            ValueError: If the given count is < 0.
+        """
+        if count < 0:
+            raise ValueError("Count must be > 0 - got %r" % count)
+
+        with self.__pendingLock:
+            if not self.__isKnown(itemName):
+                raise KeyError("Item %r not found in inventory" % itemName)
+
+            self.__pendingCounts[itemName] = self.__pendingCounts.get(itemName, 0) + count
+            self.__numChanges += 1
+
+    def addItems(self, items):
+        """
+        Adds several items to the basket at once. Names which aren't found in
+        the inventory are skipped rather than raising an exception.
+
+        Args:
+            items (iterable of str, or dict of str -> int): The names of the
+                items to add, or a dictionary mapping item name -> count.
+
+        Raises:
+            ValueError: If any of the given counts is < 0.
+
+        Returns:
+            list of str. The names of any items which weren't found in our
+                inventory, in the order they were first seen.
+        """
+        if hasattr(items, "iteritems"):
+            pairs = list(items.iteritems())
+        else:
+            pairs = [(itemName, 1) for itemName in items]
+
+        for itemName, count in pairs:
+            if count < 0:
+                raise ValueError("Count must be > 0 - got %r" % count)
+
+        unknownNames = []
+        with self.__pendingLock:
+            pendingCounts = self.__pendingCounts
+            for itemName, count in pairs:
+                if not self.__isKnown(itemName):
+                    if itemName not in unknownNames:
+                        unknownNames.append(itemName)
+
+                    continue
+
+                pendingCounts[itemName] = pendingCounts.get(itemName, 0) + count
+
+            self.__numChanges += 1
+
+        return unknownNames
+
+    def snapshot(self):
+        """
+        Returns:
+            BasketSnapshot. A consistent copy of the basket, including every
+                item added before this call.
+        """
+        # Reading these attributes is atomic, so if nothing has changed since
+        # the latest snapshot, there's no need to lock
+        snapshot = self.__snapshot
+        if snapshot.numChanges() == self.__numChanges:
+            return snapshot
+
+        with self.__basketLock:
+            # Take the pending counts, so that writers can carry on while we
+            # price the basket
+            with self.__pendingLock:
+                pendingCounts = self.__pendingCounts
+                numChanges = self.__numChanges
+                self.__pendingCounts = {}
+
+            if numChanges != self.__snapshot.numChanges():
+                self.__basket.addItems(pendingCounts)
+                self.__snapshot = BasketSnapshot(self.__basket, numChanges)
+
+            return self.__snapshot
+
+    def total(self):
+        """
+        Returns:
+            int. The cost of the basket in pence, taking offers into account.
+        """
+        return self.snapshot().total()
+
+    def savings(self):
+        """
+        Returns:
+            int. The total savings in this basket from offers, in pence.
+        """
+        return self.snapshot().savings()
+
+    def promos(self, expand=False):
+        """
+        Args:
+            expand (bool): If True, identical promos are listed separately,
+                rather than as a single promo with a multiplicity.
+                (Default: False)
+
+        Returns:
+            list of _PromoEntry. The promotional offers in this basket.
+        """
+        return self.snapshot().promos(expand)
+
+    def numItems(self):
+        """
+        Returns:
+            int. The number of items in this basket.
+        """
+        return self.snapshot().numItems()
+
+    def entries(self):
+        """
+        Returns:
+            list of BasketEntry. A list of the entries in this basket.
+        """
+        return self.snapshot().entries()
+
+    def clear(self):
+        """
+        Empties the basket.
+        """
+        with self.__basketLock:
+            with self.__pendingLock:
+                self.__pendingCounts = {}
+                self.__numChanges += 1
+                self.__basket.clear()
+                self.__snapshot = BasketSnapshot(None, self.__numChanges)
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __isKnown(self, itemName):
+        """
+        Must be called with the pending lock held.
+
+        Args:
+            itemName (str): The name of an item.
+
+        Returns:
+            bool. True if the item is in our inventory.
+        """
+        if itemName in self.__knownNames:
+            return True
+
+        if self.__inventory.getItem(itemName) is None:
+            return False
+
+        self.__knownNames.add(itemName)
+        return True
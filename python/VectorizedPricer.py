@@ -0,0 +1,314 @@
+"""
+Module providing a pricing engine which prices large batches of baskets at
+once using NumPy array operations, rather than a Basket per basket.
+
+NumPy is optional - the rest of the package works without it.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class VectorizedPricer(object):
+    """
+    Class pricing batches of baskets given as sparse count matrices over the
+    items in an inventory.
+
+    Each item in the inventory is given an index, and a batch of baskets is
+    given as three parallel arrays of basket index, item index + count - one
+    entry for each non-zero element of the (baskets x items) count matrix.
+
+    The offers are applied the same way as Basket - three-for-twos first,
+    then the remaining items in each promo group are sorted by decreasing
+    price, and every third one is free - so the totals + savings match
+    Basket.total() and Basket.savings() exactly.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, inventory):
+        """
+        Initializes an instance of the class, indexing the items in the given
+        inventory. Later changes to the inventory aren't seen by the pricer.
+
+        Args:
+            inventory (Inventory): The inventory to price baskets with. Any
+                object with a getItems method can be used.
+
+        Raises:
+            ImportError: If NumPy isn't installed.
+        """
+        if numpy is None:
+            raise ImportError("VectorizedPricer requires NumPy")
+
+        items = inventory.getItems()
+
+        # Dictionary mapping item name -> index into the columns
+        self.__indexByName = dict((item.name(), index)
+                                  for index, item in enumerate(items))
+
+        # The columns - the price (in pence) + promo group code of each item.
+        # Code 0 is always the empty promo group.
+        promoGroupCodesByName = {"": 0}
+        promoGroupCodes = []
+        for item in items:
+            promoGroupCodes.append(promoGroupCodesByName.setdefault(
+                item.promoGroup(), len(promoGroupCodesByName)))
+
+        self.__prices = numpy.array([item.price() for item in items], dtype=numpy.int64)
+        self.__promoGroupCodes = numpy.array(promoGroupCodes, dtype=numpy.int64)
+        self.__numPromoGroups = len(promoGroupCodesByName)
+
+        # The rank of each item's price, from the most expensive down, so that
+        # entries can be sorted by a single integer key rather than by several
+        # columns
+        self.__priceRanks = numpy.empty(len(items), dtype=numpy.int64)
+        self.__priceRanks[numpy.argsort(-self.__prices, kind="mergesort")] = \
+            numpy.arange(len(items), dtype=numpy.int64)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def numItems(self):
+        """
+        Returns:
+            int. The number of items which can be priced.
+        """
+        return len(self.__prices)
+
+    def indexOf(self, itemName):
+        """
+        Args:
+            itemName (str): The name of an item.
+
+        Returns:
+            int or None. The index of the item with the given name, or None if
+                no such item was found.
+        """
+        return self.__indexByName.get(itemName)
+
+    def countMatrix(self, baskets):
+        """
+        Builds the sparse count matrix for the given baskets. Names which
+        aren't in the inventory are skipped, like Basket.addItems.
+
+        Args:
+            baskets (iterable of (iterable of str, or dict of str -> int)):
+                The names of the items in each basket, or dictionaries mapping
+                item name -> count.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray, int). The basket
+                index, item index + count of each entry in the matrix, and the
+                number of baskets.
+        """
+        indexByName = self.__indexByName
+        basketIndices = []
+        itemIndices = []
+        counts = []
+
+        numBaskets = 0
+        for basket in baskets:
+            if hasattr(basket, "iteritems"):
+                pairs = basket.iteritems()
+            else:
+                pairs = ((itemName, 1) for itemName in basket)
+
+            for itemName, count in pairs:
+                itemIndex = indexByName.get(itemName)
+                if itemIndex is not None:
+                    basketIndices.append(numBaskets)
+                    itemIndices.append(itemIndex)
+                    counts.append(count)
+
+            numBaskets += 1
+
+        return (numpy.array(basketIndices, dtype=numpy.int64),
+                numpy.array(itemIndices, dtype=numpy.int64),
+                numpy.array(counts, dtype=numpy.int64),
+                numBaskets)
+
+    def price(self, basketIndices, itemIndices, counts, numBaskets=None):
+        """
+        Prices a batch of baskets.
+
+        The same item may appear more than once in a basket, in which case
+        the counts are added together.
+
+        Args:
+            basketIndices (array of int): The basket index of each entry.
+            itemIndices (array of int): The item index of each entry.
+            counts (array of int): The number of the item in the basket.
+            numBaskets (int): The number of baskets, or None to use the
+                largest basket index + 1. (Default: None)
+
+        Raises:
+            ValueError: If the arrays aren't the same length, or any count is
+                < 0.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray). The total + savings of each basket,
+                in pence.
+        """
+        basketIndices = numpy.asarray(basketIndices, dtype=numpy.int64)
+        itemIndices = numpy.asarray(itemIndices, dtype=numpy.int64)
+        counts = numpy.asarray(counts, dtype=numpy.int64)
+
+        if not len(basketIndices) == len(itemIndices) == len(counts):
+            raise ValueError("Basket indices, item indices + counts must be the same length")
+
+        if len(counts) and counts.min() < 0:
+            raise ValueError("Counts must be >= 0")
+
+        if numBaskets is None:
+            numBaskets = int(basketIndices.max()) + 1 if len(basketIndices) else 0
+
+        basketIndices, itemIndices, counts = self.__combineEntries(
+            basketIndices, itemIndices, counts)
+
+        prices = self.__prices[itemIndices]
+        promoGroupCodes = self.__promoGroupCodes[itemIndices]
+
+        # Apply the three-for-twos
+        numThreeForTwos = counts // 3
+        remaining = counts - 3 * numThreeForTwos
+        costs = 2 * numThreeForTwos * prices
+        savings = numThreeForTwos * prices
+
+        # Items which aren't in a promo group pay full price for the rest
+        ungrouped = promoGroupCodes == 0
+        costs[ungrouped] += remaining[ungrouped] * prices[ungrouped]
+
+        # Apply the cheapest free offers to the rest
+        grouped = ~ungrouped & (remaining > 0)
+        groupCosts, groupSavings = self.__priceCheapestFree(
+            basketIndices[grouped], itemIndices[grouped], prices[grouped],
+            remaining[grouped], numBaskets)
+        costs[grouped] += groupCosts
+        savings[grouped] += groupSavings
+
+        return (self.__sumByBasket(basketIndices, costs, numBaskets),
+                self.__sumByBasket(basketIndices, savings, numBaskets))
+
+    def priceBaskets(self, baskets):
+        """
+        Prices the given baskets.
+
+        Args:
+            baskets (iterable of (iterable of str, or dict of str -> int)):
+                The names of the items in each basket, or dictionaries mapping
+                item name -> count.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray). The total + savings of each basket,
+                in pence.
+        """
+        basketIndices, itemIndices, counts, numBaskets = self.countMatrix(baskets)
+
+        return self.price(basketIndices, itemIndices, counts, numBaskets)
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __combineEntries(self, basketIndices, itemIndices, counts):
+        """
+        Adds together the counts of entries for the same item in the same
+        basket.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray). The basket index,
+                item index + count of each distinct entry, sorted by basket.
+        """
+        numItems = max(self.numItems(), 1)
+        keys = basketIndices * numItems + itemIndices
+        uniqueKeys, index, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+        if len(uniqueKeys) == len(keys):
+            return basketIndices[index], itemIndices[index], counts[index]
+
+        combinedCounts = numpy.zeros(len(uniqueKeys), dtype=numpy.int64)
+        numpy.add.at(combinedCounts, inverse, counts)
+
+        return uniqueKeys // numItems, uniqueKeys % numItems, combinedCounts
+
+    def __priceCheapestFree(self, basketIndices, itemIndices, prices, counts,
+                            numBaskets):
+        """
+        Applies the cheapest free offers to the given entries, which are the
+        items left in each promo group after the three-for-twos.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray). The cost + savings of each entry.
+        """
+        if not len(counts):
+            return counts.copy(), counts.copy()
+
+        promoGroupCodes = self.__promoGroupCodes[itemIndices]
+
+        # Sort the entries by basket, then promo group, then decreasing price.
+        # Combining the columns into one key is much quicker to sort, if it
+        # fits in 64 bits.
+        numPromoGroups = self.__numPromoGroups
+        numItems = self.numItems()
+        if numBaskets * numPromoGroups * numItems < 2 ** 62:
+            keys = basketIndices * numPromoGroups + promoGroupCodes
+            keys *= numItems
+            keys += self.__priceRanks[itemIndices]
+            order = keys.argsort()
+        else:
+            order = numpy.lexsort((-prices, promoGroupCodes, basketIndices))
+
+        sortedBaskets = basketIndices[order]
+        sortedGroups = promoGroupCodes[order]
+        sortedPrices = prices[order]
+        sortedCounts = counts[order]
+
+        # Find where each (basket, promo group) segment starts
+        isStart = numpy.empty(len(order), dtype=bool)
+        isStart[0] = True
+        isStart[1:] = ((sortedBaskets[1:] != sortedBaskets[:-1]) |
+                       (sortedGroups[1:] != sortedGroups[:-1]))
+        segmentStarts = numpy.flatnonzero(isStart)
+        segmentIds = numpy.cumsum(isStart) - 1
+
+        # The position of each entry's first unit within its segment, and the
+        # number of units in the segment which are bundled into threes
+        ends = numpy.cumsum(sortedCounts)
+        starts = ends - sortedCounts
+        segmentOffsets = starts[segmentStarts]
+        segmentTotals = numpy.add.reduceat(sortedCounts, segmentStarts)
+        numBundled = (segmentTotals - segmentTotals % 3)[segmentIds]
+
+        positions = starts - segmentOffsets[segmentIds]
+        endPositions = positions + sortedCounts
+
+        # Units at positions 2, 5, 8, ... within the bundled units are free,
+        # and there are (position / 3) free units before any given position
+        numFree = (numpy.minimum(endPositions, numBundled) // 3 -
+                   numpy.minimum(positions, numBundled) // 3)
+
+        costs = numpy.empty_like(sortedCounts)
+        savings = numpy.empty_like(sortedCounts)
+        costs[order] = (sortedCounts - numFree) * sortedPrices
+        savings[order] = numFree * sortedPrices
+
+        return costs, savings
+
+    def __sumByBasket(self, basketIndices, values, numBaskets):
+        """
+        Args:
+            basketIndices (numpy.ndarray): The basket index of each value,
+                sorted.
+            values (numpy.ndarray): The values to sum.
+            numBaskets (int): The number of baskets.
+
+        Returns:
+            numpy.ndarray. The sum of the given values for each basket.
+        """
+        # Sum each basket's run of values in int64, rather than with bincount,
+        # which only sums floats, and would be inexact above 2**53 pence
+        sums = numpy.zeros(numBaskets, dtype=numpy.int64)
+        if len(values):
+            starts = numpy.flatnonzero(numpy.concatenate(
+                ([True], basketIndices[1:] != basketIndices[:-1])))
+            sums[basketIndices[starts]] = numpy.add.reduceat(values, starts)
+
+        return sums
@@ -0,0 +1,365 @@
+"""
+Module providing immutable, versioned views of an inventory, which can be
+updated without disturbing readers of older versions.
+"""
+import threading
+
+from Inventory import (
+    Inventory,
+    InventoryChanges,
+    changesFromItems,
+    formatItemsPretty,
+    readDelta
+)
+
+
+class InventoryVersion(object):
+    """
+    Class representing an immutable version of an inventory.
+
+    A version is a base inventory, which is never modified once it's shared,
+    plus an overlay of the items which have changed since the base was built.
+    Versions built from the same base share it, so the memory used by each
+    version is proportional to how much it differs from its base.
+
+    The overlay is a chain of deltas - each version holds the items changed
+    by its own update, plus a pointer to the version before it, so updating
+    costs as much as the changes and versions share the deltas they have in
+    common. To keep lookups short, a new delta is merged into the one before
+    it whenever that's less than twice its size, so the deltas at least
+    halve in size along the chain, and there are at most log2 of the overlay
+    size of them.
+
+    Provides the same lookup methods as Inventory.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, number, base, delta, parent=None):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            number (int): The version number.
+            base (Inventory): The inventory this version is built on.
+            delta (dict of str -> Item): The items which differ from the
+                parent version (or the base, if there's no parent), with None
+                for items which have been removed.
+            parent (InventoryVersion): The version this one updates, which
+                must be built on the same base. (Default: None)
+        """
+        # Merge the delta into the parent's while that's less than twice as
+        # big, copying rather than modifying it, since the parent may still
+        # be in use
+        while parent is not None and len(parent.__delta) <= 2 * len(delta):
+            merged = dict(parent.__delta)
+            merged.update(delta)
+            delta = merged
+            parent = parent.__parent
+
+        self.__number = number
+        self.__base = base
+        self.__delta = delta
+        self.__parent = parent
+
+        # The number of changed items in the chain, counting items changed
+        # in more than one delta more than once
+        self.__overlaySize = len(delta) + (parent.__overlaySize if parent is not None else 0)
+
+    # Public Instance Methods -------------------------------------------------
+
+    def number(self):
+        """
+        Returns:
+            int. The version number - later versions have larger numbers.
+        """
+        return self.__number
+
+    def version(self):
+        """
+        Returns:
+            int. A number which changes whenever the contents of the
+                inventory change - the version number.
+        """
+        return self.__number
+
+    def base(self):
+        """
+        Returns:
+            Inventory. The inventory this version is built on.
+        """
+        return self.__base
+
+    def overlay(self):
+        """
+        Returns:
+            dict of str -> Item. A copy of the items which differ from the
+                base, with None for items which have been removed.
+        """
+        deltas = []
+        version = self
+        while version is not None:
+            deltas.append(version.__delta)
+            version = version.__parent
+
+        # Apply the oldest delta first, so later changes win
+        overlay = {}
+        for delta in reversed(deltas):
+            overlay.update(delta)
+
+        return overlay
+
+    def overlaySize(self):
+        """
+        Returns:
+            int. At most the number of items which differ from the base - an
+                item changed by several updates may be counted more than once.
+        """
+        return self.__overlaySize
+
+    def getItem(self, itemName):
+        """
+        Returns:
+            Item or None. The item in this version with the given name, or
+                None if no such item was found.
+        """
+        version = self
+        while version is not None:
+            delta = version.__delta
+            if itemName in delta:
+                return delta[itemName]
+
+            version = version.__parent
+
+        return self.__base.getItem(itemName)
+
+    def getItems(self):
+        """
+        Returns:
+            list of Item. The items in this version.
+        """
+        overlay = self.overlay()
+        items = [item for item in self.__base.getItems()
+                 if item.name() not in overlay]
+        items.extend(item for item in overlay.itervalues() if item is not None)
+
+        return items
+
+    def getItemsPretty(self):
+        """
+        Returns:
+            str. A nicely formatted string representing the items in this version.
+        """
+        return formatItemsPretty(self.getItems())
+
+
+class VersionedInventory(object):
+    """
+    Class holding the current version of an inventory.
+
+    Updates build a new InventoryVersion and then swap it in, so readers
+    holding an older version are never affected, and never wait for an
+    update. Updates are serialized with a lock.
+
+    Baskets created with a VersionedInventory use the version which was current
+    when they were created.
+    """
+
+    # Initializer -------------------------------------------------------------
+
+    def __init__(self, inventory=None, maxOverlaySize=1024, maxOverlayFraction=0.1):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            inventory (Inventory): The initial contents - an Inventory,
+                SnapshotInventory or SqliteInventory, which must not be
+                modified afterwards. (Default: an empty inventory)
+            maxOverlaySize (int): The number of changed items a version can
+                hold on top of its base before a new base is built, if that's
+                more than the maximum fraction below. (Default: 1024)
+            maxOverlayFraction (float): The fraction of the base's items a
+                version can hold on top of the base before a new base is
+                built, if that's more than the maximum size above.
+                (Default: 0.1)
+        """
+        if inventory is None:
+            inventory = Inventory()
+
+        self.__maxOverlaySize = maxOverlaySize
+        self.__maxOverlayFraction = maxOverlayFraction
+
+        # The number of items in the current base
+        self.__baseSize = len(inventory)
+
+        self.__current = InventoryVersion(1, inventory, {})
+        self.__lock = threading.Lock()
+
+    # Public Instance Methods -------------------------------------------------
+
+    def current(self):
+        """
+        Returns:
+            InventoryVersion. The current version of the inventory.
+        """
+        return self.__current
+
+    def version(self):
+        """
+        Returns:
+            int. A number which changes whenever the contents of the
+                inventory change - the current version number.
+        """
+        return self.__current.number()
+
+    def getItem(self, itemName):
+        """
+        Returns:
+            Item or None. The item in the current version with the given name,
+                or None if no such item was found.
+        """
+        return self.__current.getItem(itemName)
+
+    def getItems(self):
+        """
+        Returns:
+            list of Item. The items in the current version.
+        """
+        return self.__current.getItems()
+
+    def getItemsPretty(self):
+        """
+        Returns:
+            str. A nicely formatted string representing the items in the
+                current version.
+        """
+        return self.__current.getItemsPretty()
+
+    def applyChanges(self, changes):
+        """
+        Builds a new version with the given changes, and makes it current.
+
+        Args:
+            changes (InventoryChanges): The changes to apply.
+
+        Returns:
+            InventoryVersion. The new current version.
+        """
+        with self.__lock:
+            return self.__applyChanges(changes)
+
+    def reloadFromDisk(self, filePath, numProcesses=1):
+        """
+        Builds a new version matching the contents of the given CSV file, and
+        makes it current. Only the items which differ are stored in the new
+        version.
+
+        Args:
+            filePath (str): Path to the file to read.
+            numProcesses (int): The number of processes to parse the file
+                with. (Default: 1)
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes made to the inventory.
+        """
+        newInventory = Inventory()
+        newInventory.readFromDisk(filePath, numProcesses)
+
+        with self.__lock:
+            current = self.__current
+            newItems = dict((item.name(), item) for item in newInventory.getItems())
+            for item in current.getItems():
+                newItems.setdefault(item.name(), None)
+
+            changes = changesFromItems(current, newItems)
+            self.__applyChanges(changes)
+
+        return changes
+
+    def applyDeltaFromDisk(self, filePath):
+        """
+        Builds a new version with the changes in the given delta CSV file, and
+        makes it current. See Inventory.readDeltaFromDisk for the format of
+        the file.
+
+        Args:
+            filePath (str): Path to the file to read.
+
+        Raises:
+            IOError: If a readable file doesn't exist at the given path.
+
+        Returns:
+            InventoryChanges. The changes made to the inventory.
+        """
+        newItems = readDelta(filePath)
+
+        with self.__lock:
+            changes = changesFromItems(self.__current, newItems)
+            self.__applyChanges(changes)
+
+        return changes
+
+    # Private Instance Methods ------------------------------------------------
+
+    def __applyChanges(self, changes):
+        """
+        Builds a new version with the given changes, and makes it current.
+        Must be called with the lock held.
+
+        Args:
+            changes (InventoryChanges): The changes to apply.
+
+        Returns:
+            InventoryVersion. The new current version.
+        """
+        current = self.__current
+
+        delta = {}
+        for item in changes.added() + changes.changed():
+            delta[item.name()] = item
+
+        for name in changes.removed():
+            delta[name] = None
+
+        version = InventoryVersion(current.number() + 1, current.base(), delta, current)
+
+        # Build a new base once the overlay gets too big, so that the memory
+        # used by each version stays small
+        maxOverlaySize = max(self.__maxOverlaySize,
+                             int(self.__baseSize * self.__maxOverlayFraction))
+        if version.overlaySize() > maxOverlaySize:
+            overlay = version.overlay()
+            base = _copyInventory(current.base())
+            base.applyChanges(InventoryChanges(
+                [item for item in overlay.itervalues() if item is not None], (),
+                [name for name, item in overlay.iteritems() if item is None]))
+            self.__baseSize = len(base)
+
+            version = InventoryVersion(version.number(), base, {})
+
+        # Assigning the attribute is atomic, so readers see either the old or
+        # the new version
+        self.__current = version
+
+        return version
+
+
+def _copyInventory(inventory):
+    """
+    Args:
+        inventory (Inventory): The inventory to copy. Any object with a
+            getItems method can be used.
+
+    Returns:
+        Inventory. A new, modifiable inventory with the same contents.
+    """
+    if isinstance(inventory, Inventory):
+        return inventory.copy()
+
+    copy = Inventory()
+    copy.addItems(inventory.getItems())
+
+    return copy
@@ -1,71 +1,207 @@
 import argparse
+import os
+import socket
+import sqlite3
+import sys
+from collections import OrderedDict
 
 from Basket import Basket
+from Batch import (
+    BatchFormats,
+    batchFormatForPath,
+    writeBatch
+)
 from Inventory import Inventory
+from PricingCache import DefaultCacheSize
 from Receipt import Receipt
-
-
-def readInventory(inventoryFile):
+from ReceiptData import (
+    ReceiptFormats,
+    receiptData,
+    writeReceiptData
+)
+from Server import (
+    CheckoutServer,
+    CheckoutService,
+    parseAddress
+)
+from Snapshot import (
+    SnapshotError,
+    compileSnapshot,
+    loadInventory
+)
+from SqliteInventory import (
+    SqliteInventory,
+    isDatabasePath
+)
+
+
+def readInventory(inventoryFile, useSnapshot=True, numProcesses=1, messageFile=None):
     """
     Reads the given inventory file and returns a populated Inventory instance.
 
+    SQLite databases (files ending in .db, .sqlite or .sqlite3) are used
+    directly. Otherwise, by default the inventory is loaded from a compiled
+    snapshot of the file, which is rebuilt first if it's missing or out of
+    date. If the snapshot can't be used, the file is read directly.
+
     Args:
         inventoryFile (str): The file from which to read the inventory.
+        useSnapshot (bool): Whether to load the inventory from a compiled
+            snapshot. (Default: True)
+        numProcesses (int): The number of processes to parse the file with.
+            (Default: 1)
+        messageFile (file): The file to write warnings + errors to, or None
+            for stdout. Use stderr when the output is for other programs to
+            read. (Default: None)
 
     Returns:
-        Inventory or None. The inventory file read from disk, or None if the
-            file couldn't be read.
+        Inventory, SnapshotInventory, SqliteInventory or None. The inventory
+            file read from disk, or None if the file couldn't be read.
     """
+    if messageFile is None:
+        messageFile = sys.stdout
+
+    def warn(message):
+        messageFile.write("[WARNING] : %s\n" % message)
+
+    if isDatabasePath(inventoryFile):
+        if not os.path.isfile(inventoryFile):
+            messageFile.write("[ERROR] : couldn't find inventory database: %r\n"
+                              % inventoryFile)
+            return None
+
+        try:
+            return SqliteInventory(inventoryFile)
+
+        except sqlite3.Error as exception:
+            messageFile.write("[ERROR] : couldn't read inventory from database: %r - %s\n"
+                              % (inventoryFile, exception))
+            return None
+
+    if useSnapshot and os.path.isfile(inventoryFile):
+        try:
+            return loadInventory(inventoryFile, numProcesses=numProcesses, warn=warn)
+
+        except (IOError, OSError, SnapshotError) as exception:
+            warn("couldn't use inventory snapshot for file: %r - %s"
+                 % (inventoryFile, exception))
+
     # Read the inventory from disk
     inventory = Inventory()
     try:
-        inventory.readFromDisk(inventoryFile)
+        inventory.readFromDisk(inventoryFile, numProcesses, warn)
 
     except IOError as exception:
-        print("[ERROR] : couldn't read inventory from file: %r - %s"
-              % (args.inventoryFile, exception))
+        messageFile.write("[ERROR] : couldn't read inventory from file: %r - %s\n"
+                          % (inventoryFile, exception))
         return None
 
     return inventory
 
 
-def readItems(itemsFile):
+def compileInventory(inventoryFile, numProcesses=1):
     """
-    Reads the given items file and returns a list of the items.
+    Compiles a snapshot of the given inventory file.
 
     Args:
-        itemsFile (str): The file from which to read the items.
+        inventoryFile (str): The file from which to read the inventory.
+        numProcesses (int): The number of processes to parse the file with.
+            (Default: 1)
+    """
+    try:
+        snapshotPath = compileSnapshot(inventoryFile, numProcesses=numProcesses)
+
+    except (IOError, OSError) as exception:
+        print("[ERROR] : couldn't compile inventory from file: %r - %s"
+              % (inventoryFile, exception))
+        return
+
+    print("Compiled inventory snapshot: %s" % snapshotPath)
+
+
+def readItems(itemsFile, messageFile=None):
+    """
+    Reads the given items file, one item per line, yielding the items as
+    they're read rather than reading the whole file first.
+
+    Args:
+        itemsFile (str): The file from which to read the items, or "-" to
+            read from stdin.
+        messageFile (file): The file to write errors to, or None for stdout.
+            (Default: None)
 
     Returns:
-        list of str. The items found in the file.
+        generator of str. The items found in the file.
     """
-    result = []
+    if messageFile is None:
+        messageFile = sys.stdout
+
+    if itemsFile == "-":
+        itemsStream = sys.stdin
+    else:
+        try:
+            itemsStream = open(itemsFile)
+
+        except IOError as exception:
+            messageFile.write("[ERROR] : couldn't read items from file: %r - %s\n"
+                              % (itemsFile, exception))
+            return
 
     try:
-        with open(itemsFile) as itemsFile:
-           for item in itemsFile:
-                # Strip leading/trailing whitespace
-                strippedItem = item.strip()
-                if strippedItem:
-                    result.append(strippedItem)
+        for item in itemsStream:
+            # Strip leading/trailing whitespace
+            strippedItem = item.strip()
+            if strippedItem:
+                yield strippedItem
 
     except IOError as exception:
-        print("[ERROR] : couldn't read items from file: %r - %s"
-              % (itemsFile, exception))
-        return []
+        messageFile.write("[ERROR] : couldn't read items from file: %r - %s\n"
+                          % (itemsFile, exception))
 
-    return result
+    finally:
+        if itemsStream is not sys.stdin:
+            itemsStream.close()
 
 
-def printInventory(inventoryFile):
+def countItems(itemNames):
+    """
+    Collapses repeated item names into counts, so that a long list of items
+    only takes as much memory as the number of distinct items.
+
+    Args:
+        itemNames (iterable of str): The names of the items.
+
+    Returns:
+        OrderedDict of str -> int. The count of each item name, in the order
+            they were first seen.
+    """
+    # Count into a plain dictionary, which is much quicker to update than an
+    # OrderedDict, and only keep the order of the first sighting of each name
+    counts = {}
+    order = []
+    for itemName in itemNames:
+        if itemName in counts:
+            counts[itemName] += 1
+        else:
+            counts[itemName] = 1
+            order.append(itemName)
+
+    return OrderedDict((itemName, counts[itemName]) for itemName in order)
+
+
+def printInventory(inventoryFile, useSnapshot=True, numProcesses=1):
     """
     Prints the contents of the given inventory file.
 
     Args:
         inventoryFile (str): The file from which to read the inventory.
+        useSnapshot (bool): Whether to load the inventory from a compiled
+            snapshot. (Default: True)
+        numProcesses (int): The number of processes to parse the inventory
+            file with. (Default: 1)
     """
     # Read the inventory from disk
-    inventory = readInventory(inventoryFile)
+    inventory = readInventory(inventoryFile, useSnapshot, numProcesses)
     if inventory is None:
         return
 
@@ -73,37 +209,160 @@ def printInventory(inventoryFile):
     print("Contents of inventory:\n\n%s" % items)
 
 
-def printShoppingBasket(inventoryFile, itemNames):
+def printShoppingBasket(inventoryFile, itemNames, useSnapshot=True,
+                        numProcesses=1, receiptFormat=None):
     """
     Prints a receipt of the total cost and savings for the given list of items,
     using the given inventory.
 
     Args:
         inventoryFile (str): The file from which to read the inventory.
-        itemNames (list of str): The names of the items for which to calculate
-            and print the cost and savings.
+        itemNames (iterable of str, or dict of str -> int): The names of the
+            items for which to calculate and print the cost and savings, or a
+            dictionary mapping item name -> count. Repeated names are counted
+            as they're read, so the names can be a generator of any length.
+        useSnapshot (bool): Whether to load the inventory from a compiled
+            snapshot. (Default: True)
+        numProcesses (int): The number of processes to parse the inventory
+            file with. (Default: 1)
+        receiptFormat (str): The structured format to print the receipt in -
+            one of ReceiptFormats - or None to print it as text.
+            (Default: None)
     """
+    # Collapse the items into counts before they reach the basket, so that
+    # only the distinct items are held in memory. No items may be given at all.
+    if not hasattr(itemNames, "iteritems"):
+        itemNames = countItems(itemNames or ())
+
+    # Keep warnings out of the way of structured output
+    messageFile = sys.stdout if receiptFormat is None else sys.stderr
+
     # Exit early if we haven't been given any items
     if not itemNames:
-        print("[WARNING] : no items found.")
+        messageFile.write("[WARNING] : no items found.\n")
         return
 
     # Read the inventory from disk
-    inventory = readInventory(inventoryFile)
+    inventory = readInventory(inventoryFile, useSnapshot, numProcesses, messageFile)
     if inventory is None:
         return
 
     # Create a basket from the given items
     basket = Basket(inventory)
-    for itemName in itemNames:
-        try:
-            basket.addItem(itemName)
-        except KeyError as exception:
-            print("[WARNING] : couldn't find item %r in inventory" % itemName)
+    unknownNames = basket.addItems(itemNames)
 
-    # Create a receipt from the basket
-    receipt = Receipt.GetReceipt(basket)
-    print(receipt)
+    if receiptFormat is not None:
+        for itemName in unknownNames:
+            messageFile.write("[WARNING] : couldn't find item %r in inventory\n" % itemName)
+
+        data = receiptData(basket)
+        data["unknownItems"] = unknownNames
+        writeReceiptData(data, sys.stdout, receiptFormat)
+        return
+
+    for itemName in unknownNames:
+        print("[WARNING] : couldn't find item %r in inventory" % itemName)
+
+    # Write the receipt for the basket as it's generated, rather than building
+    # it in memory first
+    Receipt.WriteReceipt(basket, sys.stdout)
+    sys.stdout.write("\n")
+
+
+def printBatch(inventoryFile, batchFile, batchFormat=None, useSnapshot=True,
+               numProcesses=1, numWorkers=1, cacheSize=DefaultCacheSize,
+               receiptFormat=None):
+    """
+    Prices each basket in the given batch file, writing the results to stdout
+    as JSON lines, or the full receipts in a structured format.
+
+    Args:
+        inventoryFile (str): The file from which to read the inventory.
+        batchFile (str): The file from which to read the baskets, or "-" to
+            read from stdin.
+        batchFormat (str): The format of the batch file - one of BatchFormats,
+            or None to choose based on the file extension. (Default: None)
+        useSnapshot (bool): Whether to load the inventory from a compiled
+            snapshot. (Default: True)
+        numProcesses (int): The number of processes to parse the inventory
+            file with. (Default: 1)
+        numWorkers (int): The number of processes to price the baskets with.
+            (Default: 1)
+        cacheSize (int): The number of priced baskets for each process to
+            keep, so that repeated baskets aren't priced again.
+            (Default: DefaultCacheSize)
+        receiptFormat (str): The format to write the full receipt for each
+            basket in - one of ReceiptFormats - or None to write the totals
+            as JSON lines. (Default: None)
+    """
+    # Read the inventory from disk, once for all the baskets. The results are
+    # always for other programs to read, so keep warnings out of the way.
+    inventory = readInventory(inventoryFile, useSnapshot, numProcesses, sys.stderr)
+    if inventory is None:
+        return
+
+    if batchFormat is None:
+        batchFormat = batchFormatForPath(batchFile)
+
+    try:
+        if batchFile == "-":
+            numBaskets, numErrors = writeBatch(inventory, sys.stdin, sys.stdout,
+                                               batchFormat, numWorkers,
+                                               cacheSize=cacheSize,
+                                               receiptFormat=receiptFormat)
+        else:
+            with open(batchFile, "rb") as batchStream:
+                numBaskets, numErrors = writeBatch(inventory, batchStream, sys.stdout,
+                                                   batchFormat, numWorkers,
+                                                   cacheSize=cacheSize,
+                                                   receiptFormat=receiptFormat)
+
+    except IOError as exception:
+        sys.stderr.write("[ERROR] : couldn't read baskets from file: %r - %s\n"
+                         % (batchFile, exception))
+        return
+
+    if numErrors:
+        sys.stderr.write("[WARNING] : couldn't price %d of %d baskets\n"
+                         % (numErrors, numBaskets))
+
+
+def serve(inventoryFile, address, useSnapshot=True, numProcesses=1,
+          cacheSize=DefaultCacheSize):
+    """
+    Runs a checkout server, pricing baskets with the given inventory until
+    interrupted.
+
+    Args:
+        inventoryFile (str): The file from which to read the inventory.
+        address (str): The "host:port" or ":port" to listen on, or the path of
+            a Unix socket.
+        useSnapshot (bool): Whether to load the inventory from a compiled
+            snapshot. (Default: True)
+        numProcesses (int): The number of processes to parse the inventory
+            file with. (Default: 1)
+        cacheSize (int): The number of one-off baskets to keep the prices of.
+            (Default: DefaultCacheSize)
+    """
+    # Read the inventory from disk, once for all the requests
+    inventory = readInventory(inventoryFile, useSnapshot, numProcesses)
+    if inventory is None:
+        return
+
+    try:
+        server = CheckoutServer(CheckoutService(inventory, cacheSize),
+                                parseAddress(address))
+
+    except (ValueError, socket.error) as exception:
+        print("[ERROR] : couldn't listen on address: %r - %s" % (address, exception))
+        return
+
+    print("Serving checkout requests on: %s" % (server.address(), ))
+    try:
+        server.serveForever()
+
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
@@ -121,26 +380,91 @@ def main():
     parser.add_argument("--list", action="store_true",
                         help="List the contents of the inventory file")
 
+    # Optional flag to compile a snapshot of the inventory, for faster loading
+    parser.add_argument("--compile", action="store_true",
+                        help="Compile a snapshot of the inventory file")
+
+    # Optional flag to always read the inventory file directly
+    parser.add_argument("--noSnapshot", action="store_true",
+                        help="Don't load the inventory from a compiled snapshot")
+
+    # Optional number of processes to parse the inventory file with
+    parser.add_argument("--jobs", action="store", type=int, default=1,
+                        help="Number of processes to parse the inventory file with")
+
+    # Optional file of baskets to price in one go, instead of a single basket
+    parser.add_argument("--batch", action="store", metavar="BATCH_FILE",
+                        help="Price each basket in a JSON lines or CSV file "
+                             "('-' for stdin), writing the results as JSON lines")
+    parser.add_argument("--batchFormat", action="store", choices=BatchFormats,
+                        help="Format of the batch file (default: based on "
+                             "the file extension)")
+
+    # Optional number of processes to price the batch with
+    parser.add_argument("--workers", action="store", type=int, default=1,
+                        help="Number of processes to price the batch with")
+
+    # Optional number of priced baskets to keep, for pricing repeated baskets
+    parser.add_argument("--cacheSize", action="store", type=int,
+                        default=DefaultCacheSize,
+                        help="Number of priced baskets to keep in each process "
+                             "when pricing a batch, or 0 to price every basket")
+
+    # Optional structured format for receipts, for other programs to read
+    parser.add_argument("--format", action="store", choices=ReceiptFormats,
+                        dest="receiptFormat",
+                        help="Write receipts as JSON, JSON lines or CSV rather "
+                             "than text - with --batch, the full receipt for "
+                             "each basket rather than just the totals")
+
+    # Optional address to serve checkout requests on, instead of pricing a
+    # single basket
+    parser.add_argument("--serve", action="store", metavar="ADDRESS",
+                        help="Serve checkout requests as JSON lines on a "
+                             "'host:port', ':port' or Unix socket path")
+
     # Items can either be given as arguments or supplied in a text file
     itemsGroup = parser.add_mutually_exclusive_group()
-    itemsGroup.add_argument('--itemsFile', action='store')
+    itemsGroup.add_argument('--itemsFile', action='store',
+                            help="File of items, one per line ('-' for stdin)")
     itemsGroup.add_argument('--items', action='store',
                             nargs=argparse.REMAINDER)
 
     args = parser.parse_args()
 
+    useSnapshot = not args.noSnapshot
+
+    # Compile the inventory if we've been asked to
+    if args.compile:
+        compileInventory(args.inventoryFile, args.jobs)
+        exit()
+
     # List the contents of the inventory if we've been asked to
     if args.list:
-        printInventory(args.inventoryFile)
+        printInventory(args.inventoryFile, useSnapshot, args.jobs)
+        exit()
+
+    # Price a batch of baskets if we've been asked to
+    if args.batch:
+        printBatch(args.inventoryFile, args.batch, args.batchFormat, useSnapshot,
+                   args.jobs, args.workers, args.cacheSize, args.receiptFormat)
+        exit()
+
+    # Run a checkout server if we've been asked to
+    if args.serve:
+        serve(args.inventoryFile, args.serve, useSnapshot, args.jobs, args.cacheSize)
         exit()
 
-    # Read the shopping list from disk if a file was provided
+    # Read the shopping list from disk (or stdin) if a file was provided - the
+    # items are read as they're counted, rather than all in one go
     itemNames = []
     if args.itemsFile:
-        itemNames = readItems(args.itemsFile)
+        itemNames = readItems(args.itemsFile,
+                              sys.stdout if args.receiptFormat is None else sys.stderr)
     else:
         itemNames = args.items
 
     # Compute and print the shopping basket
-    printShoppingBasket(args.inventoryFile, itemNames)
+    printShoppingBasket(args.inventoryFile, itemNames, useSnapshot, args.jobs,
+                        args.receiptFormat)
 
@@ -1,4 +1,5 @@
 import unittest
+from collections import OrderedDict
 
 from python.Basket import Basket
 from python.Inventory import Inventory
@@ -6,13 +7,13 @@ from python.Item import Item
 
 
 # Define some test items
-beans = Item("beans", 1.0, "canned")
-spaghettiHoops = Item("spaghetti hoops", 1.5, "canned")
-chickpeas = Item("chickpeas", 0.75, "canned")
+beans = Item("beans", 100, "canned")
+spaghettiHoops = Item("spaghetti hoops", 150, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
 
-peas = Item("peas", 1.5, "frozen")
-potatoWaffles = Item("potato waffles", 2.5, "frozen")
-iceCream = Item("ice cream", 4.0, "frozen")
+peas = Item("peas", 150, "frozen")
+potatoWaffles = Item("potato waffles", 250, "frozen")
+iceCream = Item("ice cream", 400, "frozen")
 
 items = (beans, spaghettiHoops, chickpeas, peas, potatoWaffles, iceCream)
 
@@ -39,8 +40,8 @@ class TestSimpleBasket(_BaseTestCase):
     def test_emptyBasket(self):
         """ Test that an empty basket costs nothing. """
         basket = self.createBasket()
-        self.assertEqual(basket.total(), 0.0)
-        self.assertEqual(basket.savings(), 0.0)
+        self.assertEqual(basket.total(), 0)
+        self.assertEqual(basket.savings(), 0)
 
     def test_copyBasket(self):
         """ Test that we can copy one basket to another. """
@@ -61,6 +62,36 @@ class TestSimpleBasket(_BaseTestCase):
         with self.assertRaises(KeyError):
             basket.addItem("ferrari")
 
+    def test_addItems(self):
+        """ Test that we can add several items at once, from names or counts. """
+        basket1 = self.createBasket()
+        unknownNames = basket1.addItems(["beans", "ferrari", "beans", "peas", "ferrari", "bike"])
+        self.assertEqual(unknownNames, ["ferrari", "bike"])
+        self.assertEqual(basket1.numItems(), 3)
+
+        basket2 = self.createBasket()
+        unknownNames = basket2.addItems({"beans": 2, "peas": 1})
+        self.assertEqual(unknownNames, [])
+
+        self.assertEqual(basket1.total(), 2 * beans.price() + peas.price())
+        self.assertEqual(basket1.total(), basket2.total())
+
+    def test_addItemsBadCount(self):
+        """ Test that a bad count leaves the basket as it was. """
+        basket = self.createBasket()
+        basket.addItem("beans", 2)
+        self.assertEqual(basket.total(), 2 * beans.price())
+
+        with self.assertRaises(ValueError):
+            basket.addItems(OrderedDict([("beans", 1), ("ice cream", 1), ("peas", -1)]))
+
+        with self.assertRaises(ValueError):
+            basket.addItem("peas", -1)
+
+        self.assertEqual(basket.total(), 2 * beans.price())
+        self.assertEqual([(entry.item(), entry.count()) for entry in basket.entries()],
+                         [(beans, 2)])
+
     def test_singleItem(self):
         """ Test that adding a single item produces the expected total. """
         basket = self.createBasket()
@@ -103,7 +134,7 @@ class TestThreeForTwoBasket(_BaseTestCase):
         self.assertEqual(basket1.total(), 2 * beans.price())
         self.assertEqual(basket1.total(), basket2.total())
         self.assertEqual(basket1.savings(), beans.price())
-        self.assertEqual(basket2.savings(), 0.0)
+        self.assertEqual(basket2.savings(), 0)
 
     def test_fourItems(self):
         """ Test that four of the same item costs the same as three. """
@@ -134,6 +165,20 @@ class TestThreeForTwoBasket(_BaseTestCase):
         self.assertEqual(basket.savings(), expectedSavings * beans.price())
         self.assertEqual(basket.numItems(), numBeans)
 
+    def test_aggregatedPromos(self):
+        """ Test that repeated three-for-twos are listed as a single promo unless expanded. """
+        basket = self.createBasket()
+        basket.addItem("beans", 7)
+
+        promos = basket.promos()
+        self.assertEqual(len(promos), 1)
+        self.assertEqual(promos[0].numPromos(), 2)
+        self.assertEqual(promos[0].savings(), 2 * beans.price())
+
+        expandedPromos = basket.promos(expand=True)
+        self.assertEqual(len(expandedPromos), 2)
+        self.assertEqual(sum(promo.savings() for promo in expandedPromos), basket.savings())
+
 
 class TestCheapestFreeBasket(_BaseTestCase):
 
@@ -178,6 +223,23 @@ class TestCheapestFreeBasket(_BaseTestCase):
         self.assertEqual(basket.total(), 2 * iceCream.price() + potatoWaffles.price() + peas.price())
         self.assertEqual(basket.savings(), potatoWaffles.price() + peas.price())
 
+    def test_bulkDeals(self):
+        """ Test that "cheapest free" promos are applied to what's left after three-for-twos. """
+        basket = self.createBasket()
+
+        # Five of each frozen item leaves two of each after the three-for-twos,
+        # which should be bundled from the most expensive downwards
+        basket.addItem("peas", 5)
+        basket.addItem("potato waffles", 5)
+        basket.addItem("ice cream", 5)
+
+        threeForTwoSavings = peas.price() + potatoWaffles.price() + iceCream.price()
+        cheapestFreeSavings = potatoWaffles.price() + peas.price()
+
+        self.assertEqual(basket.savings(), threeForTwoSavings + cheapestFreeSavings)
+        self.assertEqual(basket.total(), 5 * threeForTwoSavings - basket.savings())
+        self.assertEqual(len(basket.promos()), 5)
+
 
 class TestComboBasket(_BaseTestCase):
 
@@ -223,5 +285,37 @@ class TestComboBasket(_BaseTestCase):
         self.assertEqual(basket.savings(), beans.price())
 
 
+class TestIncrementalBasket(_BaseTestCase):
+
+    def test_totalAfterEachItem(self):
+        """ Test that the total is correct when computed after every item is added. """
+        itemNames = ["beans", "peas", "beans", "chickpeas", "ice cream", "beans",
+                     "spaghetti hoops", "potato waffles", "peas", "beans"]
+
+        basket = self.createBasket()
+        for ix, itemName in enumerate(itemNames):
+            basket.addItem(itemName)
+
+            # Compare against a basket built from scratch
+            freshBasket = self.createBasket()
+            for otherName in itemNames[:ix + 1]:
+                freshBasket.addItem(otherName)
+
+            self.assertEqual(basket.total(), freshBasket.total())
+            self.assertEqual(basket.savings(), freshBasket.savings())
+            self.assertEqual(len(basket.promos()), len(freshBasket.promos()))
+
+    def test_clearBasket(self):
+        """ Test that clearing a priced basket resets the total. """
+        basket = self.createBasket()
+        basket.addItem("beans", 3)
+        self.assertEqual(basket.total(), 2 * beans.price())
+
+        basket.clear()
+        self.assertEqual(basket.total(), 0)
+        self.assertEqual(basket.savings(), 0)
+        self.assertEqual(basket.promos(), [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+import gc
+import unittest
+
+from python.Basket import Basket
+from python.BasketIndex import BasketIndex
+from python.Inventory import (
+    Inventory,
+    InventoryChanges
+)
+from python.Item import Item
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+spaghettiHoops = Item("spaghetti hoops", 150, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+
+peas = Item("peas", 150, "frozen")
+iceCream = Item("ice cream", 400, "frozen")
+
+bread = Item("bread", 120)
+
+items = (beans, spaghettiHoops, chickpeas, peas, iceCream, bread)
+
+
+class TestBasketIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory()
+        self.inventory.addItems(items)
+        self.index = BasketIndex()
+
+    def createBasket(self, *itemNames):
+        basket = Basket(self.inventory, self.index)
+        basket.addItems(itemNames)
+        return basket
+
+    def assertPricedLike(self, basket, *itemNames):
+        """ Asserts that a basket is priced like a new basket of the given items. """
+        newBasket = Basket(self.inventory)
+        newBasket.addItems(itemNames)
+        self.assertEqual(basket.total(), newBasket.total())
+        self.assertEqual(basket.savings(), newBasket.savings())
+        self.assertEqual(sorted((promo.name(), promo.numPromos()) for promo in basket.promos()),
+                         sorted((promo.name(), promo.numPromos()) for promo in newBasket.promos()))
+
+    def test_index(self):
+        """ Test finding the baskets holding an item or promo group. """
+        basket1 = self.createBasket("beans", "peas")
+        basket2 = self.createBasket("beans", "chickpeas")
+        basket3 = Basket(self.inventory, self.index)
+        basket3.addItem("bread", 2)
+
+        self.assertItemsEqual(self.index.basketsWithItem("beans"), [basket1, basket2])
+        self.assertEqual(self.index.basketsWithItem("bread"), [basket3])
+        self.assertEqual(self.index.basketsWithItem("ice cream"), [])
+        self.assertItemsEqual(self.index.basketsInPromoGroup("canned"), [basket1, basket2])
+        self.assertEqual(self.index.basketsInPromoGroup("frozen"), [basket1])
+
+        basket2.clear()
+        self.assertEqual(self.index.basketsWithItem("beans"), [basket1])
+        self.assertEqual(self.index.basketsInPromoGroup("canned"), [basket1])
+
+    def test_discardedBaskets(self):
+        """ Test that baskets which are no longer used drop out of the index. """
+        basket = self.createBasket("beans")
+        self.createBasket("beans", "peas")
+        gc.collect()
+
+        self.assertEqual(self.index.basketsWithItem("beans"), [basket])
+        self.assertEqual(self.index.basketsWithItem("peas"), [])
+        self.assertEqual(self.index.basketsInPromoGroup("frozen"), [])
+
+    def test_priceChange(self):
+        """ Test that a price change reprices only the baskets holding the item. """
+        basket1 = self.createBasket("beans", "beans", "spaghetti hoops", "chickpeas", "bread")
+        basket2 = self.createBasket("peas", "bread")
+        basket1.total()
+        basket2.total()
+
+        affected = self.index.applyChanges(self.inventory, InventoryChanges(
+            changedItems=[Item("beans", 200, "canned"), Item("bread", 50)]))
+        self.assertItemsEqual(affected, [basket1, basket2])
+        self.assertPricedLike(basket1, "beans", "beans", "spaghetti hoops", "chickpeas", "bread")
+        self.assertPricedLike(basket2, "peas", "bread")
+
+        affected = self.index.applyChanges(self.inventory, InventoryChanges(
+            changedItems=[Item("ice cream", 500, "frozen")]))
+        self.assertEqual(affected, [])
+
+    def test_promoGroupChange(self):
+        """ Test moving an item into + out of a promo group. """
+        basket = self.createBasket("beans", "beans", "peas", "bread", "bread")
+        basket.total()
+
+        self.index.applyChanges(self.inventory, InventoryChanges(
+            changedItems=[Item("beans", 100, "frozen"), Item("bread", 120, "frozen")]))
+        self.assertPricedLike(basket, "beans", "beans", "peas", "bread", "bread")
+        self.assertEqual(self.index.basketsInPromoGroup("canned"), [])
+        self.assertEqual(self.index.basketsInPromoGroup("frozen"), [basket])
+
+        self.index.applyChanges(self.inventory, InventoryChanges(
+            changedItems=[Item("peas", 150)]))
+        self.assertPricedLike(basket, "beans", "beans", "peas", "bread", "bread")
+
+    def test_removedItems(self):
+        """ Test that items removed from the inventory are removed from baskets. """
+        basket = self.createBasket("beans", "chickpeas", "spaghetti hoops", "bread")
+        basket.total()
+
+        self.index.applyChanges(self.inventory, InventoryChanges(
+            removedNames=["beans", "bread"]))
+        self.assertPricedLike(basket, "chickpeas", "spaghetti hoops")
+        self.assertEqual(basket.numItems(), 2)
+        self.assertEqual(self.index.basketsWithItem("beans"), [])
+
+    def test_updateItems(self):
+        """ Test updating a basket directly, without an index. """
+        basket = Basket(self.inventory)
+        basket.addItems(["beans"] * 3 + ["bread"] * 4)
+        self.assertEqual(basket.total(), 200 + 360)
+
+        self.inventory.applyChanges(InventoryChanges(
+            changedItems=[Item("bread", 100)], removedNames=["beans"]))
+        self.assertEqual(basket.updateItems(["beans", "bread", "peas"]), ["beans"])
+        self.assertEqual(basket.total(), 300)
+        self.assertEqual(basket.savings(), 100)
+        self.assertEqual([promo.name() for promo in basket.promos()], ["bread - 3 for 2"])
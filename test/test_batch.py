@@ -0,0 +1,218 @@
+import json
+import unittest
+from StringIO import StringIO
+
+from python.Batch import (
+    _chunkResults,
+    _encodeResult,
+    priceBatch,
+    readBaskets,
+    writeBatch
+)
+from python.Inventory import Inventory
+from python.Item import Item
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "")
+
+items = (beans, chickpeas, peas)
+
+
+class _BrokenInventory(Inventory):
+    """ An inventory which fails to look up one of its items. """
+
+    def getItem(self, itemName):
+        if itemName == "peas":
+            raise RuntimeError("broken")
+
+        return Inventory.getItem(self, itemName)
+
+
+class TestBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._inventory = Inventory()
+        cls._inventory.addItems(items)
+
+    def priceBatch(self, text, batchFormat):
+        outputFile = StringIO()
+        counts = writeBatch(self._inventory, StringIO(text), outputFile, batchFormat)
+
+        results = [json.loads(line) for line in outputFile.getvalue().splitlines()]
+        return results, counts
+
+    def test_jsonBaskets(self):
+        """ Test that we can price baskets given as JSON lines. """
+        text = "\n".join([
+            '{"id": "first", "items": ["beans", "beans", "chickpeas"]}',
+            '',
+            '{"items": {"peas": 2, "unknown": 1}}',
+            '["beans"]',
+        ])
+        results, counts = self.priceBatch(text, "jsonl")
+        self.assertEqual(counts, (3, 0))
+
+        self.assertEqual([result["id"] for result in results], ["first", "3", "4"])
+
+        self.assertEqual(results[0]["total"], "2.00")
+        self.assertEqual(results[0]["savings"], "0.75")
+        self.assertEqual(results[0]["promos"], [
+            {"name": "canned - buy 3 get cheapest free", "count": 1, "savings": "0.75"}])
+
+        self.assertEqual(results[1]["total"], "3.00")
+        self.assertEqual(results[1]["unknownItems"], ["unknown"])
+
+        self.assertEqual(results[2]["total"], "1.00")
+
+    def test_csvBaskets(self):
+        """ Test that consecutive CSV rows with the same id are one basket. """
+        text = "\n".join([
+            "basketId,item,count",
+            "a,beans,2",
+            "a,chickpeas,",
+            "b,peas,1",
+            "a,peas",
+        ])
+        results, counts = self.priceBatch(text, "csv")
+        self.assertEqual(counts, (3, 0))
+
+        self.assertEqual([result["id"] for result in results], ["a", "b", "a"])
+        self.assertEqual([result["total"] for result in results], ["2.00", "1.50", "1.50"])
+
+    def test_badBaskets(self):
+        """ Test that baskets which can't be read are reported, not skipped. """
+        text = "\n".join([
+            '{"id": "a", "items": ["beans"]}',
+            '{"id": "b", "items": ',
+            '{"id": "c", "items": {"beans": 0}}',
+            '{"id": "d", "items": "beans"}',
+            '{"id": "e", "items": ["peas"]}',
+            '{"id": "f", "items": {"beans": null}}',
+            '{"id": "g", "items": {"beans": [2]}}',
+            '{"id": "h", "items": {"beans": "2"}}',
+        ])
+        results, counts = self.priceBatch(text, "jsonl")
+        self.assertEqual(counts, (8, 5))
+
+        self.assertEqual([result["id"] for result in results],
+                         ["a", "2", "c", "d", "e", "f", "g", "h"])
+        self.assertEqual(["error" in result for result in results],
+                         [False, True, True, True, False, True, True, False])
+        self.assertIn("line 2", results[1]["error"])
+
+        text = "basketId,item,count\na,beans,x\na,peas,1\nb,peas,1\n"
+        results, counts = self.priceBatch(text, "csv")
+        self.assertEqual(counts, (2, 1))
+        self.assertIn("line 2", results[0]["error"])
+        self.assertEqual(results[1]["total"], "1.50")
+
+    def test_parallel(self):
+        """ Test that pricing in parallel gives the same results, in order. """
+        lines = []
+        for ix in xrange(500):
+            if ix % 37 == 0:
+                lines.append('{"id": "%d", "items": ' % ix)
+            else:
+                names = [item.name() for item in items[:ix % 3 + 1]] * (ix % 5)
+                lines.append(json.dumps({"id": str(ix), "items": names + ["unknown"]}))
+
+        text = "\n".join(lines)
+
+        sequentialResults = list(priceBatch(self._inventory, StringIO(text)))
+        parallelResults = list(priceBatch(self._inventory, StringIO(text),
+                                          numWorkers=3, chunkSize=7))
+        self.assertEqual(len(sequentialResults), 500)
+        self.assertEqual(parallelResults, sequentialResults)
+
+        sequentialFile = StringIO()
+        parallelFile = StringIO()
+        sequentialCounts = writeBatch(self._inventory, StringIO(text), sequentialFile)
+        parallelCounts = writeBatch(self._inventory, StringIO(text), parallelFile,
+                                    numWorkers=3, chunkSize=7)
+        self.assertEqual(parallelCounts, sequentialCounts)
+        self.assertEqual(parallelFile.getvalue(), sequentialFile.getvalue())
+
+    def test_parallelFailures(self):
+        """ Test that baskets a worker fails to price get an error result. """
+        inventory = _BrokenInventory()
+        inventory.addItems(items)
+
+        text = "basketId,item\na,beans\nb,peas\nc,chickpeas\n"
+        results = list(priceBatch(inventory, StringIO(text), "csv", numWorkers=2,
+                                  chunkSize=1))
+
+        self.assertEqual([result["id"] for result in results], ["a", "b", "c"])
+        self.assertEqual(results[0]["total"], "1.00")
+        self.assertEqual(results[1]["error"], "couldn't price basket - broken")
+        self.assertEqual(results[2]["total"], "0.75")
+
+        # Malformed baskets are reported by the workers, not the parent
+        text = '{"id": "a", "items": {"beans": null}}\n{"id": "b", "items": ["beans"]}\n'
+        results = list(priceBatch(self._inventory, StringIO(text), numWorkers=2,
+                                  chunkSize=1))
+        self.assertEqual([result["id"] for result in results], ["a", "b"])
+        self.assertIn("count must be a positive integer", results[0]["error"])
+        self.assertEqual(results[1]["total"], "1.00")
+
+    def test_workerFailure(self):
+        """ Test that a chunk a worker fails on gets an error for each basket. """
+        class FailedResult(object):
+            def get(self):
+                raise RuntimeError("worker died")
+
+        records = [(1, '{"id": "a", "items": {"beans": null}}'), (2, "not json")]
+        results = _chunkResults(_encodeResult, records, FailedResult())
+
+        self.assertEqual([json.loads(line) for line, isError in results],
+                         [{"id": "1", "error": "worker failed - worker died"},
+                          {"id": "2", "error": "worker failed - worker died"}])
+
+    def test_receipts(self):
+        """ Test writing the full receipt for each basket. """
+        text = '{"id": "a", "items": ["beans", "beans", "beans", "peas"]}\nbad\n["x"]\n'
+
+        outputFile = StringIO()
+        counts = writeBatch(self._inventory, StringIO(text), outputFile,
+                            receiptFormat="jsonl")
+        self.assertEqual(counts, (3, 1))
+
+        results = [json.loads(line) for line in outputFile.getvalue().splitlines()]
+        self.assertEqual(results[0]["entries"][0],
+                         {"name": "beans", "count": 3, "price": "1.00", "total": "3.00"})
+        self.assertEqual(results[0]["subtotal"], "4.50")
+        self.assertEqual(results[0]["total"], "3.50")
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2]["entries"], [])
+        self.assertEqual(results[2]["unknownItems"], ["x"])
+
+        # The JSON array has the same receipts
+        outputFile = StringIO()
+        writeBatch(self._inventory, StringIO(text), outputFile, receiptFormat="json")
+        self.assertEqual(json.loads(outputFile.getvalue()), results)
+
+        outputFile = StringIO()
+        writeBatch(self._inventory, StringIO(text), outputFile, receiptFormat="csv",
+                   numWorkers=2, chunkSize=1)
+        rows = outputFile.getvalue().splitlines()
+        self.assertEqual(rows[0], "basketId,type,name,count,price,amount")
+        self.assertEqual(rows[1], "a,entry,beans,3,1.00,3.00")
+        self.assertEqual(rows[-1], "3,unknown,x,,,")
+
+        receipts = list(priceBatch(self._inventory, StringIO(text), numWorkers=2,
+                                   chunkSize=1, receipts=True))
+        self.assertEqual(receipts, results)
+
+    def test_badFormat(self):
+        """ Test that an unknown format raises an exception. """
+        self.assertRaises(ValueError, readBaskets, StringIO(""), "xml")
+        self.assertRaises(ValueError, priceBatch, self._inventory, StringIO(""), "xml")
+        self.assertRaises(ValueError, writeBatch, self._inventory, StringIO(""), StringIO(),
+                          receiptFormat="xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,18 @@
 import unittest
 import os
+import shutil
+import tempfile
 
 from utils import captureOutput
 
+from python import Inventory as InventoryModule
 from python.Inventory import Inventory
 from python.Item import Item
 
 # Define some test items
-beans = Item("beans", 1.0, "canned")
-beans2 = Item("beans", 2.0, "frozen")
-chickpeas = Item("chickpeas", 0.75, "canned")
+beans = Item("beans", 100, "canned")
+beans2 = Item("beans", 200, "frozen")
+chickpeas = Item("chickpeas", 75, "canned")
 
 items = (beans, beans2, chickpeas)
 
@@ -37,6 +40,20 @@ class TestInventory(unittest.TestCase):
         self.assertEqual(item, beans2)
         self.assertNotEqual(item, beans)
 
+    def test_getItems(self):
+        """ Test that overwritten items are only listed once, with their new values. """
+        inventory = Inventory()
+        inventory.addItems((beans, chickpeas, beans2))
+
+        items = inventory.getItems()
+        self.assertEqual(len(items), 2)
+        self.assertIn(beans2, items)
+        self.assertIn(chickpeas, items)
+
+        prettyItems = inventory.getItemsPretty()
+        self.assertIn("beans     @ 2.00 - frozen", prettyItems)
+        self.assertIn("chickpeas @ 0.75 - canned", prettyItems)
+
     def test_readFromDisk(self):
         """ Test that we can read an inventory file from disk. """
         inventory = Inventory()
@@ -44,7 +61,7 @@ class TestInventory(unittest.TestCase):
 
         # Test a known item from the inventory on disk
         item = inventory.getItem("lettuce")
-        testItem = Item("lettuce", 0.5, "vegetables")
+        testItem = Item("lettuce", 50, "vegetables")
 
         self.assertEqual(item, testItem)
 
@@ -73,6 +90,148 @@ class TestInventory(unittest.TestCase):
         self.assertIn('bad inventory entry', output)
         self.assertIn('bad price for inventory entry', output)
 
+    def test_reloadFromDisk(self):
+        """ Test that reloading an inventory file only applies what's changed. """
+        tempDirectory = tempfile.mkdtemp()
+        try:
+            filePath = os.path.join(tempDirectory, "inventory.csv")
+            with open(filePath, "w") as csvFile:
+                csvFile.write("name,price,promoGroup\nbeans,1.00,canned\n"
+                              "chickpeas,0.75,canned\npeas,1.50,frozen\n")
+
+            inventory = Inventory()
+            inventory.readFromDisk(filePath)
+
+            # Nothing should change if the file hasn't changed
+            self.assertTrue(inventory.reloadFromDisk(filePath).isEmpty())
+
+            with open(filePath, "w") as csvFile:
+                csvFile.write("name,price,promoGroup\nbeans,2.00,frozen\n"
+                              "peas,1.50,frozen\nlettuce,0.50,vegetables\n")
+
+            # Make sure the file looks modified, however quickly we wrote it
+            os.utime(filePath, (0, 0))
+
+            changes = inventory.reloadFromDisk(filePath)
+            self.assertEqual(changes.added(), [Item("lettuce", 50, "vegetables")])
+            self.assertEqual(changes.changed(), [beans2])
+            self.assertEqual(changes.removed(), ["chickpeas"])
+
+            self.assertEqual(inventory.getItem("beans"), beans2)
+            self.assertIsNone(inventory.getItem("chickpeas"))
+            self.assertEqual(len(inventory.getItems()), 3)
+
+        finally:
+            shutil.rmtree(tempDirectory)
+
+    def test_applyDeltaFromDisk(self):
+        """ Test that we can apply a delta file to an inventory. """
+        tempDirectory = tempfile.mkdtemp()
+        try:
+            filePath = os.path.join(tempDirectory, "delta.csv")
+            with open(filePath, "w") as csvFile:
+                csvFile.write("op,name,price,promoGroup\n"
+                              "set,beans,2.00,frozen\n"
+                              "set,chickpeas,0.75,canned\n"
+                              "delete,peas\n"
+                              "set,lettuce,0.50,vegetables\n"
+                              "delete,lettuce\n"
+                              "explode,beans\n")
+
+            inventory = Inventory()
+            inventory.addItems((beans, chickpeas, Item("peas", 150, "frozen")))
+
+            with captureOutput() as (out, err):
+                changes = inventory.applyDeltaFromDisk(filePath)
+
+            self.assertIn("bad delta entry on line 7", out.getvalue())
+
+            self.assertEqual(changes.added(), [])
+            self.assertEqual(changes.changed(), [beans2])
+            self.assertEqual(changes.removed(), ["peas"])
+
+            self.assertEqual(inventory.getItem("beans"), beans2)
+            self.assertEqual(inventory.getItem("chickpeas"), chickpeas)
+            self.assertIsNone(inventory.getItem("peas"))
+            self.assertIsNone(inventory.getItem("lettuce"))
+
+        finally:
+            shutil.rmtree(tempDirectory)
+
+    def test_readFromDiskParallel(self):
+        """ Test that reading an inventory file in parallel gives the same results as reading it in one process. """
+        tempDirectory = tempfile.mkdtemp()
+        try:
+            # Write an inventory with quoted line breaks + commas, bad
+            # entries and duplicate names spread throughout
+            filePath = os.path.join(tempDirectory, "inventory.csv")
+            with open(filePath, "w") as csvFile:
+                csvFile.write("name,price,promoGroup\n")
+                for ix in xrange(2000):
+                    if ix % 97 == 0:
+                        csvFile.write('"item %d with a\nline break, and ""quotes""",%d.25,"group%d"\n'
+                                      % (ix, ix, ix % 7))
+                    elif ix % 101 == 0:
+                        csvFile.write("item%d with a bad price,bob,group\n" % ix)
+                    else:
+                        csvFile.write("item%d,%d.50,group%d\n" % (ix % 1500, ix, ix % 7))
+
+            with captureOutput() as (out, err):
+                sequentialInventory = Inventory()
+                sequentialInventory.readFromDisk(filePath)
+
+            sequentialOutput = out.getvalue()
+
+            # Make sure even a small file gets split up
+            minParallelFileSize = InventoryModule.MinParallelFileSize
+            InventoryModule.MinParallelFileSize = 0
+            try:
+                with captureOutput() as (out, err):
+                    parallelInventory = Inventory()
+                    parallelInventory.readFromDisk(filePath, numProcesses=3)
+            finally:
+                InventoryModule.MinParallelFileSize = minParallelFileSize
+
+            self.assertEqual(parallelInventory.getItemsPretty(),
+                             sequentialInventory.getItemsPretty())
+            self.assertEqual(out.getvalue(), sequentialOutput)
+            self.assertIn("on line 105:", sequentialOutput)
+
+        finally:
+            shutil.rmtree(tempDirectory)
+
+    def test_readFromDiskParallelStrayQuote(self):
+        """ Test that a stray quote which stops the file being split up is warned about. """
+        tempDirectory = tempfile.mkdtemp()
+        try:
+            # The csv module reads a quote in the middle of a field as is, but
+            # it makes the rest of the file look quoted when splitting it
+            filePath = os.path.join(tempDirectory, "inventory.csv")
+            with open(filePath, "w") as csvFile:
+                csvFile.write('name,price,promoGroup\nitem"0,1.00,group\n')
+                for ix in xrange(1, 2000):
+                    csvFile.write("item%d,%d.50,group%d\n" % (ix, ix, ix % 7))
+
+            sequentialInventory = Inventory()
+            sequentialInventory.readFromDisk(filePath)
+
+            minParallelFileSize = InventoryModule.MinParallelFileSize
+            InventoryModule.MinParallelFileSize = 0
+            try:
+                warnings = []
+                parallelInventory = Inventory()
+                parallelInventory.readFromDisk(filePath, numProcesses=3, warn=warnings.append)
+            finally:
+                InventoryModule.MinParallelFileSize = minParallelFileSize
+
+            self.assertEqual(parallelInventory.getItemsPretty(),
+                             sequentialInventory.getItemsPretty())
+            self.assertEqual(warnings, ["unbalanced quotes after line 1 - split the file into "
+                                        "1 chunk(s) rather than 12"])
+
+        finally:
+            shutil.rmtree(tempDirectory)
+
 
 if __name__ == '__main__':
     unittest.main()
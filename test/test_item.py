@@ -1,15 +1,18 @@
 import unittest
 
 from utils import captureOutput
-from python.Item import Item
+from python.Item import (
+    Item,
+    parsePrice
+)
 
 # Define some test items
-beans = Item("beans", 1.0, "canned")
-beans_same = Item("beans", 1.0, "canned")
+beans = Item("beans", 100, "canned")
+beans_same = Item("beans", 100, "canned")
 
-beans_frozen = Item("beans", 1.0, "frozen")
-beans_expensive = Item("beans", 10.0, "canned")
-not_beans = Item("chickpeas", 1.0, "canned")
+beans_frozen = Item("beans", 100, "frozen")
+beans_expensive = Item("beans", 1000, "canned")
+not_beans = Item("chickpeas", 100, "canned")
 
 
 class TestItem(unittest.TestCase):
@@ -26,8 +29,29 @@ class TestItem(unittest.TestCase):
         beans_repr = repr(beans)
 
         self.assertIn("beans", beans_repr)
-        self.assertIn("1.0", beans_repr)
+        self.assertIn("100", beans_repr)
         self.assertIn("canned", beans_repr)
 
+    def test_slots(self):
+        """ Test that items don't carry a per-instance dictionary. """
+        self.assertFalse(hasattr(beans, "__dict__"))
+        self.assertEqual(beans.name(), "beans")
+        self.assertEqual(beans.price(), 100)
+        self.assertEqual(beans.promoGroup(), "canned")
+
+    def test_parsePrice(self):
+        """ Test that prices are parsed into exact numbers of pence. """
+        self.assertEqual(parsePrice("1.0"), 100)
+        self.assertEqual(parsePrice("0.5"), 50)
+        self.assertEqual(parsePrice(" 2 "), 200)
+        self.assertEqual(parsePrice("0.125"), 13)
+        self.assertEqual(parsePrice("-0.05"), -5)
+        self.assertEqual(parsePrice("1e2"), 10000)
+        self.assertEqual(parsePrice("1234567890.12"), 123456789012)
+
+        for badPrice in ("beans", "", "nan", "inf"):
+            with self.assertRaises(ValueError):
+                parsePrice(badPrice)
+
 if __name__ == '__main__':
     unittest.main()
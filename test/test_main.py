@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from StringIO import StringIO
+
+from python.main import (
+    countItems,
+    main,
+    printShoppingBasket,
+    readItems
+)
+from utils import captureOutput
+
+
+# The inventory file to test the command line with
+inventoryFile = os.path.join(os.path.dirname(__file__), "resources", "testInventory.csv")
+
+
+class TestReadItems(unittest.TestCase):
+
+    def setUp(self):
+        self._tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tempDir)
+
+    def writeItems(self, contents):
+        itemsFile = os.path.join(self._tempDir, "items.txt")
+        with open(itemsFile, "w") as itemsStream:
+            itemsStream.write(contents)
+
+        return itemsFile
+
+    def test_readItems(self):
+        itemsFile = self.writeItems("beans\n  peas \n\nbeans\n")
+
+        items = readItems(itemsFile)
+        self.assertIsInstance(items, types.GeneratorType)
+        self.assertEqual(list(items), ["beans", "peas", "beans"])
+
+    def test_stdin(self):
+        stdin = sys.stdin
+        sys.stdin = StringIO("beans\npeas\n")
+        try:
+            self.assertEqual(list(readItems("-")), ["beans", "peas"])
+
+        finally:
+            sys.stdin = stdin
+
+    def test_missingFile(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            items = list(readItems(os.path.join(self._tempDir, "missing.txt")))
+
+        finally:
+            sys.stdout = stdout
+
+        self.assertEqual(items, [])
+
+
+class TestCountItems(unittest.TestCase):
+
+    def test_countItems(self):
+        counts = countItems(iter(["peas", "beans", "peas", "carrots", "peas"]))
+        self.assertEqual(counts.items(), [("peas", 3), ("beans", 1), ("carrots", 1)])
+
+    def test_noItems(self):
+        self.assertEqual(countItems([]), {})
+
+
+class TestPrintShoppingBasket(unittest.TestCase):
+
+    def test_noItems(self):
+        with captureOutput() as (out, err):
+            printShoppingBasket(inventoryFile, None, useSnapshot=False)
+
+        self.assertEqual(out.getvalue().strip(), "[WARNING] : no items found.")
+
+    def test_structuredWarnings(self):
+        badInventoryFile = os.path.join(os.path.dirname(__file__), "resources",
+                                        "badInventory2.csv")
+        with captureOutput() as (out, err):
+            printShoppingBasket(badInventoryFile, ["beans", "nothing"], useSnapshot=False,
+                                receiptFormat="json")
+
+        # The warnings mustn't get mixed up with the JSON
+        self.assertEqual(json.loads(out.getvalue())["total"], "1.00")
+        self.assertIn("bad inventory entry on line 3", err.getvalue())
+        self.assertIn("couldn't find item 'nothing'", err.getvalue())
+
+    def test_commandLineWithoutItems(self):
+        argv = sys.argv
+        sys.argv = ["checkout", inventoryFile, "--noSnapshot"]
+        try:
+            with captureOutput() as (out, err):
+                main()
+
+        finally:
+            sys.argv = argv
+
+        self.assertEqual(out.getvalue().strip(), "[WARNING] : no items found.")
+        self.assertEqual(err.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
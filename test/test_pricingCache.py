@@ -0,0 +1,99 @@
+import unittest
+
+from python.Basket import Basket
+from python.Inventory import (
+    Inventory,
+    InventoryChanges
+)
+from python.Item import Item
+from python.PricingCache import PricingCache
+from python.VersionedInventory import VersionedInventory
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+beans2 = Item("beans", 200, "canned")
+spaghettiHoops = Item("spaghetti hoops", 150, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "")
+
+items = (beans, spaghettiHoops, chickpeas, peas)
+
+
+class TestPricingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory()
+        self.inventory.addItems(items)
+
+    def assertMatchesBasket(self, pricedBasket, inventory, items):
+        basket = Basket(inventory)
+        unknownNames = basket.addItems(items)
+
+        self.assertEqual(pricedBasket.total(), basket.total())
+        self.assertEqual(pricedBasket.savings(), basket.savings())
+        self.assertEqual(sorted(promo.name() for promo in pricedBasket.promos()),
+                         sorted(promo.name() for promo in basket.promos()))
+        self.assertEqual(list(pricedBasket.unknownNames()), unknownNames)
+
+    def test_cache(self):
+        """ Test that identical baskets are only priced once, whatever their order. """
+        cache = PricingCache(self.inventory)
+        baskets = [
+            ["beans", "peas", "beans", "beans", "chickpeas", "spaghetti hoops"],
+            ["peas", "chickpeas", "beans", "spaghetti hoops", "beans", "beans"],
+            {"beans": 3, "peas": 1, "chickpeas": 1, "spaghetti hoops": 1},
+            ["beans", "unknown", "other"],
+            ["other", "beans", "unknown"],
+        ]
+        for items in baskets:
+            self.assertMatchesBasket(cache.price(items), self.inventory, items)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (3, 2, 2))
+
+    def test_eviction(self):
+        """ Test that the least recently used baskets are discarded. """
+        cache = PricingCache(self.inventory, maxSize=2)
+        for items in (["beans"], ["peas"], ["beans"], ["chickpeas"], ["peas"]):
+            cache.price(items)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 4, 2))
+        self.assertEqual(len(cache), 2)
+
+    def test_disabled(self):
+        """ Test that a cache with no size prices every basket. """
+        cache = PricingCache(self.inventory, maxSize=0)
+        for count in xrange(3):
+            self.assertMatchesBasket(cache.price(["beans"] * 4), self.inventory, ["beans"] * 4)
+
+        self.assertEqual(cache.stats()["misses"], 3)
+        self.assertEqual(len(cache), 0)
+        self.assertRaises(ValueError, PricingCache, self.inventory, -1)
+
+    def test_invalidation(self):
+        """ Test that cached prices are discarded when the inventory changes. """
+        cache = PricingCache(self.inventory)
+        self.assertEqual(cache.price(["beans"]).total(), 100)
+
+        self.inventory.addItem(beans2)
+        self.assertEqual(cache.price(["beans"]).total(), 200)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["invalidations"], stats["size"]), (0, 1, 1))
+
+    def test_versionedInventory(self):
+        """ Test that cached prices follow the current version of an inventory. """
+        inventory = VersionedInventory(self.inventory)
+        cache = PricingCache(inventory)
+        self.assertEqual(cache.price(["beans", "beans"]).total(), 200)
+        self.assertEqual(cache.price(["beans", "beans"]).total(), 200)
+
+        inventory.applyChanges(InventoryChanges((), [beans2]))
+        self.assertEqual(cache.price(["beans", "beans"]).total(), 400)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
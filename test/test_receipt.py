@@ -0,0 +1,166 @@
+import unittest
+from cStringIO import StringIO
+
+from python.Basket import Basket
+from python.Inventory import (
+    Inventory,
+    InventoryChanges
+)
+from python.Item import Item
+from python.Receipt import (
+    Receipt,
+    ReceiptRenderer
+)
+
+
+class _WriteCounter(object):
+    """
+    File-like object recording the writes made to it.
+    """
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+class _WideReceipt(Receipt):
+    """
+    Receipt with a wider name column.
+    """
+    NameColumnWidth = 60
+    SeparatorWidth = NameColumnWidth + Receipt.PriceColumnWidth + 1
+
+
+class TestReceipt(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._inventory = Inventory()
+        cls._inventory.addItems(Item("item%d" % ix, 50 + ix, "group%d" % (ix % 3))
+                                for ix in xrange(1000))
+        cls._inventory.addItem(Item("beans", 100, "canned"))
+
+    def createBasket(self, items):
+        basket = Basket(self._inventory)
+        basket.addItems(items)
+        return basket
+
+    def test_receipt(self):
+        """ Test the layout of a small receipt. """
+        basket = self.createBasket({"beans": 3})
+        expected = "\n".join([
+            "   ========================================================                ",
+            "   beans                                                                  ",
+            "                 3 @ 1.00                              3.00",
+            "   --------------------------------------------------------                ",
+            "   SUB-TOTAL:                                          3.00",
+            "   --------------------------------------------------------                ",
+            "   OFFERS:                                                 ",
+            "     beans - 3 for 2                                  -1.00",
+            "   --------------------------------------------------------                ",
+            "   TOTAL SAVINGS:                                      1.00",
+            "   ========================================================                ",
+            "   TOTAL TO PAY:                                       2.00",
+            "   ========================================================                ",
+        ])
+        self.assertEqual(Receipt.GetReceipt(basket), expected)
+
+    def test_writeReceipt(self):
+        """ Test that writing a receipt matches GetReceipt, for all sizes. """
+        for numItems in (0, 1, 10, Receipt.WriteBatchSize, 1000):
+            basket = self.createBasket(["item%d" % (ix % 1000) for ix in xrange(numItems * 2)])
+            for expandPromos in (False, True):
+                receiptFile = StringIO()
+                Receipt.WriteReceipt(basket, receiptFile, expandPromos)
+                self.assertEqual(receiptFile.getvalue(),
+                                 Receipt.GetReceipt(basket, expandPromos))
+
+    def test_batchedWrites(self):
+        """ Test that long receipts are written a batch of lines at a time. """
+        basket = self.createBasket(["item%d" % ix for ix in xrange(1000)])
+        writeCounter = _WriteCounter()
+        Receipt.WriteReceipt(basket, writeCounter)
+
+        receiptLines = "".join(writeCounter.writes).split("\n")
+        self.assertTrue(len(writeCounter.writes) > 1)
+        self.assertEqual(len(writeCounter.writes),
+                         -(-len(receiptLines) // Receipt.WriteBatchSize))
+
+
+class TestReceiptRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory()
+        self.inventory.addItems(Item("item%d" % ix, 50 + ix, "group%d" % (ix % 3))
+                                for ix in xrange(100))
+        self.inventory.addItem(Item("a very long name for a tin of baked beans in tomato sauce",
+                                    100))
+
+    def createBasket(self, items):
+        basket = Basket(self.inventory)
+        basket.addItems(items)
+        return basket
+
+    def test_matchesReceipt(self):
+        """ Test that rendered receipts match Receipt.GetReceipt. """
+        renderer = ReceiptRenderer()
+        for numItems in (0, 1, 10, 300):
+            basket = self.createBasket(["item%d" % (ix % 20) for ix in xrange(numItems)])
+            basket.addItem("a very long name for a tin of baked beans in tomato sauce",
+                           numItems % 3 + 1)
+
+            for expandPromos in (False, True):
+                # Render each receipt twice, so the second uses the cache
+                for ix in xrange(2):
+                    self.assertEqual(renderer.getReceipt(basket, expandPromos),
+                                     Receipt.GetReceipt(basket, expandPromos))
+
+        stats = renderer.stats()
+        self.assertTrue(stats["hits"] > stats["misses"] > 0)
+
+        receiptFile = StringIO()
+        renderer.writeReceipt(basket, receiptFile)
+        self.assertEqual(receiptFile.getvalue(), Receipt.GetReceipt(basket))
+
+    def test_priceChange(self):
+        """ Test that changed prices aren't rendered with the old price. """
+        renderer = ReceiptRenderer()
+        basket = self.createBasket({"item1": 1, "item2": 2})
+        renderer.getReceipt(basket)
+
+        self.inventory.applyChanges(InventoryChanges(
+            changedItems=[Item("item1", 999, "group1"), Item("item2", 5, "group2")]))
+        basket.updateItems(["item1", "item2"])
+        receipt = renderer.getReceipt(basket)
+        self.assertEqual(receipt, Receipt.GetReceipt(basket))
+        self.assertIn("9.99", receipt)
+        self.assertIn("2 @ 0.05", receipt)
+
+    def test_layout(self):
+        """ Test rendering receipts with a different layout. """
+        basket = self.createBasket({"item1": 1, "item2": 2})
+        renderer = ReceiptRenderer(receiptClass=_WideReceipt)
+        self.assertEqual(renderer.getReceipt(basket), _WideReceipt.GetReceipt(basket))
+
+        # Changing the layout discards the formatted columns
+        _WideReceipt.NameColumnWidth = 30
+        try:
+            self.assertEqual(renderer.getReceipt(basket), _WideReceipt.GetReceipt(basket))
+        finally:
+            _WideReceipt.NameColumnWidth = 60
+
+        self.assertNotEqual(renderer.getReceipt(basket), Receipt.GetReceipt(basket))
+
+    def test_bounded(self):
+        """ Test that the number of items kept is bounded. """
+        renderer = ReceiptRenderer(10)
+        basket = self.createBasket(["item%d" % ix for ix in xrange(100)])
+        self.assertEqual(renderer.getReceipt(basket), Receipt.GetReceipt(basket))
+        self.assertTrue(len(renderer) <= 10)
+
+        renderer.clear()
+        self.assertEqual(len(renderer), 0)
+
+        self.assertRaises(ValueError, ReceiptRenderer, 1)
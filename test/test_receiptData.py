@@ -0,0 +1,105 @@
+import json
+import unittest
+from StringIO import StringIO
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.ReceiptData import (
+    ReceiptDataWriter,
+    receiptData,
+    writeReceiptData
+)
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "")
+
+items = (beans, chickpeas, peas)
+
+
+class TestReceiptData(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._inventory = Inventory()
+        cls._inventory.addItems(items)
+
+    def createBasket(self, items):
+        basket = Basket(self._inventory)
+        basket.addItems(items)
+        return basket
+
+    def test_receiptData(self):
+        """ Test the contents of a structured receipt. """
+        basket = self.createBasket({"beans": 6, "peas": 1})
+        data = receiptData(basket)
+
+        self.assertEqual(list(data), ["entries", "subtotal", "promos", "savings", "total"])
+        self.assertItemsEqual(data["entries"], [
+            {"name": "beans", "count": 6, "price": "1.00", "total": "6.00"},
+            {"name": "peas", "count": 1, "price": "1.50", "total": "1.50"},
+        ])
+        self.assertEqual(data["subtotal"], "7.50")
+        self.assertEqual(data["promos"],
+                         [{"name": "beans - 3 for 2", "count": 2, "savings": "2.00"}])
+        self.assertEqual(data["savings"], "2.00")
+        self.assertEqual(data["total"], "5.50")
+
+        expanded = receiptData(basket, expandPromos=True)
+        self.assertEqual(expanded["promos"],
+                         [{"name": "beans - 3 for 2", "count": 1, "savings": "1.00"}] * 2)
+
+    def test_json(self):
+        """ Test writing a receipt as JSON + JSON lines. """
+        data = receiptData(self.createBasket(["beans", "chickpeas"]))
+
+        outputFile = StringIO()
+        writeReceiptData(data, outputFile, "json")
+        self.assertEqual(json.loads(outputFile.getvalue()), data)
+
+        outputFile = StringIO()
+        writeReceiptData(data, outputFile, "jsonl")
+        lines = outputFile.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), data)
+
+    def test_csv(self):
+        """ Test writing a receipt as CSV rows. """
+        data = receiptData(self.createBasket({"beans": 3}))
+        data["unknownItems"] = ["caviar"]
+
+        outputFile = StringIO()
+        writeReceiptData(data, outputFile, "csv")
+        self.assertEqual(outputFile.getvalue().splitlines(), [
+            "basketId,type,name,count,price,amount",
+            ",entry,beans,3,1.00,3.00",
+            ",subtotal,,,,3.00",
+            ",promo,beans - 3 for 2,1,,-1.00",
+            ",savings,,,,1.00",
+            ",total,,,,2.00",
+            ",unknown,caviar,,,",
+        ])
+
+    def test_writer(self):
+        """ Test writing a stream of receipts. """
+        receipts = [receiptData(self.createBasket(["beans"] * count)) for count in xrange(3)]
+
+        outputFile = StringIO()
+        writer = ReceiptDataWriter(outputFile, "json")
+        for data in receipts:
+            writer.write(data)
+
+        writer.close()
+        self.assertEqual(writer.numReceipts(), 3)
+        self.assertEqual(json.loads(outputFile.getvalue()), receipts)
+
+        for receiptFormat, expected in (("json", "[]\n"), ("jsonl", ""),
+                                        ("csv", "basketId,type,name,count,price,amount\n")):
+            outputFile = StringIO()
+            ReceiptDataWriter(outputFile, receiptFormat).close()
+            self.assertEqual(outputFile.getvalue(), expected)
+
+        self.assertRaises(ValueError, ReceiptDataWriter, StringIO(), "xml")
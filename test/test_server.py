@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.Receipt import Receipt
+from python.Server import (
+    CheckoutServer,
+    CheckoutService,
+    parseAddress
+)
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "")
+
+items = (beans, chickpeas, peas)
+
+
+class TestCheckoutService(unittest.TestCase):
+
+    def setUp(self):
+        inventory = Inventory()
+        inventory.addItems(items)
+        self.service = CheckoutService(inventory)
+
+    def request(self, op, **kwargs):
+        kwargs["op"] = op
+        return json.loads(self.service.handleLine(json.dumps(kwargs)))
+
+    def test_basket(self):
+        """ Test opening, adding to, pricing + closing a basket. """
+        basketId = self.request("open")["basket"]
+        self.assertEqual(self.service.numBaskets(), 1)
+
+        response = self.request("add", basket=basketId, items=["beans", "unknown", "beans"])
+        self.assertEqual(response, {"ok": True, "unknownItems": ["unknown"]})
+        self.request("add", basket=basketId, items=["beans", "chickpeas"])
+
+        response = self.request("total", basket=basketId)
+        self.assertTrue(response["ok"])
+        self.assertEqual(response["total"], "2.75")
+        self.assertEqual(response["savings"], "1.00")
+        self.assertEqual(response["promos"], [
+            {"name": "beans - 3 for 2", "count": 1, "savings": "1.00"}])
+
+        # The receipt should be the same as the one for an equivalent basket
+        inventory = Inventory()
+        inventory.addItems(items)
+        basket = Basket(inventory)
+        basket.addItems(["beans", "unknown", "beans"])
+        basket.addItems(["beans", "chickpeas"])
+        response = self.request("receipt", basket=basketId)
+        self.assertEqual(response["receipt"], Receipt.GetReceipt(basket))
+
+        self.assertEqual(self.request("close", basket=basketId), {"ok": True})
+        self.assertEqual(self.service.numBaskets(), 0)
+        self.assertFalse(self.request("total", basket=basketId)["ok"])
+
+    def test_price(self):
+        """ Test pricing a one-off basket. """
+        response = self.request("price", items={"beans": 2, "chickpeas": 1, "peas": 1})
+        self.assertEqual(response["total"], "3.50")
+        self.assertEqual(response["savings"], "0.75")
+        self.assertEqual(response["unknownItems"], [])
+
+    def test_badRequests(self):
+        """ Test that bad requests get an error response. """
+        basketId = self.request("open")["basket"]
+        responses = [
+            json.loads(self.service.handleLine("not json")),
+            json.loads(self.service.handleLine("[1, 2]")),
+            self.request("fly"),
+            self.request("total", basket="nope"),
+            self.request("close", basket=["nope"]),
+            self.request("add", basket=basketId, items="beans"),
+            self.request("add", basket=basketId, items={"beans": -1}),
+            self.request("add", basket=basketId, items={"beans": 0}),
+            self.request("price", items={"beans": 0}),
+            self.request("price", items=[1]),
+        ]
+        for response in responses:
+            self.assertFalse(response["ok"])
+            self.assertIn("error", response)
+
+        # The basket should be unaffected
+        self.assertEqual(self.request("total", basket=basketId)["total"], "0.00")
+
+    def test_parseAddress(self):
+        """ Test parsing the address to listen on. """
+        self.assertEqual(parseAddress(":8000"), ("127.0.0.1", 8000))
+        self.assertEqual(parseAddress("0.0.0.0:8000"), ("0.0.0.0", 8000))
+        self.assertEqual(parseAddress("/tmp/checkout.sock"), "/tmp/checkout.sock")
+        self.assertRaises(ValueError, parseAddress, "host:port")
+        self.assertRaises(ValueError, parseAddress, "8000")
+
+
+class TestCheckoutServer(unittest.TestCase):
+
+    def setUp(self):
+        inventory = Inventory()
+        inventory.addItems(items)
+        self.service = CheckoutService(inventory)
+        self.tempDirectory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDirectory)
+
+    def runServer(self, address, family):
+        server = CheckoutServer(self.service, address)
+        thread = threading.Thread(target=server.serveForever)
+        thread.start()
+        try:
+            # Interleave requests on two connections
+            connections = []
+            for ix in xrange(2):
+                connection = socket.socket(family, socket.SOCK_STREAM)
+                connection.connect(server.address())
+                connections.append((connection, connection.makefile()))
+
+            def request(ix, text):
+                connection, connectionFile = connections[ix]
+                connection.sendall(text)
+                return json.loads(connectionFile.readline())
+
+            basketId = request(0, '{"op": "open"}\n')["basket"]
+            self.assertTrue(request(1, '{"op": "add", "basket": "%s", "items": ["beans"]}\n'
+                                    % basketId)["ok"])
+
+            # Requests split across packets + sent together should both work
+            connection, connectionFile = connections[0]
+            connection.sendall('{"op": "add", "basket": "%s", ' % basketId)
+            connection.sendall('"items": ["peas"]}\n\n{"op": "total", "basket": "%s"}\n'
+                               % basketId)
+            self.assertTrue(json.loads(connectionFile.readline())["ok"])
+            self.assertEqual(json.loads(connectionFile.readline())["total"], "2.50")
+
+            for connection, connectionFile in connections:
+                connection.close()
+
+        finally:
+            server.stop()
+            thread.join()
+
+    def test_tcp(self):
+        """ Test serving requests over TCP. """
+        self.runServer(("127.0.0.1", 0), socket.AF_INET)
+
+    def test_unixSocket(self):
+        """ Test serving requests over a Unix socket. """
+        socketPath = os.path.join(self.tempDirectory, "checkout.sock")
+        self.runServer(socketPath, socket.AF_UNIX)
+
+        # A socket left behind is replaced
+        self.assertTrue(os.path.exists(socketPath))
+        self.runServer(socketPath, socket.AF_UNIX)
+
+    def test_unixSocketPathTaken(self):
+        """ Test that a file in the way of a Unix socket isn't removed. """
+        filePath = os.path.join(self.tempDirectory, "8000")
+        with open(filePath, "w") as fileOut:
+            fileOut.write("important")
+
+        self.assertRaises(socket.error, CheckoutServer, self.service, filePath)
+        with open(filePath) as fileIn:
+            self.assertEqual(fileIn.read(), "important")
+
+
+if __name__ == '__main__':
+    unittest.main()
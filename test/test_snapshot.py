@@ -0,0 +1,139 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from python import Snapshot
+from python.Inventory import Inventory
+from python.Snapshot import (
+    SnapshotError,
+    SnapshotInventory,
+    compileSnapshot,
+    isSnapshotCurrent,
+    loadInventory
+)
+
+# Get the path to this file, to find test resources
+testDirectory = os.path.dirname(os.path.abspath(__file__))
+testInventoryFile = os.path.join(testDirectory, "resources", "testInventory.csv")
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        # Work on a copy of the test inventory, so we can modify it
+        self.tempDirectory = tempfile.mkdtemp()
+        self.csvPath = os.path.join(self.tempDirectory, "inventory.csv")
+        self.snapshotPath = os.path.join(self.tempDirectory, "inventory.snapshot")
+        shutil.copy(testInventoryFile, self.csvPath)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDirectory)
+
+    def test_compileSnapshot(self):
+        """ Test that a compiled snapshot contains the same items as the CSV file. """
+        compileSnapshot(self.csvPath, self.snapshotPath)
+        snapshot = SnapshotInventory(self.snapshotPath)
+
+        inventory = Inventory()
+        inventory.readFromDisk(self.csvPath)
+
+        items = inventory.getItems()
+        self.assertEqual(len(snapshot.getItems()), len(items))
+        for item in items:
+            self.assertEqual(snapshot.getItem(item.name()), item)
+
+        self.assertIsNone(snapshot.getItem("ferrari"))
+        self.assertEqual(snapshot.getItemsPretty(), inventory.getItemsPretty())
+        snapshot.close()
+
+    def test_cachedLookups(self):
+        """ Test that repeated lookups are served from the cache of decoded items. """
+        compileSnapshot(self.csvPath, self.snapshotPath)
+        snapshot = SnapshotInventory(self.snapshotPath, cacheSize=2)
+
+        lettuce = snapshot.getItem("lettuce")
+        self.assertIs(snapshot.getItem("lettuce"), lettuce)
+        snapshot.getItem("beans")
+        snapshot.getItem("peas")
+
+        stats = snapshot.cacheStats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["size"], 2)
+        snapshot.close()
+
+    def test_pickleSnapshot(self):
+        """ Test that a pickled snapshot inventory reopens the same file. """
+        compileSnapshot(self.csvPath, self.snapshotPath)
+        snapshot = SnapshotInventory(self.snapshotPath)
+
+        data = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(data), 1000)
+
+        unpickled = pickle.loads(data)
+        self.assertEqual(unpickled.path(), self.snapshotPath)
+        self.assertEqual(unpickled.getItem("lettuce"), snapshot.getItem("lettuce"))
+        unpickled.close()
+        snapshot.close()
+
+    def test_rebuildWhenChanged(self):
+        """ Test that a snapshot is rebuilt when the CSV file changes. """
+        snapshot = loadInventory(self.csvPath, self.snapshotPath)
+        self.assertIsNone(snapshot.getItem("ferrari"))
+        snapshot.close()
+        self.assertTrue(isSnapshotCurrent(self.csvPath, self.snapshotPath))
+
+        with open(self.csvPath, "a") as csvFile:
+            csvFile.write('"ferrari",100000.00,"cars"\n')
+
+        self.assertFalse(isSnapshotCurrent(self.csvPath, self.snapshotPath))
+
+        snapshot = loadInventory(self.csvPath, self.snapshotPath)
+        self.assertEqual(snapshot.getItem("ferrari").price(), 10000000)
+        snapshot.close()
+
+    def test_touchedFileStillCurrent(self):
+        """ Test that a snapshot isn't rebuilt if only the CSV file's mtime changes. """
+        compileSnapshot(self.csvPath, self.snapshotPath)
+        os.utime(self.csvPath, (0, 0))
+
+        self.assertTrue(isSnapshotCurrent(self.csvPath, self.snapshotPath))
+
+        # The new mtime is recorded, so the file isn't hashed again
+        hashFile = Snapshot.hashFile
+        Snapshot.hashFile = None
+        try:
+            self.assertTrue(isSnapshotCurrent(self.csvPath, self.snapshotPath))
+
+        finally:
+            Snapshot.hashFile = hashFile
+
+        snapshot = SnapshotInventory(self.snapshotPath)
+        self.assertIsNotNone(snapshot.getItem("beans"))
+        snapshot.close()
+
+    def test_warnings(self):
+        """ Test that warnings about bad rows are repeated on every load. """
+        with open(self.csvPath, "a") as csvFile:
+            csvFile.write('"no price"\n')
+
+        for run in xrange(2):
+            warnings = []
+            snapshot = loadInventory(self.csvPath, self.snapshotPath, warn=warnings.append)
+            self.assertEqual(len(warnings), 1)
+            self.assertIn("bad inventory entry", warnings[0])
+            self.assertEqual(snapshot.warnings(), warnings)
+            snapshot.close()
+
+    def test_badSnapshot(self):
+        """ Test that opening a file which isn't a snapshot raises an error. """
+        with self.assertRaises(SnapshotError):
+            SnapshotInventory(self.csvPath)
+
+        self.assertFalse(isSnapshotCurrent(self.csvPath, self.csvPath))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from python.Inventory import Inventory
+from python.Item import Item
+from python.SqliteInventory import (
+    SqliteInventory,
+    isDatabasePath
+)
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+beans2 = Item("beans", 200, "frozen")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "frozen")
+
+# Get the path to this file, to find test resources
+testDirectory = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestSqliteInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDirectory = tempfile.mkdtemp()
+        self.databasePath = os.path.join(self.tempDirectory, "inventory.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDirectory)
+
+    def test_isDatabasePath(self):
+        """ Test that database files are recognised by their extension. """
+        self.assertTrue(isDatabasePath("inventory.db"))
+        self.assertTrue(isDatabasePath("inventory.SQLITE"))
+        self.assertFalse(isDatabasePath("inventory.csv"))
+
+    def test_addItem(self):
+        """ Test that we can add, overwrite and retrieve items. """
+        inventory = SqliteInventory(self.databasePath)
+        inventory.addItems((beans, chickpeas, peas))
+        inventory.addItem(beans2)
+
+        self.assertEqual(inventory.getItem("beans"), beans2)
+        self.assertEqual(inventory.getItem("chickpeas"), chickpeas)
+        self.assertIsNone(inventory.getItem("ferrari"))
+        self.assertEqual(inventory.getItems(), [beans2, chickpeas, peas])
+        self.assertEqual(inventory.getItemsByPromoGroup("frozen"), [beans2, peas])
+
+        # A second lookup should come from the cache
+        inventory.getItem("beans")
+        self.assertEqual(inventory.cacheStats()["hits"], 1)
+        inventory.close()
+
+    def test_readFromDisk(self):
+        """ Test that a database populated from a CSV file matches the file. """
+        filePath = os.path.join(testDirectory, "resources", "testInventory.csv")
+        inventory = SqliteInventory(self.databasePath)
+        inventory.readFromDisk(filePath)
+
+        csvInventory = Inventory()
+        csvInventory.readFromDisk(filePath)
+
+        self.assertEqual(inventory.getItem("lettuce"), Item("lettuce", 50, "vegetables"))
+        self.assertEqual(inventory.getItemsPretty(), csvInventory.getItemsPretty())
+        inventory.close()
+
+        # Check that the contents persist, and survive pickling
+        inventory = pickle.loads(pickle.dumps(SqliteInventory(self.databasePath)))
+        self.assertEqual(len(inventory.getItems()), len(csvInventory.getItems()))
+        inventory.close()
+
+    def test_version(self):
+        """ Test that the version changes when the database does, from any connection. """
+        inventory = SqliteInventory(self.databasePath)
+        inventory.addItem(beans)
+        version = inventory.version()
+        self.assertEqual(inventory.version(), version)
+        self.assertEqual(inventory.getItem("beans"), beans)
+
+        inventory.addItem(chickpeas)
+        self.assertNotEqual(inventory.version(), version)
+        version = inventory.version()
+
+        otherInventory = SqliteInventory(self.databasePath)
+        otherInventory.addItem(beans2)
+        otherInventory.close()
+
+        self.assertNotEqual(inventory.version(), version)
+        self.assertEqual(inventory.getItem("beans"), beans2)
+        inventory.close()
+
+    def test_otherConnectionChanges(self):
+        """ Test that cached items aren't used once another connection changes them. """
+        inventory = SqliteInventory(self.databasePath, checkInterval=0)
+        inventory.addItem(beans)
+        self.assertEqual(inventory.getItem("beans"), beans)
+
+        otherInventory = SqliteInventory(self.databasePath)
+        otherInventory.addItem(beans2)
+        otherInventory.close()
+
+        self.assertEqual(inventory.getItem("beans"), beans2)
+        inventory.close()
+
+    def test_checkInterval(self):
+        """ Test that lookups only check for changes once per interval, but version always does. """
+        inventory = SqliteInventory(self.databasePath, checkInterval=3600)
+        inventory.addItem(beans)
+        self.assertEqual(inventory.getItem("beans"), beans)
+
+        otherInventory = SqliteInventory(self.databasePath)
+        otherInventory.addItem(beans2)
+        otherInventory.close()
+
+        self.assertEqual(inventory.getItem("beans"), beans)
+        inventory.version()
+        self.assertEqual(inventory.getItem("beans"), beans2)
+        inventory.close()
+
+    def test_badTable(self):
+        """ Test that a table without the inventory columns is rejected up front. """
+        connection = sqlite3.connect(self.databasePath)
+        connection.execute("CREATE TABLE inventory (name TEXT, cost REAL)")
+        connection.close()
+
+        with self.assertRaises(ValueError) as context:
+            SqliteInventory(self.databasePath)
+
+        self.assertIn("missing the columns: id, price, promoGroup", str(context.exception))
+
+    def test_emptyInventory(self):
+        """ Test that an empty database lists no items. """
+        inventory = SqliteInventory(self.databasePath)
+        self.assertEqual(inventory.getItemsPretty(), "")
+        self.assertEqual(inventory.getItems(), [])
+        inventory.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import threading
+import unittest
+
+from python.Basket import Basket
+from python.Inventory import (
+    Inventory,
+    InventoryChanges
+)
+from python.Item import Item
+from python.Receipt import Receipt
+from python.ThreadSafeBasket import ThreadSafeBasket
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+spaghettiHoops = Item("spaghetti hoops", 150, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+
+peas = Item("peas", 150, "frozen")
+potatoWaffles = Item("potato waffles", 250, "frozen")
+iceCream = Item("ice cream", 400, "frozen")
+
+bread = Item("bread", 120)
+
+items = (beans, spaghettiHoops, chickpeas, peas, potatoWaffles, iceCream, bread)
+
+
+class TestThreadSafeBasket(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._inventory = Inventory()
+        cls._inventory.addItems(items)
+
+    def createBaskets(self):
+        return Basket(self._inventory), ThreadSafeBasket(self._inventory)
+
+    def test_matchesBasket(self):
+        """ Test that a thread-safe basket prices items the same as a basket. """
+        basket, threadSafeBasket = self.createBaskets()
+        for itemName in ("beans", "peas", "beans", "ice cream", "beans", "peas", "bread"):
+            basket.addItem(itemName)
+            threadSafeBasket.addItem(itemName)
+
+            self.assertEqual(threadSafeBasket.total(), basket.total())
+            self.assertEqual(threadSafeBasket.savings(), basket.savings())
+            self.assertEqual(threadSafeBasket.numItems(), basket.numItems())
+
+        self.assertEqual(Receipt.GetReceipt(threadSafeBasket.snapshot()),
+                         Receipt.GetReceipt(basket))
+
+    def test_addItems(self):
+        """ Test adding several items at once, including unknown names. """
+        basket, threadSafeBasket = self.createBaskets()
+        unknownNames = threadSafeBasket.addItems(["beans", "caviar", "peas", "caviar"])
+        self.assertEqual(unknownNames, ["caviar"])
+
+        threadSafeBasket.addItems({"beans": 2, "truffles": 1})
+        basket.addItems({"beans": 3, "peas": 1})
+        self.assertEqual(threadSafeBasket.total(), basket.total())
+
+    def test_invalidItems(self):
+        """ Test that unknown items + negative counts are rejected. """
+        threadSafeBasket = ThreadSafeBasket(self._inventory)
+        self.assertRaises(KeyError, threadSafeBasket.addItem, "caviar")
+        self.assertRaises(ValueError, threadSafeBasket.addItem, "beans", -1)
+        self.assertRaises(ValueError, threadSafeBasket.addItems, {"beans": -1})
+        self.assertEqual(threadSafeBasket.numItems(), 0)
+
+    def test_snapshotUnchanged(self):
+        """ Test that a snapshot doesn't change when more items are added. """
+        threadSafeBasket = ThreadSafeBasket(self._inventory)
+        threadSafeBasket.addItem("beans", 2)
+        snapshot = threadSafeBasket.snapshot()
+        self.assertIs(threadSafeBasket.snapshot(), snapshot)
+
+        threadSafeBasket.addItem("beans")
+        self.assertEqual(snapshot.total(), 200)
+        self.assertEqual(snapshot.entries()[0].count(), 2)
+        self.assertEqual(threadSafeBasket.total(), 200)
+        self.assertEqual(threadSafeBasket.savings(), 100)
+
+    def test_snapshotKeepsPricedItems(self):
+        """ Test that a snapshot keeps the items it was priced with after the inventory changes. """
+        inventory = Inventory()
+        inventory.addItems(items)
+        threadSafeBasket = ThreadSafeBasket(inventory)
+        threadSafeBasket.addItem("beans", 2)
+        snapshot = threadSafeBasket.snapshot()
+
+        inventory.applyChanges(InventoryChanges((), [Item("beans", 500, "canned")]))
+        self.assertEqual(snapshot.total(), 200)
+        self.assertEqual([(entry.item(), entry.count()) for entry in snapshot.entries()],
+                         [(beans, 2)])
+        self.assertEqual(snapshot.numItems(), 2)
+
+    def test_clear(self):
+        """ Test that clearing the basket discards pending items. """
+        threadSafeBasket = ThreadSafeBasket(self._inventory)
+        threadSafeBasket.addItem("beans", 5)
+        self.assertEqual(threadSafeBasket.total(), 400)
+
+        threadSafeBasket.addItem("peas")
+        threadSafeBasket.clear()
+        self.assertEqual(threadSafeBasket.total(), 0)
+        self.assertEqual(threadSafeBasket.entries(), [])
+
+        threadSafeBasket.addItem("peas")
+        self.assertEqual(threadSafeBasket.total(), 150)
+
+    def test_concurrentAdds(self):
+        """ Test adding + pricing items from several threads at once. """
+        threadSafeBasket = ThreadSafeBasket(self._inventory)
+        itemNames = [item.name() for item in items]
+        numThreads = 8
+        numAdds = 500
+        errors = []
+
+        def addItems(threadIndex):
+            try:
+                for ix in xrange(numAdds):
+                    threadSafeBasket.addItem(itemNames[(threadIndex + ix) % len(itemNames)])
+                    if ix % 50 == 0:
+                        # Each snapshot should be consistent - the total + savings
+                        # add up to the full price of its entries
+                        snapshot = threadSafeBasket.snapshot()
+                        self.assertEqual(snapshot.total() + snapshot.savings(),
+                                         sum(entry.count() * entry.item().price()
+                                             for entry in snapshot.entries()))
+
+            except Exception as exception:
+                errors.append(exception)
+
+        threads = [threading.Thread(target=addItems, args=(threadIndex,))
+                   for threadIndex in xrange(numThreads)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+        basket = Basket(self._inventory)
+        for threadIndex in xrange(numThreads):
+            for ix in xrange(numAdds):
+                basket.addItem(itemNames[(threadIndex + ix) % len(itemNames)])
+
+        self.assertEqual(threadSafeBasket.numItems(), numThreads * numAdds)
+        self.assertEqual(threadSafeBasket.total(), basket.total())
+        self.assertEqual(threadSafeBasket.savings(), basket.savings())
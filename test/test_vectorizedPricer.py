@@ -0,0 +1,99 @@
+import random
+import unittest
+
+from python.Basket import Basket
+from python.Inventory import Inventory
+from python.Item import Item
+from python.VectorizedPricer import (
+    VectorizedPricer,
+    numpy
+)
+
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+spaghettiHoops = Item("spaghetti hoops", 150, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+
+peas = Item("peas", 150, "frozen")
+potatoWaffles = Item("potato waffles", 250, "frozen")
+
+lettuce = Item("lettuce", 50, "")
+
+items = (beans, spaghettiHoops, chickpeas, peas, potatoWaffles, lettuce)
+
+
+@unittest.skipIf(numpy is None, "NumPy isn't installed")
+class TestVectorizedPricer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._inventory = Inventory()
+        cls._inventory.addItems(items)
+
+    def assertMatchesBasket(self, inventory, baskets):
+        pricer = VectorizedPricer(inventory)
+        totals, savings = pricer.priceBaskets(baskets)
+        self.assertEqual(len(totals), len(baskets))
+
+        for ix, items in enumerate(baskets):
+            basket = Basket(inventory)
+            basket.addItems(items)
+            self.assertEqual(totals[ix], basket.total())
+            self.assertEqual(savings[ix], basket.savings())
+
+    def test_simpleBaskets(self):
+        """ Test that simple baskets are priced the same as with Basket. """
+        self.assertMatchesBasket(self._inventory, [
+            [],
+            ["beans"],
+            ["lettuce", "lettuce", "lettuce", "lettuce"],
+            ["beans", "beans", "beans", "chickpeas", "spaghetti hoops"],
+            {"beans": 4, "spaghetti hoops": 2, "chickpeas": 5, "peas": 2, "potato waffles": 1},
+            ["unknown", "peas"],
+        ])
+
+    def test_randomBaskets(self):
+        """ Test that lots of random baskets are priced the same as with Basket. """
+        rng = random.Random(1)
+        inventory = Inventory()
+        inventory.addItems(
+            Item("item%d" % ix, rng.choice([rng.randint(1, 1000), 100, 250]),
+                 rng.choice(["", "a", "b", "c"]))
+            for ix in xrange(50))
+
+        baskets = [dict(("item%d" % rng.randint(0, 55), rng.randint(0, 10))
+                        for count in xrange(rng.randint(0, 12)))
+                   for ix in xrange(500)]
+
+        self.assertMatchesBasket(inventory, baskets)
+
+    def test_largeTotals(self):
+        """ Test that totals above 2**53 pence are still priced exactly. """
+        inventory = Inventory()
+        inventory.addItems((Item("gold", 123456789013, ""), Item("silver", 123456789011, "bars"),
+                            beans))
+
+        self.assertMatchesBasket(inventory, [
+            {"gold": 1000001, "beans": 1},
+            {"gold": 1000001, "silver": 1000001},
+        ])
+
+    def test_countMatrix(self):
+        """ Test pricing a count matrix with repeated + out of order entries. """
+        pricer = VectorizedPricer(self._inventory)
+        beansIndex = pricer.indexOf("beans")
+        chickpeasIndex = pricer.indexOf("chickpeas")
+        self.assertIsNone(pricer.indexOf("unknown"))
+
+        totals, savings = pricer.price([2, 0, 2, 2], [beansIndex, beansIndex, chickpeasIndex, beansIndex],
+                                       [1, 1, 2, 2], numBaskets=4)
+        self.assertEqual(list(totals), [100, 0, 350, 0])
+        self.assertEqual(list(savings), [0, 0, 100, 0])
+
+        self.assertRaises(ValueError, pricer.price, [0], [beansIndex], [-1])
+        self.assertRaises(ValueError, pricer.price, [0, 1], [beansIndex], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
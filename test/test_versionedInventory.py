@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from python.Basket import Basket
+from python.Inventory import (
+    Inventory,
+    InventoryChanges
+)
+from python.Item import Item
+from python.VersionedInventory import VersionedInventory
+
+# Define some test items
+beans = Item("beans", 100, "canned")
+beans2 = Item("beans", 200, "canned")
+chickpeas = Item("chickpeas", 75, "canned")
+peas = Item("peas", 150, "frozen")
+
+
+class TestVersionedInventory(unittest.TestCase):
+
+    def createInventory(self, **kwargs):
+        inventory = Inventory()
+        inventory.addItems((beans, chickpeas))
+        return VersionedInventory(inventory, **kwargs)
+
+    def test_versions(self):
+        """ Test that changes make a new version without affecting older ones. """
+        inventory = self.createInventory()
+        version1 = inventory.current()
+
+        version2 = inventory.applyChanges(InventoryChanges([peas], [beans2], ["chickpeas"]))
+        self.assertIs(inventory.current(), version2)
+        self.assertGreater(version2.number(), version1.number())
+
+        self.assertEqual(version1.getItem("beans"), beans)
+        self.assertEqual(version1.getItem("chickpeas"), chickpeas)
+        self.assertIsNone(version1.getItem("peas"))
+
+        self.assertEqual(version2.getItem("beans"), beans2)
+        self.assertIsNone(version2.getItem("chickpeas"))
+        self.assertEqual(version2.getItem("peas"), peas)
+        self.assertEqual(len(version2.getItems()), 2)
+
+        # The versions should share the same base
+        self.assertIs(version1.base(), version2.base())
+
+    def test_basketPinsVersion(self):
+        """ Test that a basket keeps using the version it was created with. """
+        inventory = self.createInventory()
+        basket1 = Basket(inventory)
+
+        inventory.applyChanges(InventoryChanges((), [beans2]))
+        basket2 = Basket(inventory)
+
+        basket1.addItem("beans")
+        basket2.addItem("beans")
+        self.assertEqual(basket1.total(), beans.price())
+        self.assertEqual(basket2.total(), beans2.price())
+
+    def test_compaction(self):
+        """ Test that a new base is built once the overlay gets too big. """
+        inventory = self.createInventory(maxOverlaySize=1, maxOverlayFraction=0.0)
+        version1 = inventory.current()
+
+        version2 = inventory.applyChanges(InventoryChanges([peas]))
+        version3 = inventory.applyChanges(InventoryChanges((), [beans2]))
+
+        self.assertIs(version2.base(), version1.base())
+        self.assertIsNot(version3.base(), version1.base())
+        self.assertEqual(version3.overlay(), {})
+
+        # The older versions should be unaffected
+        self.assertEqual(version1.getItem("beans"), beans)
+        self.assertIsNone(version1.getItem("peas"))
+        self.assertEqual(version3.getItem("beans"), beans2)
+        self.assertEqual(version3.getItem("peas"), peas)
+
+    def test_chainedUpdates(self):
+        """ Test that many small updates each keep their own view of the items. """
+        inventory = self.createInventory(maxOverlaySize=1000)
+        items = [Item("item%d" % ix, ix + 1, "") for ix in xrange(100)]
+
+        versions = []
+        for item in items:
+            versions.append(inventory.applyChanges(InventoryChanges([item])))
+
+        for ix, version in enumerate(versions):
+            self.assertEqual(version.getItem("item%d" % ix), items[ix])
+            self.assertIsNone(version.getItem("item%d" % (ix + 1)))
+            self.assertEqual(version.getItem("beans"), beans)
+            self.assertEqual(len(version.overlay()), ix + 1)
+            self.assertEqual(version.overlaySize(), ix + 1)
+
+        # Changing an item again should shadow the earlier change
+        version = inventory.applyChanges(InventoryChanges((), [Item("item0", 500, "")], ["beans"]))
+        self.assertEqual(version.getItem("item0").price(), 500)
+        self.assertIsNone(version.getItem("beans"))
+        self.assertEqual(versions[-1].getItem("item0"), items[0])
+        self.assertEqual(len(version.getItems()), 101)
+
+    def test_reloadFromDisk(self):
+        """ Test that reloading builds a version with only the differences. """
+        tempDirectory = tempfile.mkdtemp()
+        try:
+            filePath = os.path.join(tempDirectory, "inventory.csv")
+            with open(filePath, "w") as csvFile:
+                csvFile.write("name,price,promoGroup\nbeans,2.00,canned\npeas,1.50,frozen\n")
+
+            inventory = self.createInventory()
+            changes = inventory.reloadFromDisk(filePath)
+
+            self.assertEqual(changes.added(), [peas])
+            self.assertEqual(changes.changed(), [beans2])
+            self.assertEqual(changes.removed(), ["chickpeas"])
+            self.assertEqual(len(inventory.current().overlay()), 3)
+
+            deltaPath = os.path.join(tempDirectory, "delta.csv")
+            with open(deltaPath, "w") as csvFile:
+                csvFile.write("op,name,price,promoGroup\nset,chickpeas,0.75,canned\n")
+
+            changes = inventory.applyDeltaFromDisk(deltaPath)
+            self.assertEqual(changes.added(), [chickpeas])
+            self.assertEqual(inventory.getItem("chickpeas"), chickpeas)
+
+        finally:
+            shutil.rmtree(tempDirectory)
+
+
+if __name__ == '__main__':
+    unittest.main()
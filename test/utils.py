@@ -44,15 +44,15 @@ promoGroups = [
 ]
 numPromoGroups = len(promoGroups)
 
-def _randomGroup():
-    ix = random.randint(0, numPromoGroups - 1)
-    return promoGroups[ix]
+def _randomGroup(groups=promoGroups):
+    return random.choice(groups)
 
 def _randomPrice():
     price = random.random() * 1000.0
     return price
 
-def generateRandomInventory(wordsFileIn, inventoryFileOut, numEntries=-1):
+def generateRandomInventory(wordsFileIn, inventoryFileOut, numEntries=-1,
+                            groups=promoGroups):
     """
     From a list of words, generate an inventory with random prices and promo
     groups. Intended for constructing very large inventories for testing.
@@ -62,6 +62,8 @@ def generateRandomInventory(wordsFileIn, inventoryFileOut, numEntries=-1):
         inventoryFileOut (str): Path to the file to write to.
         numEntries (int): The number of entries to generate, or -1 to use all
             words in the input file. (Default: -1)
+        groups (list of str): The promo groups to choose from at random, where
+            "" means no promo group. (Default: promoGroups)
 
     Returns:
         int. The number of entries generated in the inventory.
@@ -79,14 +81,14 @@ def generateRandomInventory(wordsFileIn, inventoryFileOut, numEntries=-1):
                     continue
 
                 price = _randomPrice()
-                promoGroup = _randomGroup()
+                promoGroup = _randomGroup(groups)
 
                 outputLine = "%s,%.2f,%s\n" % (name, price, promoGroup)
 
                 fileOut.write(outputLine)
                 numWords += 1
 
-                if numEntries > 0 and numWords > numEntries:
+                if numEntries > 0 and numWords >= numEntries:
                     return numWords
 
     return numWords